@@ -0,0 +1,105 @@
+"""Стоимость страниц админки постов при росте таблиц.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_admin
+
+Для каждого размера таблиц открываются списки постов, комментариев и
+подписок, поиск по постам и форма поста. Число запросов не должно
+зависеть от числа строк.
+"""
+from benchmarks.utils import benchmark_database, measure, print_table
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SIZES = (1000, 10000, 100000)
+AUTHORS: int = 400
+GROUPS: int = 50
+BATCH_SIZE: int = 500
+REPEATS: int = 5
+
+
+def make_users():
+    User.objects.bulk_create(
+        [User(username=f'author{i}') for i in range(AUTHORS)])
+    admin = User.objects.create_superuser(
+        'admin', 'admin@example.com', 'password')
+    Group.objects.bulk_create([
+        Group(title=f'Группа {i}', slug=f'group-{i}', description='')
+        for i in range(GROUPS)
+    ])
+    authors = list(User.objects.filter(username__startswith='author'))
+    groups = list(Group.objects.all())
+    return admin, authors, groups
+
+
+def grow(size, authors, groups):
+    """Доводит число постов, комментариев и подписок до size."""
+    start = Post.objects.count()
+    Post.objects.bulk_create([
+        Post(author=authors[i % AUTHORS], group=groups[i % GROUPS],
+             text=f'Пост номер {i}')
+        for i in range(start, size)
+    ], batch_size=BATCH_SIZE)
+    post_ids = list(Post.objects.order_by('pk').values_list(
+        'pk', flat=True)[start:])
+    Comment.objects.bulk_create([
+        Comment(post_id=pk, author=authors[i % AUTHORS], text='Комментарий')
+        for i, pk in enumerate(post_ids)
+    ], batch_size=BATCH_SIZE)
+    # Пары (u, u + k) уникальны, пока k < AUTHORS.
+    Follow.objects.bulk_create([
+        Follow(user=authors[i % AUTHORS],
+               author=authors[(i % AUTHORS + 1 + i // AUTHORS) % AUTHORS])
+        for i in range(Follow.objects.count(), min(size, AUTHORS ** 2 // 2))
+    ], batch_size=BATCH_SIZE)
+    search.rebuild()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def pages():
+    post = Post.objects.order_by('pk').first()
+    return {
+        'posts': reverse('admin:posts_post_changelist'),
+        'posts search': reverse('admin:posts_post_changelist') + '?q=номер',
+        'comments': reverse('admin:posts_comment_changelist'),
+        'follows': reverse('admin:posts_follow_changelist'),
+        'post form': reverse('admin:posts_post_change', args=[post.pk]),
+    }
+
+
+def run(client, url):
+    client.get(url)
+    total_seconds = 0.0
+    for _ in range(REPEATS):
+        with measure() as result:
+            response = client.get(url)
+        assert response.status_code == 200, url
+        total_seconds += result.seconds
+    return result.queries, round(total_seconds / REPEATS * 1000, 1)
+
+
+def main():
+    rows = []
+    with benchmark_database():
+        admin, authors, groups = make_users()
+        client = Client()
+        client.force_login(admin)
+        for size in SIZES:
+            grow(size, authors, groups)
+            for name, url in pages().items():
+                rows.append([size, name] + list(run(client, url)))
+    print_table(['rows', 'page', 'queries', 'ms/request'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Запросы в секунду на главную для анонимного посетителя.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_anonymous
+
+Запросы идут через обработчик Django в том же процессе, без сети, так
+что видна только цена самого Django. Режимы:
+
+- uncached — кэш выключен (DummyCache), страница строится каждый раз;
+- cache_page — кэш страниц-списков во view, как до кэша анонимных
+  страниц: запрос всё равно проходит сессии, аутентификацию, CSRF и
+  разбор URL;
+- anonymous — настройки проекта: AnonymousPageCacheMiddleware отдаёт
+  страницу до остальных middleware.
+"""
+from benchmarks.utils import benchmark_database, measure, print_table
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import RequestFactory, override_settings
+from django.test.client import ClientHandler
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+POSTS: int = 1000
+AUTHORS: int = 50
+GROUPS: int = 10
+REQUESTS: int = 2000
+MIDDLEWARE = 'core.anonymous_cache.AnonymousPageCacheMiddleware'
+MODES = {
+    'uncached': {
+        'MIDDLEWARE': [name for name in settings.MIDDLEWARE
+                       if name != MIDDLEWARE],
+        'CACHES': {'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    },
+    'cache_page': {
+        'MIDDLEWARE': [name for name in settings.MIDDLEWARE
+                       if name != MIDDLEWARE],
+    },
+    'anonymous': {},
+}
+
+
+def make_posts():
+    User.objects.bulk_create(
+        [User(username=f'author{i}') for i in range(AUTHORS)])
+    Group.objects.bulk_create([
+        Group(title=f'Группа {i}', slug=f'group-{i}', description='')
+        for i in range(GROUPS)
+    ])
+    authors = list(User.objects.all())
+    groups = list(Group.objects.all())
+    Post.objects.bulk_create([
+        Post(author=authors[i % AUTHORS], group=groups[i % GROUPS],
+             text=f'Пост номер {i}')
+        for i in range(POSTS)
+    ])
+
+
+def run(mode):
+    with override_settings(**MODES[mode]):
+        caches['default'].clear()
+        handler = ClientHandler()
+        request = RequestFactory().get('/')
+        # Первый запрос заполняет кэш и в замер не входит.
+        handler(request.environ.copy())
+        with measure() as result:
+            for _ in range(REQUESTS):
+                response = handler(request.environ.copy())
+        assert response.status_code == 200, response.status_code
+    return [mode, round(REQUESTS / result.seconds),
+            round(result.seconds / REQUESTS * 10 ** 6),
+            round(result.queries / REQUESTS, 2)]
+
+
+def main():
+    with benchmark_database():
+        make_posts()
+        rows = [run(mode) for mode in MODES]
+    print_table(['mode', 'req/s', 'us/req', 'queries/req'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Пропускная способность бэкендов кэша: LocMem, FileBased и общий mmap.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_cache
+
+Каждый процесс из PROCESSES выполняет OPERATIONS обращений к KEYS
+ключам с распределением Ципфа (как у популярных страниц): get, а при
+промахе — set значения размером с фрагмент страницы. Для каждого
+бэкенда печатаются суммарные операции в секунду и доля попаданий.
+LocMemCache у каждого процесса свой, поэтому с ростом числа процессов
+его доля попаданий падает. Нужен os.fork() (Linux, macOS), БД не нужна.
+"""
+import itertools
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.utils import print_table
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from core.cache_backends.shared import SharedMemoryCache
+
+PROCESSES = (1, 4)
+OPERATIONS: int = 20000
+KEYS: int = 2000
+ZIPF_S: float = 1.1
+VALUE = '<div class="card">' + 'x' * 2000 + '</div>'
+
+_names = itertools.count()
+
+
+def backends(location):
+    params = {'TIMEOUT': 300, 'OPTIONS': {'MAX_ENTRIES': KEYS * 2}}
+    return {
+        'locmem': lambda: LocMemCache(f'bench-{next(_names)}', params),
+        'filebased': lambda: FileBasedCache(
+            os.path.join(location, f'files-{next(_names)}'), params),
+        'shared': lambda: SharedMemoryCache(
+            os.path.join(location, f'shared-{next(_names)}'),
+            {'TIMEOUT': 300}),
+    }
+
+
+def workload(seed):
+    weights = [1 / rank ** ZIPF_S for rank in range(1, KEYS + 1)]
+    return random.Random(seed).choices(
+        [f'page:{index}' for index in range(KEYS)], weights, k=OPERATIONS)
+
+
+def run(cache, keys):
+    hits = 0
+    for key in keys:
+        if cache.get(key) is None:
+            cache.set(key, VALUE)
+        else:
+            hits += 1
+    return hits
+
+
+def measure(make_cache, processes):
+    """Операций в секунду на всех процессах и доля попаданий."""
+    cache = make_cache()
+    # Ключи готовятся заранее, чтобы в замер попал только кэш.
+    workloads = [workload(seed) for seed in range(processes)]
+    children = []
+    started = time.perf_counter()
+    for keys in workloads:
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            hits = run(cache, keys)
+            os.write(write_end, pickle.dumps(hits))
+            os._exit(0)
+        os.close(write_end)
+        children.append((pid, read_end))
+    hits = 0
+    for pid, read_end in children:
+        with os.fdopen(read_end, 'rb') as pipe:
+            hits += pickle.loads(pipe.read())
+        os.waitpid(pid, 0)
+    elapsed = time.perf_counter() - started
+    total = processes * OPERATIONS
+    return [round(total / elapsed), f'{hits / total:.1%}']
+
+
+def main():
+    rows = []
+    location = tempfile.mkdtemp()
+    try:
+        for processes in PROCESSES:
+            for name, make_cache in backends(location).items():
+                rows.append([processes, name]
+                            + measure(make_cache, processes))
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
+    print_table(['processes', 'backend', 'ops/s', 'hit rate'], rows)
+
+
+if __name__ == '__main__':
+    main()
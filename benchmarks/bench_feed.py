@@ -0,0 +1,123 @@
+"""Стоимость записи и чтения ленты подписок при разных схемах раскладки.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_feed
+
+Для каждого распределения числа подписчиков сравниваются чистый fan-out
+на запись (push), чистое чтение по запросу (pull) и гибрид с порогом
+FEED_PULL_THRESHOLD. Режим автора (UserStats.feed_mode) выставляется
+по порогу сразу, без воркера ленты.
+"""
+import random
+
+from benchmarks.utils import benchmark_database, measure, print_table
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.test import override_settings
+
+from posts.counters import reconcile
+from posts.feeds import feed_page
+from posts.models import FeedItem, Follow, Post, UserStats
+
+User = get_user_model()
+
+READERS: int = 2000
+AUTHORS: int = 100
+POSTS_PER_AUTHOR: int = 3
+SAMPLE_READERS: int = 50
+PER_PAGE: int = 10
+HYBRID_THRESHOLD: int = 200
+
+DISTRIBUTIONS = {
+    'uniform': lambda rank: 50,
+    'zipf': lambda rank: READERS // rank,
+    'celebrity': lambda rank: READERS if rank == 1 else 20,
+}
+MODES = {
+    'push': 10 ** 9,
+    'pull': 0,
+    'hybrid': HYBRID_THRESHOLD,
+}
+
+
+def make_users():
+    User.objects.bulk_create(
+        [User(username=f'reader{i}') for i in range(READERS)]
+        + [User(username=f'author{i}') for i in range(AUTHORS)]
+    )
+    readers = list(User.objects.filter(username__startswith='reader'))
+    authors = list(User.objects.filter(username__startswith='author'))
+    return readers, authors
+
+
+def make_follows(readers, authors, followers_for_rank, rng):
+    follows = []
+    for rank, author in enumerate(authors, start=1):
+        count = min(followers_for_rank(rank), len(readers))
+        follows.extend(
+            Follow(user=reader, author=author)
+            for reader in rng.sample(readers, count)
+        )
+    Follow.objects.bulk_create(follows)
+    reconcile()
+
+
+def set_modes(threshold):
+    UserStats.objects.update(feed_mode=Case(
+        When(followers_count__gte=threshold,
+             then=Value(UserStats.FEED_PULL)),
+        default=Value(UserStats.FEED_PUSH),
+    ))
+
+
+def run(readers, authors, threshold, rng):
+    set_modes(threshold)
+    with override_settings(FEED_PULL_THRESHOLD=threshold):
+        with measure() as write:
+            for _ in range(POSTS_PER_AUTHOR):
+                for author in authors:
+                    Post.objects.create(author=author, text='Бенчмарк')
+        inbox_rows = FeedItem.objects.count()
+        sample = rng.sample(readers, SAMPLE_READERS)
+        reads = 0
+        with measure() as read:
+            for reader in sample:
+                page = feed_page(reader, PER_PAGE)
+                reads += 1
+                if page.next_cursor:
+                    feed_page(reader, PER_PAGE, page.next_cursor)
+                    reads += 1
+    posts = POSTS_PER_AUTHOR * len(authors)
+    return [
+        f'{write.seconds * 1000 / posts:.2f}',
+        f'{write.queries / posts:.1f}',
+        inbox_rows,
+        f'{read.seconds * 1000 / reads:.2f}',
+        f'{read.queries / reads:.1f}',
+    ]
+
+
+def main():
+    rows = []
+    with benchmark_database():
+        readers, authors = make_users()
+        for name, followers_for_rank in DISTRIBUTIONS.items():
+            for mode, threshold in MODES.items():
+                rng = random.Random(42)
+                with transaction.atomic():
+                    make_follows(readers, authors, followers_for_rank, rng)
+                    rows.append([name, mode] + run(
+                        readers, authors, threshold, rng))
+                    transaction.set_rollback(True)
+    print_table(
+        ['distribution', 'mode', 'write ms/post', 'write q/post',
+         'inbox rows', 'read ms/page', 'read q/page'],
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
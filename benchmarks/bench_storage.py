@@ -0,0 +1,102 @@
+"""Плоский каталог posts/ против хранилища по хэшу posts/ab/cd/.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_storage
+
+Каталоги растут до каждого размера из SIZES. На каждом размере
+замеряются сохранение новой загрузки, exists() случайного файла и
+listdir каталога, куда ложится файл, а также место на диске, если
+каждая картинка загружена дважды. Работает во временном каталоге, БД
+не нужна.
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.utils import print_table
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+from core.storage import ContentAddressedStorage
+
+SIZES = (10000, 50000, 200000)
+FILE_SIZE: int = 2048
+DUPLICATE_SHARE: float = 0.5
+SAMPLES: int = 500
+
+
+def content(index):
+    return ContentFile(index.to_bytes(8, 'big') * (FILE_SIZE // 8))
+
+
+def grow(storage, names, size):
+    """Загружает файлы до size; половина из них — повторы."""
+    while len(names) < size:
+        index = len(names)
+        if index and random.random() < DUPLICATE_SHARE:
+            index = random.randrange(index)
+        names.append(storage.save(f'posts/photo_{index}.jpg',
+                                  content(index)))
+
+
+def disk_usage(location):
+    total = files = 0
+    for root, _, file_names in os.walk(location):
+        for file_name in file_names:
+            total += os.path.getsize(os.path.join(root, file_name))
+            files += 1
+    return files, total
+
+
+def per_call_us(calls):
+    started = time.perf_counter()
+    for call in calls:
+        call()
+    return round((time.perf_counter() - started) / len(calls) * 10 ** 6, 1)
+
+
+def measure(storage, names):
+    start = len(names)
+    save_us = per_call_us([
+        lambda index=index: storage.save(
+            f'posts/new_{index}.jpg', content(index))
+        for index in range(start * 2, start * 2 + SAMPLES)
+    ])
+    sample = random.sample(names, SAMPLES)
+    exists_us = per_call_us(
+        [lambda name=name: storage.exists(name) for name in sample])
+    target = os.path.dirname(sample[0])
+    listdir_us = per_call_us([lambda: storage.listdir(target)] * 20)
+    files, total = disk_usage(storage.location)
+    return [save_us, exists_us, listdir_us, files,
+            round(total / 2 ** 20, 1)]
+
+
+def main():
+    random.seed(1)
+    rows = []
+    location = tempfile.mkdtemp()
+    try:
+        layouts = {
+            'flat': FileSystemStorage(os.path.join(location, 'flat')),
+            'sharded': ContentAddressedStorage(
+                os.path.join(location, 'sharded')),
+        }
+        names = {layout: [] for layout in layouts}
+        for size in SIZES:
+            for layout, storage in layouts.items():
+                grow(storage, names[layout], size)
+                rows.append([size, layout]
+                            + measure(storage, names[layout]))
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
+    print_table(['uploads', 'layout', 'save us', 'exists us',
+                 'listdir us', 'files', 'disk MB'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Память на загрузку картинки в форму поста.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_upload
+
+Каждая загрузка выполняется в отдельном дочернем процессе (fork), чтобы
+пик памяти одного запроса не смешивался с другими. Для запроса выводится
+прирост пикового RSS процесса (в нём видны и буферы Pillow; пик
+сбрасывается через /proc/self/clear_refs, поэтому нужен Linux), пик
+памяти Python по tracemalloc, время и размер сохранённого файла. Тело запроса
+собирается до замера: его память — это данные сокета, а не обработка.
+
+Режим unbounded — стандартные обработчики Django без ограничений
+размера и без уменьшения, как было до CappedUploadHandler;
+no_decoded_cap — настройки проекта без IMAGE_MAX_DECODED_PIXELS, когда
+PNG до IMAGE_MAX_PIXELS раскодировался целиком; capped — настройки
+проекта.
+"""
+import multiprocessing
+import os
+import shutil
+import struct
+import tempfile
+import time
+import tracemalloc
+import zlib
+from io import BytesIO
+
+from benchmarks.utils import benchmark_database, print_table
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, RequestFactory, override_settings
+from django.test.client import ClientHandler
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post
+
+User = get_user_model()
+
+NO_LIMIT: int = 10 ** 12
+MODES = {
+    'unbounded': {
+        'FILE_UPLOAD_HANDLERS': [
+            'django.core.files.uploadhandler.MemoryFileUploadHandler',
+            'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+        ],
+        'UPLOAD_MAX_SIZE': NO_LIMIT,
+        'IMAGE_MAX_PIXELS': NO_LIMIT,
+        'POST_IMAGE_MAX_SIDE': NO_LIMIT,
+        'IMAGE_MAX_DECODED_PIXELS': NO_LIMIT,
+    },
+    'no_decoded_cap': {'IMAGE_MAX_DECODED_PIXELS': NO_LIMIT},
+    'capped': {},
+}
+
+
+def jpeg(width, height):
+    buffer = BytesIO()
+    Image.effect_noise((width, height), 64).convert('RGB').save(
+        buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def png(width, height, mode='L'):
+    buffer = BytesIO()
+    Image.linear_gradient('L').resize((width, height)).convert(mode).save(
+        buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def png_bomb(width, height):
+    """Только заголовок PNG с огромными размерами."""
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr)
+            + chunk(b'IDAT', zlib.compress(b'')) + chunk(b'IEND', b''))
+
+
+def cases():
+    return {
+        'jpeg 1000x750': ('photo.jpg', jpeg(1000, 750)),
+        'jpeg 4000x3000': ('photo.jpg', jpeg(4000, 3000)),
+        'jpeg 8000x6000': ('photo.jpg', jpeg(8000, 6000)),
+        'png 4000x3000': ('photo.png', png(4000, 3000)),
+        'png 7000x7000 RGBA': ('big.png', png(7000, 7000, 'RGBA')),
+        'png bomb 10^10 px': ('bomb.png', png_bomb(100000, 100000)),
+        'not image 25 MB': ('big.jpg', os.urandom(25 * 1024 * 1024)),
+    }
+
+
+def reset_peak_rss():
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+
+
+def rss_kb(field):
+    """VmRSS (текущий) или VmHWM (пиковый) размер процесса в КБ."""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+
+
+def upload(user, name, content, results):
+    client = Client()
+    client.force_login(user)
+    request = RequestFactory().post(reverse('posts:post_create'), {
+        'text': 'Пост',
+        'image': SimpleUploadedFile(name, content),
+    })
+    request.environ['HTTP_COOKIE'] = client.cookies.output(
+        header='', sep=';')
+    handler = ClientHandler(enforce_csrf_checks=False)
+    reset_peak_rss()
+    start_rss = rss_kb('VmRSS')
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = handler(request.environ)
+    seconds = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    post = Post.objects.filter(author=user).first()
+    results.put([
+        'saved' if response.status_code == 302 else 'rejected',
+        round((rss_kb('VmHWM') - start_rss) / 1024, 1),
+        round(traced_peak / 2 ** 20, 1),
+        round(seconds * 1000),
+        round(post.image.size / 1024) if post and post.image else '-',
+    ])
+
+
+def run(user, mode, name, content):
+    results = multiprocessing.Queue()
+    with override_settings(**MODES[mode]):
+        process = multiprocessing.Process(
+            target=upload, args=(user, name, content, results))
+        process.start()
+        row = results.get()
+        process.join()
+    return row
+
+
+def main():
+    multiprocessing.set_start_method('fork')
+    media_root = tempfile.mkdtemp()
+    rows = []
+    try:
+        with benchmark_database(), override_settings(MEDIA_ROOT=media_root):
+            user = User.objects.create_user(username='bench_uploader')
+            for case, (name, content) in cases().items():
+                for mode in MODES:
+                    rows.append([case, mode, round(len(content) / 1024)]
+                                + run(user, mode, name, content))
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+    print_table(['upload', 'mode', 'KB', 'result', 'RSS +MB',
+                 'python MB', 'ms', 'stored KB'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Общая обвязка для бенчмарков: Django, временная БД и замеры."""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from core.testing import private_shared_cache  # noqa: E402
+from django.test.utils import (setup_databases,  # noqa: E402
+                               setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+
+
+@contextmanager
+def benchmark_database():
+    """Поднимает пустую тестовую БД на время бенчмарка.
+
+    DEBUG выключен, как в продакшене: иначе шаблоны разбираются заново
+    на каждый запрос, а запросы копятся в connection.queries. Общий кэш
+    тоже временный: кэш запущенного сервера бенчмарк не трогает.
+    """
+    setup_test_environment(debug=False)
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        with private_shared_cache():
+            yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+class Measure:
+    seconds = 0.0
+    queries = 0
+
+
+@contextmanager
+def measure():
+    """Замеряет время и число SQL-запросов внутри блока."""
+    result = Measure()
+
+    def count_query(execute, sql, params, many, context):
+        result.queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_query):
+        started = time.perf_counter()
+        yield result
+        result.seconds = time.perf_counter() - started
+
+
+def print_table(headers, rows):
+    widths = [
+        max(len(str(value)) for value in column)
+        for column in zip(headers, *rows)
+    ]
+    line = '  '.join('{:>%d}' % width for width in widths)
+    print(line.format(*headers))
+    for row in rows:
+        print(line.format(*row))
@@ -23,6 +23,7 @@ if FILENAME not in project_dir_content:
         f'Убедитесь, что у вас верная структура проекта.'
     )
 
+import pytest
 from django.utils.version import get_version
 
 assert get_version() < '3.0.0', 'Пожалуйста, используйте версию Django < 3.0.0'
@@ -37,3 +38,11 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def private_shared_cache():
+    # Тесты не должны трогать кэш запущенного сервера
+    from core.testing import private_shared_cache
+    with private_shared_cache():
+        yield
@@ -0,0 +1,106 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+AnonymousPageCacheMiddleware стоит первым в MIDDLEWARE. GET-запрос без
+cookie сессии и сообщений она отдаёт прямо из кэша — без сессий,
+аутентификации, CSRF, разбора URL и запросов к БД. При промахе запрос
+проходит как обычно, и ответ сохраняется, если view помечен
+декоратором @anonymous_cache, ответ 200 и не ставит cookies (например,
+csrftoken для формы).
+
+Ключ страницы включает номер поколения; invalidate() повышает его, и
+все сохранённые страницы сразу перестают находиться. Сигналы постов,
+групп, комментариев и подписок вызывают invalidate().
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .caching import freeze_response, thaw_response
+
+GENERATION_KEY: str = 'anonymous-page-generation'
+
+
+def anonymous_cache(view):
+    """Разрешает хранить ответы view в кэше анонимных страниц."""
+    view.anonymous_cache = True
+    return view
+
+
+def _cache():
+    return caches[settings.ANONYMOUS_CACHE_ALIAS]
+
+
+def _fresh_generation():
+    # Поколение, которого гарантированно не было раньше: если ключ
+    # вытеснили из кэша, старые страницы не должны снова «найтись».
+    return time.time_ns()
+
+
+def invalidate():
+    cache = _cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, _fresh_generation(), None)
+
+
+def _page_key(request, generation):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'anonymous-page:{generation}:{url}'
+
+
+def _is_anonymous(request):
+    return not any(name in request.COOKIES for name in (
+        settings.SESSION_COOKIE_NAME, *settings.ANONYMOUS_CACHE_BYPASS_COOKIES
+    ))
+
+
+def _cached_response(request, entry):
+    response = thaw_response(entry)
+    # Условный GET, как у @condition во view: ETag и Last-Modified
+    # сохранены вместе со страницей.
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(response.get('Last-Modified')),
+        response=response,
+    )
+
+
+def _is_cacheable(request, response):
+    match = request.resolver_match
+    return (
+        match is not None
+        and getattr(match.func, 'anonymous_cache', False)
+        and response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+class AnonymousPageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method != 'GET' or not _is_anonymous(request):
+            return self.get_response(request)
+        cache = _cache()
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            cache.add(GENERATION_KEY, _fresh_generation(), None)
+            generation = cache.get(GENERATION_KEY)
+        key = _page_key(request, generation)
+        entry = cache.get(key)
+        if entry is not None:
+            return _cached_response(request, entry)
+        response = self.get_response(request)
+        if _is_cacheable(request, response):
+            # Кортеж из строк и байтов: L1 хранит его без pickle.
+            cache.set(key, freeze_response(response),
+                      settings.ANONYMOUS_CACHE_TIMEOUT)
+        return response
@@ -0,0 +1,10 @@
+"""Собственные бэкенды кэша Django (указываются в CACHES['BACKEND'])."""
+from django.dispatch import Signal
+
+# Живая запись вытеснена из-за нехватки места (не по сроку и не delete());
+# key — полный ключ бэкенда
+entry_evicted = Signal(providing_args=['key'])
+
+# Значение записано (set, add, incr); size — байт в сериализованном виде.
+# Отправляется после записи, вне блокировок бэкенда.
+entry_stored = Signal(providing_args=['key', 'size'])
@@ -0,0 +1,120 @@
+"""Кэш с метриками: обёртка над другим кэшем из CACHES.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.instrumented.InstrumentedCache',
+            'OPTIONS': {'CACHE': 'tiered', 'METRICS_CACHE': 'shared',
+                        'FLUSH_INTERVAL': 5},
+        },
+        ...
+    }
+
+Все вызовы передаются кэшу CACHE, а по группе ключа (core.cache_metrics)
+считаются попадания, промахи, записи, удаления и задержки get/set.
+Записанные байты и вытеснения сообщает общий кэш (SharedMemoryCache) —
+он и так сериализует значение. Раз в FLUSH_INTERVAL секунд счётчики
+процесса сохраняются в METRICS_CACHE — мимо обёртки, чтобы метрики не
+считали сами себя, — и ещё раз при выходе из процесса, чтобы короткие
+команды тоже попали в сводку.
+"""
+import atexit
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import cache_metrics
+
+DEFAULT_FLUSH_INTERVAL: float = 5.0
+
+_flushed_at_exit = set()
+
+
+def _flush_at_exit(alias):
+    # Алиас мог быть из override_settings в тестах.
+    if alias in settings.CACHES and cache_metrics.metrics.snapshot()[
+            'counters']:
+        cache_metrics.flush(caches[alias], retire=True)
+
+
+class InstrumentedCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._alias = options['CACHE']
+        self._metrics_alias = options.get('METRICS_CACHE', self._alias)
+        self._flush_interval = float(
+            options.get('FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL))
+        if self._metrics_alias not in _flushed_at_exit:
+            _flushed_at_exit.add(self._metrics_alias)
+            atexit.register(_flush_at_exit, self._metrics_alias)
+
+    @property
+    def _cache(self):
+        return caches[self._alias]
+
+    @property
+    def metrics_store(self):
+        return caches[self._metrics_alias]
+
+    def make_key(self, key, version=None):
+        return self._cache.make_key(key, version=version)
+
+    def _record(self, key, operation, started, **counts):
+        elapsed = time.perf_counter() - started
+        metrics = cache_metrics.metrics
+        group = cache_metrics.key_group(key)
+        if operation is not None:
+            metrics.observe(group, operation, elapsed)
+        for name, value in counts.items():
+            metrics.count(group, name, value)
+        if metrics.due(self._flush_interval):
+            self.flush_metrics()
+
+    def flush_metrics(self):
+        cache_metrics.flush(self.metrics_store)
+
+    def get(self, key, default=None, version=None):
+        started = time.perf_counter()
+        value = self._cache.get(key, self, version=version)
+        if value is self:
+            self._record(key, 'get', started, misses=1)
+            return default
+        self._record(key, 'get', started, hits=1)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        started = time.perf_counter()
+        self._cache.set(key, value, timeout, version=version)
+        self._record(key, 'set', started, sets=1)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        started = time.perf_counter()
+        added = self._cache.add(key, value, timeout, version=version)
+        if added:
+            self._record(key, 'set', started, sets=1)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        started = time.perf_counter()
+        self._cache.delete(key, version=version)
+        self._record(key, None, started, deletes=1)
+
+    def has_key(self, key, version=None):
+        return self._cache.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        started = time.perf_counter()
+        value = self._cache.incr(key, delta, version=version)
+        self._record(key, 'set', started, sets=1)
+        return value
+
+    def clear(self):
+        self._cache.clear()
+
+    def close(self, **kwargs):
+        self._cache.close(**kwargs)
@@ -0,0 +1,394 @@
+"""Кэш в общей памяти для всех процессов одного сервера.
+
+LocMemCache у каждого воркера свой: записи дублируются, попаданий тем
+меньше, чем больше воркеров, а delete() и incr() в одном процессе не
+видны остальным. Этот бэкенд хранит записи в файле, отображённом в
+память (mmap) всеми процессами, без внешнего сервиса:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.shared.SharedMemoryCache',
+            'LOCATION': '/dev/shm/yatube.cache',
+            'OPTIONS': {'SIZE': 64 * 2 ** 20, 'BUCKET_SIZE': 128 * 2 ** 10},
+        }
+    }
+
+Файл делится на корзины по BUCKET_SIZE байт; ключ попадает в корзину по
+хэшу (blake2b, одинаковому во всех процессах). Внутри корзины записи
+лежат подряд, каждая начинается с 8-байтного отпечатка ключа, так что
+запись ищется mmap.find(), а удаляется сдвигом хвоста — без разбора
+корзины в Python. Новая запись дописывается в конец; если места нет,
+корзина разбирается: просроченные записи выбрасываются, давно не
+читанные вытесняются (LRU внутри корзины), пока не освободится четверть
+места. Объём кэша ограничен SIZE, запись больше корзины не кэшируется,
+MAX_ENTRIES не используется.
+
+Между процессами корзины защищены блокировками fcntl на диапазон байт
+(читатели делят блокировку, писатель берёт её один), внутри процесса —
+общим threading.Lock. Без fcntl (Windows) блокируется весь файл.
+Менять SIZE и BUCKET_SIZE можно только при остановленных воркерах:
+файл с другими параметрами создаётся заново.
+
+Записи хранятся в pickle, и кто может писать в файл, тот выполнит код в
+процессах сервера. Поэтому файл и каталог создаются с правами только для
+владельца, а файл чужого пользователя, доступный группе или остальным
+или не обычный (например, ссылку) бэкенд открывать отказывается.
+"""
+import math
+import mmap
+import os
+import pickle
+import stat
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from hashlib import blake2b
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import locks
+
+from . import entry_evicted, entry_stored
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MAGIC = b'YTCACHE1'
+# magic, число корзин, размер корзины
+FILE_HEADER = struct.Struct('<8sII')
+FILE_HEADER_SIZE: int = 64
+# число записей, занято байт
+BUCKET_HEADER = struct.Struct('<II')
+# отпечаток ключа, длина ключа, длина значения, срок годности,
+# время последнего чтения
+ENTRY_HEADER = struct.Struct('<8sHIdd')
+EXPIRY_OFFSET = struct.calcsize('<8sHI')
+ACCESS_OFFSET = struct.calcsize('<8sHId')
+TIMESTAMP = struct.Struct('<d')
+DEFAULT_SIZE: int = 64 * 2 ** 20
+DEFAULT_BUCKET_SIZE: int = 128 * 2 ** 10
+# До какой доли корзины освобождать место при вытеснении
+EVICT_TO: float = 0.75
+
+
+class _Entry:
+    __slots__ = ('expiry', 'access', 'start', 'end', 'value_start')
+
+    def __init__(self, buffer, start):
+        _, key_length, value_length, self.expiry, self.access = (
+            ENTRY_HEADER.unpack_from(buffer, start))
+        self.start = start
+        self.value_start = start + ENTRY_HEADER.size + key_length
+        self.end = self.value_start + value_length
+
+    def key(self, buffer):
+        return buffer[self.start + ENTRY_HEADER.size:self.value_start]
+
+
+def _open_private(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, 0o700, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0),
+                 0o600)
+    info = os.fstat(fd)
+    problem = None
+    if not stat.S_ISREG(info.st_mode):
+        problem = 'не обычный файл'
+    elif hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        problem = 'принадлежит другому пользователю'
+    elif hasattr(os, 'getuid') and info.st_mode & 0o077:
+        problem = 'доступен группе или остальным'
+    if problem is not None:
+        os.close(fd)
+        raise ImproperlyConfigured(f'Файл кэша {path} {problem}')
+    return fd
+
+
+class _Mapping:
+    """Открытый файл кэша; один на процесс и путь."""
+
+    def __init__(self, path, bucket_count, bucket_size):
+        self.path = path
+        self.bucket_count = bucket_count
+        self.bucket_size = bucket_size
+        self.size = FILE_HEADER_SIZE + bucket_count * bucket_size
+        self.lock = threading.Lock()
+        self.fd = _open_private(path)
+        self.file = os.fdopen(self.fd, 'r+b', buffering=0)
+        with self.lock, self.locked(0, 0, exclusive=True):
+            if not self._matches():
+                self._initialize()
+        self.map = mmap.mmap(self.fd, self.size)
+
+    def _matches(self):
+        if os.fstat(self.fd).st_size != self.size:
+            return False
+        self.file.seek(0)
+        return self.file.read(FILE_HEADER.size) == FILE_HEADER.pack(
+            MAGIC, self.bucket_count, self.bucket_size)
+
+    def _initialize(self):
+        self.file.truncate(0)
+        self.file.truncate(self.size)
+        self.file.seek(0)
+        self.file.write(FILE_HEADER.pack(
+            MAGIC, self.bucket_count, self.bucket_size))
+
+    def after_fork(self):
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def locked(self, start, length, exclusive):
+        """Блокировка байт [start, start + length) между процессами;
+        length = 0 — до конца файла."""
+        if fcntl is None:
+            locks.lock(self.file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(self.file)
+            return
+        mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        fcntl.lockf(self.fd, mode, length, start)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, length, start)
+
+
+_mappings = {}
+_mappings_lock = threading.Lock()
+
+
+def _reset_locks_after_fork():
+    # Поток, державший блокировку при fork, в дочернем процессе не живёт.
+    global _mappings_lock
+    _mappings_lock = threading.Lock()
+    for mapping in _mappings.values():
+        mapping.after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+def _get_mapping(path, bucket_count, bucket_size):
+    with _mappings_lock:
+        mapping = _mappings.get(path)
+        if mapping is None or (mapping.bucket_count, mapping.bucket_size) != (
+                bucket_count, bucket_size):
+            mapping = _mappings[path] = _Mapping(
+                path, bucket_count, bucket_size)
+        return mapping
+
+
+class SharedMemoryCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = os.path.abspath(location)
+        self._bucket_size = int(
+            options.get('BUCKET_SIZE', DEFAULT_BUCKET_SIZE))
+        self._bucket_count = max(
+            1, int(options.get('SIZE', DEFAULT_SIZE)) // self._bucket_size)
+        self._capacity = self._bucket_size - BUCKET_HEADER.size
+
+    @property
+    def _mapping(self):
+        return _get_mapping(self._path, self._bucket_count,
+                            self._bucket_size)
+
+    @contextmanager
+    def _bucket(self, key, exclusive):
+        """Корзина ключа под блокировкой: (buffer, start, key, отпечаток)."""
+        key = key.encode()
+        digest = blake2b(key, digest_size=16).digest()
+        index = int.from_bytes(digest[:8], 'little') % self._bucket_count
+        start = FILE_HEADER_SIZE + index * self._bucket_size
+        mapping = self._mapping
+        with mapping.lock, mapping.locked(start, self._bucket_size,
+                                          exclusive):
+            yield mapping.map, start, key, digest[8:]
+
+    def _find(self, buffer, start, key, fingerprint):
+        """Запись ключа (в том числе просроченная) или None."""
+        _, used = BUCKET_HEADER.unpack_from(buffer, start)
+        begin = start + BUCKET_HEADER.size
+        end = begin + used
+        position = buffer.find(fingerprint, begin, end)
+        while position != -1:
+            entry = _Entry(buffer, position)
+            if entry.key(buffer) == key:
+                return entry
+            position = buffer.find(fingerprint, position + 1, end)
+        return None
+
+    def _live(self, buffer, start, key, fingerprint):
+        entry = self._find(buffer, start, key, fingerprint)
+        if entry is not None and entry.expiry > time.time():
+            return entry
+        return None
+
+    def _remove(self, buffer, start, entry):
+        """Удаляет запись, сдвигая хвост корзины на её место."""
+        count, used = BUCKET_HEADER.unpack_from(buffer, start)
+        tail_end = start + BUCKET_HEADER.size + used
+        size = entry.end - entry.start
+        buffer.move(entry.start, entry.end, tail_end - entry.end)
+        BUCKET_HEADER.pack_into(buffer, start, count - 1, used - size)
+
+    def _evict(self, buffer, start, needed):
+        """Освобождает место: выбрасывает просроченные записи, затем
+        давно не читанные, пока занято не больше EVICT_TO корзины."""
+        count, used = BUCKET_HEADER.unpack_from(buffer, start)
+        now = time.time()
+        entries = []
+        position = start + BUCKET_HEADER.size
+        for _ in range(count):
+            entry = _Entry(buffer, position)
+            if entry.expiry > now:
+                entries.append(entry)
+            position = entry.end
+        limit = min(self._capacity * EVICT_TO, self._capacity - needed)
+        kept, total = [], 0
+        for entry in sorted(entries, key=lambda entry: entry.access,
+                            reverse=True):
+            size = entry.end - entry.start
+            if total + size <= limit:
+                kept.append(entry)
+                total += size
+        if len(kept) < len(entries) and entry_evicted.has_listeners():
+            # Получатели вызываются под блокировкой корзины.
+            for entry in set(entries) - set(kept):
+                entry_evicted.send(sender=type(self),
+                                   key=entry.key(buffer).decode())
+        kept.sort(key=lambda entry: entry.start)
+        body = b''.join(buffer[entry.start:entry.end] for entry in kept)
+        begin = start + BUCKET_HEADER.size
+        buffer[begin:begin + len(body)] = body
+        BUCKET_HEADER.pack_into(buffer, start, len(kept), len(body))
+
+    def _append(self, buffer, start, key, fingerprint, data, expiry):
+        size = ENTRY_HEADER.size + len(key) + len(data)
+        if size > self._capacity:
+            # Больше корзины: не кэшируем.
+            return False
+        count, used = BUCKET_HEADER.unpack_from(buffer, start)
+        if used + size > self._capacity:
+            self._evict(buffer, start, size)
+            count, used = BUCKET_HEADER.unpack_from(buffer, start)
+        position = start + BUCKET_HEADER.size + used
+        ENTRY_HEADER.pack_into(buffer, position, fingerprint, len(key),
+                               len(data), expiry, time.time())
+        data_start = position + ENTRY_HEADER.size
+        buffer[data_start:data_start + len(key)] = key
+        buffer[data_start + len(key):position + size] = data
+        BUCKET_HEADER.pack_into(buffer, start, count + 1, used + size)
+        return True
+
+    def _replace(self, buffer, start, key, fingerprint, data, expiry):
+        entry = self._find(buffer, start, key, fingerprint)
+        if entry is not None:
+            self._remove(buffer, start, entry)
+        return self._append(buffer, start, key, fingerprint, data, expiry)
+
+    def _expiry(self, timeout):
+        expiry = self.get_backend_timeout(timeout)
+        return math.inf if expiry is None else expiry
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _stored(self, key, data):
+        if entry_stored.has_listeners():
+            entry_stored.send(sender=type(self), key=key, size=len(data))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = self._dumps(value)
+        with self._bucket(key, exclusive=True) as bucket:
+            if self._live(*bucket) is not None:
+                return False
+            stored = self._replace(*bucket, data, self._expiry(timeout))
+        if stored:
+            self._stored(key, data)
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._bucket(key, exclusive=False) as bucket:
+            entry = self._live(*bucket)
+            if entry is None:
+                return default
+            buffer = bucket[0]
+            # Отметка чтения для LRU; гонка читателей здесь безвредна.
+            TIMESTAMP.pack_into(buffer, entry.start + ACCESS_OFFSET,
+                                time.time())
+            data = buffer[entry.value_start:entry.end]
+        return pickle.loads(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = self._dumps(value)
+        with self._bucket(key, exclusive=True) as bucket:
+            stored = self._replace(*bucket, data, self._expiry(timeout))
+        if stored:
+            self._stored(key, data)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._bucket(key, exclusive=True) as bucket:
+            entry = self._live(*bucket)
+            if entry is None:
+                return False
+            TIMESTAMP.pack_into(bucket[0], entry.start + EXPIRY_OFFSET,
+                                self._expiry(timeout))
+            return True
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._bucket(key, exclusive=True) as bucket:
+            entry = self._find(*bucket)
+            if entry is not None:
+                self._remove(bucket[0], bucket[1], entry)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._bucket(key, exclusive=False) as bucket:
+            return self._live(*bucket) is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов, в отличие от BaseCache.incr()."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._bucket(key, exclusive=True) as bucket:
+            entry = self._live(*bucket)
+            if entry is None:
+                raise ValueError("Key '%s' not found" % key)
+            buffer = bucket[0]
+            value = pickle.loads(buffer[entry.value_start:entry.end]) + delta
+            data = self._dumps(value)
+            stored = self._replace(*bucket, data, entry.expiry)
+        if stored:
+            self._stored(key, data)
+        return value
+
+    def clear(self):
+        mapping = self._mapping
+        with mapping.lock, mapping.locked(0, 0, exclusive=True):
+            for index in range(self._bucket_count):
+                BUCKET_HEADER.pack_into(
+                    mapping.map,
+                    FILE_HEADER_SIZE + index * self._bucket_size, 0, 0)
@@ -0,0 +1,223 @@
+"""Двухуровневый кэш: маленький LRU в процессе (L1) перед общим (L2).
+
+Даже общий кэш на каждое попадание берёт блокировку, копирует и
+распаковывает запись. Горячие ключи (первая страница главной, версии
+списков, фрагменты шаблонов) этот бэкенд отдаёт из памяти процесса:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.tiered.TieredCache',
+            'LOCATION': 'default',
+            'OPTIONS': {'L2': 'shared', 'MAX_ENTRIES': 500,
+                        'CHECK_INTERVAL': 1.0},
+        },
+        'shared': {...},
+    }
+
+Каждая запись в L2 сопровождается штампом версии (ключ «<ключ>.stamp»),
+который меняется при любой записи, удалении и incr() в любом процессе.
+Запись L1 отдаётся без обращения к L2 не дольше CHECK_INTERVAL секунд,
+потом её штамп сверяется с L2 — это дешёвое чтение маленького числа.
+Если штамп другой или пропал, запись L1 выбрасывается и значение
+читается из L2. Так чужая инвалидация доходит до L1 не позже чем через
+CHECK_INTERVAL.
+
+В L1 попадает только прочитанное из L2: записавший процесс свою запись
+L1 выбрасывает. Запись значения и штампа — два шага без блокировки, и
+два пишущих могут их перемешать: в L2 останется значение второго со
+штампом первого. Запомни первый своё значение с этим штампом, проверка
+штампа его бы уже не заменила.
+
+Неизменяемые значения (числа, строки, кортежи из них) хранятся в L1
+как есть, остальные — в pickle: иначе два запроса получили бы один и тот
+же объект ответа и меняли бы его заголовки друг у друга.
+
+Счётчики попаданий и промахов по уровням — в TieredCache.stats().
+"""
+import os
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+DEFAULT_CHECK_INTERVAL: float = 1.0
+DEFAULT_L2: str = 'shared'
+IMMUTABLE_TYPES = (type(None), bool, int, float, complex, str, bytes)
+STAT_NAMES = ('l1_hits', 'l1_misses', 'l1_stale', 'l2_hits', 'l2_misses')
+
+
+def _is_immutable(value):
+    if isinstance(value, (tuple, frozenset)):
+        return all(_is_immutable(item) for item in value)
+    return type(value) in IMMUTABLE_TYPES
+
+
+def _fresh_stamp():
+    return time.time_ns()
+
+
+class _Entry:
+    __slots__ = ('payload', 'pickled', 'stamp', 'checked_at')
+
+    def __init__(self, value, stamp):
+        self.pickled = not _is_immutable(value)
+        self.payload = (pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                        if self.pickled else value)
+        self.stamp = stamp
+        self.checked_at = time.monotonic()
+
+    def value(self):
+        return pickle.loads(self.payload) if self.pickled else self.payload
+
+
+class _LocalTier:
+    """L1 одного процесса: общий для всех потоков, как LocMemCache."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+
+_tiers = {}
+
+
+def _reset_locks_after_fork():
+    for tier in _tiers.values():
+        tier.lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+class TieredCache(BaseCache):
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options.get('L2', DEFAULT_L2)
+        self._check_interval = float(
+            options.get('CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL))
+        self._tier = _tiers.setdefault(name, _LocalTier())
+
+    @property
+    def _l2(self):
+        return caches[self._l2_alias]
+
+    def make_key(self, key, version=None):
+        # Префикс и версию ключа задаёт L2.
+        return self._l2.make_key(key, version=version)
+
+    def _stamp_key(self, key):
+        return f'{key}.stamp'
+
+    def _count(self, *names):
+        with self._tier.lock:
+            self._tier.stats.update(names)
+
+    def _local(self, key):
+        with self._tier.lock:
+            entry = self._tier.entries.get(key)
+            if entry is not None:
+                self._tier.entries.move_to_end(key)
+            return entry
+
+    def _remember(self, key, value, stamp):
+        entry = _Entry(value, stamp)
+        with self._tier.lock:
+            entries = self._tier.entries
+            entries[key] = entry
+            entries.move_to_end(key)
+            while len(entries) > self._max_entries:
+                entries.popitem(last=False)
+
+    def _forget(self, key):
+        with self._tier.lock:
+            self._tier.entries.pop(key, None)
+
+    def _publish(self, key, timeout, version):
+        """Новый штамп: L1 всех процессов перечитают значение."""
+        self._l2.set(self._stamp_key(key), _fresh_stamp(), timeout,
+                     version=version)
+        self._forget(self.make_key(key, version=version))
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_key(key, version=version)
+        l2 = self._l2
+        stamp_key = self._stamp_key(key)
+        entry = self._local(full_key)
+        stamp = None
+        if entry is not None:
+            # Срок записи L1 не хранит: истёкшее в L2 значение уносит
+            # с собой штамп, и проверка его не пропустит.
+            if time.monotonic() - entry.checked_at < self._check_interval:
+                self._count('l1_hits')
+                return entry.value()
+            stamp = l2.get(stamp_key, version=version)
+            if stamp is not None and stamp == entry.stamp:
+                entry.checked_at = time.monotonic()
+                self._count('l1_hits')
+                return entry.value()
+            self._count('l1_stale')
+        else:
+            stamp = l2.get(stamp_key, version=version)
+        # Штамп читается раньше значения: пишущий меняет их в обратном
+        # порядке, поэтому значение не может оказаться старше штампа.
+        value = l2.get(key, self, version=version)
+        if value is self:
+            self._forget(full_key)
+            self._count('l1_misses', 'l2_misses')
+            return default
+        self._count('l1_misses', 'l2_hits')
+        if stamp is None:
+            # Штамп вытеснили: без него запись L1 нельзя проверить.
+            self._forget(full_key)
+        else:
+            self._remember(full_key, value, stamp)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l2.set(key, value, timeout, version=version)
+        self._publish(key, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self._l2.add(key, value, timeout, version=version):
+            return False
+        self._publish(key, timeout, version)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._forget(self.make_key(key, version=version))
+        self._l2.touch(self._stamp_key(key), timeout, version=version)
+        return self._l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l2.delete(key, version=version)
+        self._l2.delete(self._stamp_key(key), version=version)
+        self._forget(self.make_key(key, version=version))
+
+    def incr(self, key, delta=1, version=None):
+        value = self._l2.incr(key, delta, version=version)
+        # Срок жизни значения здесь неизвестен, штамп живёт бессрочно.
+        self._publish(key, None, version)
+        return value
+
+    def clear(self):
+        self._l2.clear()
+        with self._tier.lock:
+            self._tier.entries.clear()
+
+    def close(self, **kwargs):
+        self._l2.close(**kwargs)
+
+    def stats(self):
+        """Попадания и промахи по уровням в этом процессе."""
+        with self._tier.lock:
+            return {name: self._tier.stats[name] for name in STAT_NAMES}
+
+    def reset_stats(self):
+        with self._tier.lock:
+            self._tier.stats.clear()
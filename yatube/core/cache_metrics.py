@@ -0,0 +1,250 @@
+"""Метрики кэша: попадания, промахи, записи, вытеснения, байты и
+задержки по группам ключей.
+
+Счётчики копит InstrumentedCache (core.cache_backends.instrumented) в
+памяти процесса. Раз в FLUSH_INTERVAL секунд процесс кладёт свой снимок
+в кэш метрик (обычно общий для воркеров), поэтому collect() видит сумму
+по всем процессам — и в /metrics/cache/, и в команде cache_metrics,
+которая сама запросов не обслуживает. Записанные байты и вытеснения
+сообщает сам бэкенд (сигналы core.cache_backends), без повторной
+сериализации значений.
+
+Счётчики Prometheus не должны уменьшаться, иначе rate() увидит сброс.
+Поэтому снимки завершившихся процессов (и вытесненных из списка больше
+MAX_PROCESSES) не пропадают, а прибавляются к накопленному «retired» —
+он лежит в одном ключе со списком процессов и меняется вместе с ним.
+
+Группа ключа — кэш страницы (page:<список>), фрагмент шаблона
+(fragment:<имя>), страница для гостей, версии, кэши ORM и т.д., см.
+key_group().
+"""
+import bisect
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.dispatch import receiver
+
+from core.cache_backends import entry_evicted, entry_stored
+
+COUNTERS = ('hits', 'misses', 'sets', 'deletes', 'evictions', 'bytes')
+# Верхние границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, float('inf'))
+KEY_GROUPS = (
+    ('anonymous-page-generation', 'version'),
+    ('anonymous-page:', 'anonymous_page'),
+    ('listing-version:', 'version'),
+    ('swr-lock:', 'lock'),
+    ('choices:', 'orm:choices'),
+    ('sorl-thumbnail', 'orm:thumbnails'),
+)
+KEY_PREFIX: str = 'cache-metrics:'
+# {'processes': [...], 'retired': снимок} — меняется одной записью
+REGISTRY_KEY: str = 'cache-metrics:registry'
+LOCK_KEY: str = 'cache-metrics:lock'
+LOCK_TIMEOUT: int = 10
+MAX_PROCESSES: int = 256
+# Снимок выбывшего процесса живёт ещё немного: collect() мог прочитать
+# список до того, как снимок перешёл в retired.
+RETIRED_SNAPSHOT_TIMEOUT: int = 60
+
+
+def key_group(key):
+    """Группа ключа для метрик: 'page:index', 'fragment:index_page', …"""
+    for prefix, kind in (('swr.page.', 'page'),
+                         ('template.cache.', 'fragment')):
+        if key.startswith(prefix):
+            return f'{kind}:{key[len(prefix):].split(".", 1)[0]}'
+    for prefix, group in KEY_GROUPS:
+        if key.startswith(prefix):
+            return group
+    return 'other'
+
+
+def _snapshot_key(process):
+    return f'cache-metrics:process:{process}'
+
+
+class Metrics:
+    """Счётчики одного процесса."""
+
+    def __init__(self):
+        # pid может достаться новому процессу, а снимки не должны
+        # затирать друг друга.
+        self.process = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.latency = Counter()
+        self.flushed_at = time.monotonic()
+
+    def count(self, group, name, value=1):
+        with self.lock:
+            self.counters[group, name] += value
+
+    def observe(self, group, operation, seconds):
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self.lock:
+            self.latency[group, operation, bucket] += 1
+            self.latency[group, operation, 'sum'] += seconds
+
+    def snapshot(self):
+        with self.lock:
+            return {'counters': dict(self.counters),
+                    'latency': dict(self.latency)}
+
+    def due(self, interval):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.flushed_at < interval:
+                return False
+            self.flushed_at = now
+            return True
+
+
+metrics = Metrics()
+
+
+def _reset_after_fork():
+    # Счётчики родителя уже учтены в его снимке.
+    global metrics
+    metrics = Metrics()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def reset():
+    _reset_after_fork()
+
+
+def _backend_key(key):
+    """Ключ без «префикс:версия:»; None — служебный ключ, не считается."""
+    key = key.split(':', 2)[-1]
+    if key.endswith('.stamp') or key.startswith(KEY_PREFIX):
+        return None
+    return key
+
+
+@receiver(entry_evicted)
+def count_eviction(sender, key, **kwargs):
+    key = _backend_key(key)
+    if key is not None:
+        metrics.count(key_group(key), 'evictions')
+
+
+@receiver(entry_stored)
+def count_bytes(sender, key, size, **kwargs):
+    key = _backend_key(key)
+    if key is not None:
+        metrics.count(key_group(key), 'bytes', size)
+
+
+def _empty():
+    return {'counters': {}, 'latency': {}}
+
+
+def _add(total, snapshot):
+    for part in ('counters', 'latency'):
+        merged = Counter(total[part])
+        merged.update(snapshot[part])
+        total[part] = dict(merged)
+    return total
+
+
+def flush(store, retire=False):
+    """Кладёт снимок этого процесса в store и регистрирует процесс;
+    retire=True — процесс завершается, снимок переходит в retired."""
+    process = metrics.process
+    key = _snapshot_key(process)
+    store.set(key, metrics.snapshot(), None)
+    registry = store.get(REGISTRY_KEY)
+    if not retire and registry and process in registry['processes']:
+        return
+    # Список меняют под блокировкой; занята — попробуем при следующем
+    # сбросе, а завершившийся процесс выбудет по MAX_PROCESSES.
+    if not store.add(LOCK_KEY, process, LOCK_TIMEOUT):
+        return
+    try:
+        registry = store.get(REGISTRY_KEY) or {
+            'processes': [], 'retired': _empty()}
+        processes = [name for name in registry['processes']
+                     if name != process]
+        if not retire:
+            processes.append(process)
+        departed = processes[:-MAX_PROCESSES] + ([process] if retire else [])
+        retired = registry['retired']
+        departed_keys = [_snapshot_key(name) for name in departed]
+        for snapshot in store.get_many(departed_keys).values():
+            retired = _add(retired, snapshot)
+        store.set(REGISTRY_KEY, {'processes': processes[-MAX_PROCESSES:],
+                                 'retired': retired}, None)
+        for departed_key in departed_keys:
+            store.touch(departed_key, RETIRED_SNAPSHOT_TIMEOUT)
+    finally:
+        store.delete(LOCK_KEY)
+    if retire:
+        # Что посчитается после выбытия, пойдёт в снимок нового процесса.
+        reset()
+
+
+def collect(store):
+    """Сумма снимков всех процессов: (counters, latency)."""
+    registry = store.get(REGISTRY_KEY) or {
+        'processes': [], 'retired': _empty()}
+    total = dict(registry['retired'])
+    snapshots = store.get_many(
+        [_snapshot_key(name) for name in registry['processes']])
+    for snapshot in snapshots.values():
+        total = _add(total, snapshot)
+    return Counter(total['counters']), Counter(total['latency'])
+
+
+def groups(counters, latency):
+    return sorted({key[0] for key in counters} | {key[0] for key in latency})
+
+
+def quantile(latency, group, operation, share):
+    """Оценка квантиля задержки по гистограмме (верхняя граница)."""
+    counts = [latency.get((group, operation, bucket), 0)
+              for bucket in range(len(LATENCY_BUCKETS))]
+    total = sum(counts)
+    if not total:
+        return None
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS, counts):
+        seen += count
+        if seen >= share * total:
+            return bound
+    return LATENCY_BUCKETS[-1]
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus(counters, latency):
+    """Метрики в текстовом формате Prometheus."""
+    lines = []
+    for name in COUNTERS:
+        metric = f'yatube_cache_{name}_total'
+        lines.append(f'# TYPE {metric} counter')
+        for group in groups(counters, latency):
+            lines.append(f'{metric}{{group="{_label(group)}"}} '
+                         f'{counters.get((group, name), 0)}')
+    metric = 'yatube_cache_latency_seconds'
+    lines.append(f'# TYPE {metric} histogram')
+    for group, operation in sorted({key[:2] for key in latency}):
+        labels = f'group="{_label(group)}",operation="{operation}"'
+        seen = 0
+        for bucket, bound in enumerate(LATENCY_BUCKETS):
+            seen += latency.get((group, operation, bucket), 0)
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {seen}')
+        lines.append(f'{metric}_sum{{{labels}}} '
+                     f'{latency.get((group, operation, "sum"), 0.0):.6f}')
+        lines.append(f'{metric}_count{{{labels}}} {seen}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,242 @@
+"""Кэш с защитой от «набегов» (cache stampede).
+
+Запись хранится дольше своего «мягкого» срока годности. Когда срок
+истёк, пересчитывает значение только один вызывающий — тот, кто взял
+блокировку (threading.Lock внутри процесса и cache.add() между
+процессами), а остальные в это время получают старое значение
+(stale-while-revalidate). Кроме того, незадолго до истечения запись
+с некоторой вероятностью обновляется заранее (алгоритм XFetch), поэтому
+горячие ключи обычно вообще не доходят до истечения.
+
+Страницы, которые отличаются у пользователей лишь шапкой и похожими
+мелочами, кэшируются одной «оболочкой» на всех: такие куски шаблона
+подключаются тегом {% hole %} (core.templatetags.holes) и в оболочке
+остаются метками, а fill_holes() дорисовывает их для каждого запроса.
+
+Страница хранится кортежем (содержимое, заголовки) из байтов и строк:
+двухуровневый кэш отдаёт такое значение из памяти процесса без pickle.
+"""
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from functools import wraps
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+
+EARLY_REFRESH_BETA: float = 1.0
+LOCK_TIMEOUT: int = 30
+MISS_WAIT: float = 2.0
+MISS_POLL: float = 0.05
+HOLE_MARKER = '<!--hole:{}-->'
+# Текст пользователей экранируется, поэтому «<!--» в нём быть не может.
+HOLE = re.compile(r'<!--hole:([\w./-]+)-->')
+
+
+class _KeyLocks:
+    """Блокировки по ключу внутри процесса; лишние сразу забываются."""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}
+
+    def acquire(self, key, blocking):
+        with self._guard:
+            lock, users = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, users + 1)
+        if lock.acquire(blocking):
+            return True
+        self._forget(key)
+        return False
+
+    def release(self, key):
+        self._locks[key][0].release()
+        self._forget(key)
+
+    def _forget(self, key):
+        with self._guard:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+
+_key_locks = _KeyLocks()
+
+
+def _lock_key(key):
+    return f'swr-lock:{key}'
+
+
+def _should_refresh(expires_at, delta, beta, now):
+    """XFetch: чем ближе срок и дольше пересчёт, тем выше шанс обновить."""
+    return now - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _store(cache, key, compute, timeout, stale_timeout):
+    started = time.time()
+    value = compute()
+    finished = time.time()
+    entry = (value, finished + timeout, finished - started)
+    cache.set(key, entry, timeout + stale_timeout)
+    return value
+
+
+def _wait_for(cache, key):
+    deadline = time.time() + MISS_WAIT
+    while time.time() < deadline:
+        time.sleep(MISS_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _refresh(cache, key, compute, timeout, stale_timeout, entry):
+    if entry is None:
+        entry = cache.get(key)
+        if entry is not None:
+            # Пока ждали блокировку, значение посчитал другой поток.
+            return entry[0]
+    if cache.add(_lock_key(key), 1, LOCK_TIMEOUT):
+        try:
+            return _store(cache, key, compute, timeout, stale_timeout)
+        finally:
+            cache.delete(_lock_key(key))
+    if entry is None:
+        # Старого значения нет, а пересчитывает другой процесс: ждём его
+        # результат, но не дольше MISS_WAIT.
+        entry = _wait_for(cache, key)
+    if entry is None:
+        return _store(cache, key, compute, timeout, stale_timeout)
+    return entry[0]
+
+
+def get_or_refresh(key, compute, timeout, stale_timeout=None,
+                   beta=EARLY_REFRESH_BETA, cache_alias='default'):
+    """Значение по ключу; compute() вызывается не чаще одного раза сразу.
+
+    timeout — «мягкий» срок годности, stale_timeout — сколько после него
+    ещё можно отдавать старое значение, пока кто-то его пересчитывает.
+    """
+    cache = caches[cache_alias]
+    if stale_timeout is None:
+        stale_timeout = timeout
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires_at, delta = entry
+        if not _should_refresh(expires_at, delta, beta, time.time()):
+            return value
+    if not _key_locks.acquire(key, blocking=entry is None):
+        # Этот же процесс уже пересчитывает ключ.
+        return entry[0]
+    try:
+        return _refresh(cache, key, compute, timeout, stale_timeout, entry)
+    finally:
+        _key_locks.release(key)
+
+
+class _Uncacheable(Exception):
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def _page_key(request, key_prefix, vary):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    varied = hashlib.md5('|'.join(
+        request.META.get('HTTP_' + header.upper().replace('-', '_'), '')
+        for header in vary
+    ).encode()).hexdigest()
+    return f'swr.page.{key_prefix}.{request.method}.{url}.{varied}'
+
+
+def _render_page(view, request, args, kwargs, holes):
+    """Ответ view для кэша; с holes=True — оболочка с метками."""
+    request.punch_holes = holes
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+    finally:
+        request.punch_holes = False
+    if (response.status_code != 200 or response.cookies
+            or response.streaming):
+        raise _Uncacheable(response)
+    return freeze_response(response)
+
+
+def freeze_response(response):
+    """Ответ в виде (содержимое, заголовки) для кэша."""
+    return response.content, tuple(response.items())
+
+
+def thaw_response(entry):
+    """HttpResponse из значения freeze_response()."""
+    content, headers = entry
+    headers = dict(headers)
+    # content_type явно: без него HttpResponse читает устаревшую настройку
+    # DEFAULT_CONTENT_TYPE, а это медленнее всей остальной отдачи из кэша.
+    response = HttpResponse(
+        content, content_type=headers.pop('Content-Type', None))
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def fill_holes(request, response):
+    """Дорисовывает в оболочке страницы куски {% hole %} для запроса."""
+    content = response.content.decode(response.charset)
+    response.content = HOLE.sub(
+        lambda match: render_to_string(match.group(1), request=request),
+        content)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def swr_cache_page(timeout, key_prefix='', stale_timeout=None,
+                   vary=('Cookie',), cache_alias='default', holes=False):
+    """Замена cache_page с stale-while-revalidate и одним пересчётом.
+
+    Ключ зависит от URL и заголовков из vary (по умолчанию Cookie).
+    Кэшируются только успешные GET/HEAD-ответы без новых cookies.
+    key_prefix может быть функцией от запроса и аргументов view.
+    С holes=True кэшируется оболочка с метками вместо {% hole %}, общая
+    для всех пользователей, если vary их не различает; метки
+    заполняются на каждый запрос.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                response = view(request, *args, **kwargs)
+                patch_vary_headers(response, vary)
+                return response
+            prefix = key_prefix
+            if callable(prefix):
+                prefix = prefix(request, *args, **kwargs)
+
+            def compute():
+                return _render_page(view, request, args, kwargs, holes)
+
+            try:
+                response = thaw_response(get_or_refresh(
+                    _page_key(request, prefix, vary), compute, timeout,
+                    stale_timeout=stale_timeout, cache_alias=cache_alias,
+                ))
+            except _Uncacheable as uncacheable:
+                response = uncacheable.response
+            if holes and not response.streaming:
+                fill_holes(request, response)
+            patch_vary_headers(response, vary)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,37 @@
+"""Разбор планов запросов SQLite (EXPLAIN QUERY PLAN)."""
+from django.db import connections
+
+FULL_SCAN: str = 'полный просмотр таблицы'
+TEMP_SORT: str = 'сортировка во временном B-дереве'
+
+
+def query_plan(query):
+    """Строки плана для RecordedQuery из QueryRecorder."""
+    connection = connections[query.alias]
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + query.sql, query.params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan, sql):
+    """Пары (строка плана, проблема) для полных просмотров и сортировок.
+
+    Полный просмотр без WHERE (например, все группы для формы) неизбежен
+    и проблемой не считается.
+    """
+    filtered = ' WHERE ' in sql
+    problems = []
+    for detail in plan:
+        if (filtered and detail.startswith('SCAN')
+                and 'USING' not in detail):
+            problems.append((detail, FULL_SCAN))
+        elif 'TEMP B-TREE' in detail:
+            problems.append((detail, TEMP_SORT))
+    return problems
+
+
+def explainable(query):
+    """EXPLAIN имеет смысл только для SELECT в SQLite."""
+    connection = connections[query.alias]
+    return (connection.vendor == 'sqlite'
+            and query.sql.lstrip().upper().startswith('SELECT'))
@@ -0,0 +1,59 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from core import cache_metrics
+
+HEADERS = ('группа', 'попадания', 'промахи', 'доля', 'записи',
+           'вытеснено', 'записано КБ', 'get p50 мс', 'get p95 мс',
+           'set p95 мс')
+
+
+def _milliseconds(seconds):
+    if seconds is None:
+        return '-'
+    if seconds == float('inf'):
+        return '>100'
+    return f'{seconds * 1000:g}'
+
+
+class Command(BaseCommand):
+    help = ('Сводка метрик кэша по группам ключей: попадания, промахи, '
+            'записи, вытеснения, объём и задержки по всем процессам')
+
+    def handle(self, *args, **options):
+        cache = caches['default']
+        store = getattr(cache, 'metrics_store', None)
+        if store is None:
+            self.stderr.write(
+                'Кэш default без метрик: нужен InstrumentedCache')
+            return
+        counters, latency = cache_metrics.collect(store)
+        rows = []
+        total_hits = total_reads = 0
+        for group in cache_metrics.groups(counters, latency):
+            hits = counters.get((group, 'hits'), 0)
+            misses = counters.get((group, 'misses'), 0)
+            reads = hits + misses
+            total_hits += hits
+            total_reads += reads
+            rows.append((
+                group, hits, misses,
+                f'{hits / reads:.0%}' if reads else '-',
+                counters.get((group, 'sets'), 0),
+                counters.get((group, 'evictions'), 0),
+                round(counters.get((group, 'bytes'), 0) / 1024, 1),
+                _milliseconds(cache_metrics.quantile(
+                    latency, group, 'get', 0.5)),
+                _milliseconds(cache_metrics.quantile(
+                    latency, group, 'get', 0.95)),
+                _milliseconds(cache_metrics.quantile(
+                    latency, group, 'set', 0.95)),
+            ))
+        widths = [max(len(str(value)) for value in column)
+                  for column in zip(HEADERS, *rows)]
+        for row in (HEADERS, *rows):
+            self.stdout.write('  '.join(
+                str(value).rjust(width) for value, width in zip(row, widths)))
+        rate = f'{total_hits / total_reads:.0%}' if total_reads else '-'
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего чтений: {total_reads}, попаданий: {rate}'))
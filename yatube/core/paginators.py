@@ -0,0 +1,203 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+CURSOR_NEXT: str = 'n'
+CURSOR_PREVIOUS: str = 'p'
+EXACT_COUNT_LIMIT: int = 10000
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, values):
+    """Упаковывает направление и значения ключа в непрозрачный токен."""
+    raw = json.dumps([direction, list(values)], separators=(',', ':'))
+    token = base64.urlsafe_b64encode(raw.encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен из encode_cursor()."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, values = json.loads(raw.decode())
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise InvalidCursor('Некорректный курсор')
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS):
+        raise InvalidCursor('Некорректное направление курсора')
+    if not isinstance(values, list):
+        raise InvalidCursor('Некорректные значения курсора')
+    return direction, values
+
+
+class CursorPaginator(Paginator):
+    """Paginator с keyset-режимом.
+
+    Помимо обычных номерных страниц умеет отдавать страницы по курсору:
+    выборка идёт по условию на ключ сортировки, без COUNT(*) и OFFSET,
+    поэтому любая страница стоит столько же, сколько первая.
+
+    У курсорной страницы нет номера (number is None), вместо него есть
+    атрибуты cursor, next_cursor и previous_cursor; методы has_next() и
+    соседние номера для неё не вызываются — они посчитали бы COUNT(*).
+    """
+
+    ordering = ('-pub_date', '-id')
+
+    def __init__(self, object_list, per_page, ordering=None, **kwargs):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page,
+                         **kwargs)
+
+    @property
+    def _keys(self):
+        return [
+            (name.lstrip('-'), name.startswith('-'))
+            for name in self.ordering
+        ]
+
+    def _key_values(self, obj):
+        opts = self.object_list.model._meta
+        return [
+            opts.get_field(name).value_to_string(obj)
+            for name, _ in self._keys
+        ]
+
+    def _parse_values(self, values):
+        opts = self.object_list.model._meta
+        if len(values) != len(self._keys):
+            raise InvalidCursor('Курсор не соответствует сортировке')
+        try:
+            return [
+                opts.get_field(name).to_python(value)
+                for (name, _), value in zip(self._keys, values)
+            ]
+        except ValidationError:
+            raise InvalidCursor('Некорректные значения курсора')
+
+    def _seek(self, values, forward):
+        """Условие «строго после ключа» в порядке сортировки (или до него)."""
+        condition = Q()
+        for position, (name, descending) in enumerate(self._keys):
+            lookup = 'lt' if descending == forward else 'gt'
+            prefix = {
+                key_name: values[index]
+                for index, (key_name, _) in enumerate(self._keys[:position])
+            }
+            prefix['%s__%s' % (name, lookup)] = values[position]
+            condition |= Q(**prefix)
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else '-' + name
+            for name in self.ordering
+        ]
+
+    def cursor_page(self, cursor=None):
+        """Страница по курсору; без курсора — первая страница."""
+        if not cursor:
+            items = list(self.object_list[:self.per_page + 1])
+            has_more = len(items) > self.per_page
+            items = items[:self.per_page]
+            return self._build_page(items, '', has_next=has_more,
+                                    has_previous=False)
+        direction, values = decode_cursor(cursor)
+        values = self._parse_values(values)
+        forward = direction == CURSOR_NEXT
+        queryset = self.object_list.filter(self._seek(values, forward))
+        if not forward:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if forward:
+            return self._build_page(items, cursor, has_next=has_more,
+                                    has_previous=True)
+        items.reverse()
+        return self._build_page(items, cursor, has_next=True,
+                                has_previous=has_more)
+
+    def get_cursor_page(self, cursor=None):
+        """Как cursor_page(), но битый курсор ведёт на первую страницу."""
+        try:
+            return self.cursor_page(cursor)
+        except InvalidCursor:
+            return self.cursor_page()
+
+    def _build_page(self, items, cursor, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if items and has_next:
+            next_cursor = encode_cursor(
+                CURSOR_NEXT, self._key_values(items[-1]))
+        if items and has_previous:
+            previous_cursor = encode_cursor(
+                CURSOR_PREVIOUS, self._key_values(items[0]))
+        return make_cursor_page(self, items, cursor, next_cursor,
+                                previous_cursor)
+
+
+def make_cursor_page(paginator, items, cursor, next_cursor, previous_cursor):
+    """Собирает курсорную страницу (обычный Page без номера)."""
+    page = paginator._get_page(items, None, paginator)
+    page.is_cursor = True
+    page.cursor = cursor
+    page.next_cursor = next_cursor
+    page.previous_cursor = previous_cursor
+    return page
+
+
+def estimate_table_rows(model, using='default'):
+    """Число строк таблицы по статистике СУБД; None — статистики нет."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s', [table])
+        elif connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [table])
+            except DatabaseError:
+                # ANALYZE ещё ни разу не запускали.
+                return None
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    # В sqlite_stat1 первое число в строке stat — число строк таблицы.
+    estimate = int(float(str(row[0]).split()[0]))
+    return estimate if estimate > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator без полного COUNT(*) по большим таблицам.
+
+    Точно считаются только первые count_limit строк. Если их больше, для
+    выборки без фильтров число берётся из статистики СУБД, а для
+    отфильтрованной остаётся count_limit + 1 — дальше листать всё равно
+    никто не станет.
+    """
+
+    count_limit = EXACT_COUNT_LIMIT
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        exact = queryset.order_by()[:self.count_limit + 1].count()
+        if exact <= self.count_limit or queryset.query.where:
+            return exact
+        estimate = estimate_table_rows(queryset.model, queryset.db)
+        return max(estimate or 0, exact)
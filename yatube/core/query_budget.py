@@ -0,0 +1,120 @@
+"""Бюджет SQL-запросов на view.
+
+Бюджет задаётся декоратором @query_budget на view или словарём
+QUERY_BUDGETS в настройках (имя URL -> (запросов, секунд)); view из
+пространств имён QUERY_BUDGET_IGNORE_NAMESPACES не проверяются.
+QueryBudgetMiddleware считает запросы и их время на каждый запрос
+и в зависимости от QUERY_BUDGET_MODE пишет предупреждение ('warn'),
+бросает QueryBudgetExceeded ('raise') или ничего не делает ('off').
+"""
+import logging
+import time
+from collections import namedtuple
+from contextlib import ExitStack
+from functools import partial
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+Budget = namedtuple('Budget', ['queries', 'seconds'])
+RecordedQuery = namedtuple('RecordedQuery', ['sql', 'params', 'seconds',
+                                             'alias'])
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(queries, seconds=None):
+    """Объявляет бюджет view; ставить самым внешним декоратором."""
+    def decorator(view):
+        view.query_budget = Budget(queries, seconds)
+        return view
+    return decorator
+
+
+class QueryRecorder:
+    """Считает запросы и суммарное время во всех подключениях к БД."""
+
+    def __init__(self):
+        self.queries = []
+        self._stack = ExitStack()
+
+    def __enter__(self):
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(
+                partial(self._record, connection.alias)))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def _record(self, alias, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(RecordedQuery(
+                sql, params, time.perf_counter() - started, alias))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(query.seconds for query in self.queries)
+
+
+def get_budget(resolver_match):
+    """Бюджет view по результату resolve(); None — бюджета нет."""
+    if resolver_match is None:
+        return None
+    if set(resolver_match.namespaces) & set(
+            settings.QUERY_BUDGET_IGNORE_NAMESPACES):
+        return None
+    budget = getattr(resolver_match.func, 'query_budget', None)
+    if budget is not None:
+        return budget
+    configured = settings.QUERY_BUDGETS.get(resolver_match.view_name)
+    if configured is not None:
+        return Budget(*configured)
+    return Budget(*settings.QUERY_BUDGET_DEFAULT)
+
+
+def budget_violation(budget, recorder):
+    """Текст нарушения бюджета или None."""
+    if budget is None:
+        return None
+    if budget.queries is not None and recorder.count > budget.queries:
+        return (f'{recorder.count} запросов при бюджете '
+                f'{budget.queries}')
+    if budget.seconds is not None and recorder.seconds > budget.seconds:
+        return (f'{recorder.seconds:.3f} с в запросах при бюджете '
+                f'{budget.seconds} с')
+    return None
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = settings.QUERY_BUDGET_MODE
+        if mode == 'off':
+            return self.get_response(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        logger.debug('%s: %d запросов, %.3f с', view_name,
+                     recorder.count, recorder.seconds)
+        violation = budget_violation(get_budget(match), recorder)
+        if violation is not None:
+            message = f'{view_name}: {violation}'
+            if mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,93 @@
+"""Хранилище, которое называет файлы по содержимому.
+
+Файл posts/photo.JPG с SHA-256 abcd… сохраняется как
+posts/ab/cd/abcd….jpg: каталоги двух уровней по 256 вариантов держат
+в каждом каталоге немного файлов, а одинаковые загрузки получают одно
+имя и хранятся один раз.
+
+Файл может оказаться общим для нескольких записей, поэтому удалять его
+вместе с одной из них нельзя. Если одинаковые файлы сохраняются
+одновременно, второй получает имя первого, а не имя с суффиксом.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import locks
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+SHARDED_NAME = re.compile(
+    r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(?:\.\w+)?$')
+EXTENSION_ALIASES = {'.jpeg': '.jpg'}
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def sharded_name(name, digest):
+    """posts/photo.JPG + хэш -> posts/ab/cd/<хэш>.jpg"""
+    dir_name, file_name = os.path.split(name)
+    ext = os.path.splitext(file_name)[1].lower()
+    ext = EXTENSION_ALIASES.get(ext, ext)
+    return os.path.join(dir_name, digest[:2], digest[2:4], digest + ext)
+
+
+def is_sharded(name):
+    return bool(SHARDED_NAME.search(name))
+
+
+class _AlreadyStored(Exception):
+    """Файл с этим именем появился, пока сохранялся такой же."""
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage с именами по SHA-256 содержимого и без дублей."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = content_hash(content)
+        name = sharded_name(name, digest)
+        if self.exists(name):
+            # Те же байты уже лежат под этим именем.
+            return name
+        try:
+            return super().save(name, content, max_length)
+        except _AlreadyStored:
+            if self._holds(name, digest):
+                return name
+            raise FileExistsError(
+                f'{name}: содержимое не совпадает с именем') from None
+
+    def get_available_name(self, name, max_length=None):
+        # Имя по хэшу не меняется: суффикс сломал бы и адресацию по
+        # содержимому, и раскладку по каталогам.
+        if not is_sharded(name):
+            return super().get_available_name(name, max_length)
+        if self.exists(name):
+            raise _AlreadyStored(name)
+        return name
+
+    def _holds(self, name, digest):
+        """Лежит ли под name файл с этим хэшем."""
+        try:
+            with self.open(name) as existing:
+                # Параллельный save() держит файл под LOCK_EX, пока пишет.
+                locks.lock(existing, locks.LOCK_SH)
+                try:
+                    return content_hash(existing) == digest
+                finally:
+                    locks.unlock(existing)
+        except FileNotFoundError:
+            return False
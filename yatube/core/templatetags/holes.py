@@ -0,0 +1,23 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.caching import HOLE_MARKER
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name):
+    """Кусок страницы, свой у каждого пользователя.
+
+    Обычно работает как {% include %}. Когда view кэшируется общей
+    оболочкой (swr_cache_page с holes=True), вместо куска остаётся метка,
+    и fill_holes() рисует его для каждого запроса отдельно — только с
+    контекстом запроса (user, request и т.п.), без переменных view.
+    """
+    request = context.get('request')
+    if getattr(request, 'punch_holes', False):
+        return mark_safe(HOLE_MARKER.format(template_name))
+    fragment = context.template.engine.get_template(template_name)
+    with context.push():
+        return fragment.render(context)
@@ -0,0 +1,65 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+from django.template import Node, TemplateSyntaxError, VariableDoesNotExist
+
+from core.caching import get_or_refresh
+
+register = template.Library()
+
+
+class SWRCacheNode(Node):
+    def __init__(self, nodelist, expire_time_var, fragment_name, vary_on,
+                 cache_alias):
+        self.nodelist = nodelist
+        self.expire_time_var = expire_time_var
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.cache_alias = cache_alias
+
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError(
+                '"swrcache" tag got an unknown variable: %r'
+                % self.expire_time_var.var
+            )
+        try:
+            expire_time = int(expire_time)
+        except (ValueError, TypeError):
+            raise TemplateSyntaxError(
+                '"swrcache" tag got a non-integer timeout value: %r'
+                % expire_time
+            )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        return get_or_refresh(
+            key, lambda: self.nodelist.render(context), expire_time,
+            cache_alias=self.cache_alias,
+        )
+
+
+@register.tag('swrcache')
+def do_swrcache(parser, token):
+    """Как {% cache %}, но с stale-while-revalidate и одним пересчётом.
+
+        {% swrcache [timeout] [fragment_name] [var1] [var2] .. %}
+            .. some expensive processing ..
+        {% endswrcache %}
+    """
+    nodelist = parser.parse(('endswrcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise TemplateSyntaxError(
+            "'%r' tag requires at least 2 arguments." % tokens[0])
+    cache_alias = 'default'
+    if len(tokens) > 3 and tokens[-1].startswith('using='):
+        cache_alias = tokens.pop()[len('using='):].strip('"\'')
+    return SWRCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(t) for t in tokens[3:]],
+        cache_alias,
+    )
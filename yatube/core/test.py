@@ -1,5 +1,29 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
 from http import HTTPStatus
-from django.test import TestCase
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from . import cache_metrics
+from .cache_backends import entry_evicted, entry_stored
+from .cache_backends.shared import SharedMemoryCache
+from .cache_backends.tiered import TieredCache, _is_immutable
+from .caching import _page_key, get_or_refresh, swr_cache_page
+from .storage import ContentAddressedStorage, is_sharded
+from .widgets import FlatSelect
 
 
 class ViewTestClass(TestCase):
@@ -7,3 +31,453 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class StaleWhileRevalidateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_value_is_computed_once(self):
+        """Свежее значение берётся из кэша без пересчёта"""
+        self.assertEqual(get_or_refresh('key', self.compute, 60), 1)
+        self.assertEqual(get_or_refresh('key', self.compute, 60), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_served_while_locked(self):
+        """Пока другой пересчитывает, отдаётся старое значение"""
+        cache.set('key', ('stale', time.time() - 1, 0.1), 60)
+        cache.add('swr-lock:key', 1, 60)
+        self.assertEqual(get_or_refresh('key', self.compute, 60), 'stale')
+        self.assertEqual(self.calls, 0)
+
+    def test_expired_value_recomputed(self):
+        """Истёкшее значение пересчитывает взявший блокировку"""
+        cache.set('key', ('stale', time.time() - 1, 0.1), 60)
+        self.assertEqual(get_or_refresh('key', self.compute, 60), 1)
+
+    def test_early_refresh(self):
+        """Значение обновляется заранее при большом beta"""
+        cache.set('key', ('old', time.time() + 10, 1.0), 60)
+        self.assertEqual(
+            get_or_refresh('key', self.compute, 60, beta=0), 'old')
+        self.assertEqual(
+            get_or_refresh('key', self.compute, 60, beta=1e6), 1)
+
+    def test_concurrent_misses_are_coalesced(self):
+        """Параллельные промахи запускают один пересчёт"""
+        def slow():
+            time.sleep(0.1)
+            return self.compute()
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    get_or_refresh('key', slow, 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [1] * 8)
+
+    def test_swr_cache_page(self):
+        """swr_cache_page кэширует только успешные GET-ответы"""
+        def view(request):
+            self.calls += 1
+            status = 404 if request.GET.get('missing') else 200
+            return HttpResponse(str(self.calls), status=status)
+
+        cached_view = swr_cache_page(60)(view)
+        factory = RequestFactory()
+        self.assertEqual(cached_view(factory.get('/x/')).content, b'1')
+        self.assertEqual(cached_view(factory.get('/x/')).content, b'1')
+        self.assertEqual(cached_view(factory.post('/x/')).content, b'2')
+        cached_view(factory.get('/x/', {'missing': 1}))
+        cached_view(factory.get('/x/', {'missing': 1}))
+        self.assertEqual(self.calls, 4)
+        self.assertIn('Cookie', cached_view(factory.get('/x/'))['Vary'])
+
+    def test_swr_page_entry_is_not_pickled_in_l1(self):
+        """Страница в кэше — кортеж байтов и строк, L1 хранит его как есть"""
+        cached_view = swr_cache_page(60)(
+            lambda request: HttpResponse('page', content_type='text/plain'))
+        request = RequestFactory().get('/x/')
+        cached_view(request)
+        entry = cache.get(_page_key(request, '', ('Cookie',)))
+        self.assertTrue(_is_immutable(entry))
+        response = cached_view(request)
+        self.assertEqual(response.content, b'page')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+
+    def test_swrcache_tag(self):
+        """Тег swrcache кэширует фрагмент шаблона"""
+        template = Template(
+            '{% load swr_cache %}'
+            '{% swrcache 60 fragment key %}{{ value }}{% endswrcache %}'
+        )
+        first = template.render(Context({'key': 1, 'value': 'first'}))
+        second = template.render(Context({'key': 1, 'value': 'second'}))
+        other = template.render(Context({'key': 2, 'value': 'other'}))
+        self.assertEqual((first, second, other), ('first', 'first', 'other'))
+
+
+class FlatSelectTests(TestCase):
+    def test_renders_like_select(self):
+        """Выбранный вариант отмечен, подписи экранированы"""
+        widget = FlatSelect(choices=[('', '---'), (1, '<b>'), (2, 'два')])
+        html = widget.render('group', 2, attrs={'id': 'id_group'})
+        self.assertHTMLEqual(html, (
+            '<select name="group" id="id_group">'
+            '<option value="">---</option>'
+            '<option value="1">&lt;b&gt;</option>'
+            '<option value="2" selected>два</option>'
+            '</select>'
+        ))
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def test_name_is_content_hash(self):
+        """Имя файла — SHA-256 содержимого в каталогах ab/cd"""
+        name = self.storage.save('posts/Photo.JPEG', ContentFile(b'abc'))
+        digest = ('ba7816bf8f01cfea414140de5dae2223'
+                  'b00361a396177a9cb410ff61f20015ad')
+        self.assertEqual(name, f'posts/ba/78/{digest}.jpg')
+        self.assertTrue(is_sharded(name))
+        self.assertEqual(self.storage.open(name).read(), b'abc')
+
+    def test_identical_uploads_stored_once(self):
+        """Одинаковые файлы получают одно имя, разные — разные"""
+        first = self.storage.save('posts/a.png', ContentFile(b'same'))
+        second = self.storage.save('posts/b.png', ContentFile(b'same'))
+        other = self.storage.save('posts/c.png', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(
+            len(self.storage.listdir(first.rsplit('/', 1)[0])[1]), 1)
+
+    def test_concurrent_identical_saves_share_name(self):
+        """Файл, появившийся во время save(), не получает суффикс"""
+        first = self.storage.save('posts/a.png', ContentFile(b'same'))
+        exists = self.storage.exists
+        checks = []
+
+        def racing_exists(name):
+            # Первые проверки прошли до того, как другой запрос записал файл.
+            checks.append(name)
+            return len(checks) > 2 and exists(name)
+
+        with mock.patch.object(self.storage, 'exists', racing_exists):
+            second = self.storage.save('posts/b.png', ContentFile(b'same'))
+        self.assertEqual(second, first)
+        self.assertEqual(
+            len(self.storage.listdir(first.rsplit('/', 1)[0])[1]), 1)
+
+
+class SharedMemoryCacheTests(TestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.params = {'OPTIONS': {'SIZE': 4096, 'BUCKET_SIZE': 1024}}
+        self.path = os.path.join(location, 'cache')
+        self.cache = SharedMemoryCache(self.path, self.params)
+
+    def test_basic_operations(self):
+        """set/get/add/delete/incr/touch работают как у LocMemCache"""
+        self.cache.set('key', {'a': 1})
+        self.assertEqual(self.cache.get('key'), {'a': 1})
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertTrue(self.cache.add('other', 2))
+        self.assertEqual(self.cache.incr('other', 5), 7)
+        self.assertEqual(self.cache.get('other'), 7)
+        self.assertTrue(self.cache.touch('other', 60))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('key')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('other'))
+
+    def test_expired_entries_are_misses(self):
+        """Просроченная запись не отдаётся и может быть добавлена заново"""
+        self.cache.set('key', 1, timeout=0.01)
+        time.sleep(0.02)
+        self.assertEqual(self.cache.get('key', 'miss'), 'miss')
+        self.assertTrue(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 2)
+
+    def test_least_recently_read_entries_are_evicted(self):
+        """Переполненная корзина вытесняет давно не читанные записи, а
+        запись больше корзины не кэшируется"""
+        self.evicted = []
+
+        def remember(sender, key, **kwargs):
+            self.evicted.append(key)
+
+        entry_evicted.connect(remember)
+        self.addCleanup(entry_evicted.disconnect, remember)
+        cache = SharedMemoryCache(
+            self.path, {'OPTIONS': {'SIZE': 1024, 'BUCKET_SIZE': 1024}})
+        cache.set('hot', 'x' * 100)
+        for index in range(20):
+            cache.set(f'cold{index}', 'x' * 100)
+            self.assertIsNotNone(cache.get('hot'))
+        self.assertIsNone(cache.get('cold0'))
+        self.assertIsNotNone(cache.get('cold19'))
+        self.assertIn(':1:cold0', self.evicted)
+        cache.set('huge', 'x' * 2000)
+        self.assertIsNone(cache.get('huge'))
+
+    def test_writes_report_size(self):
+        """Записи сообщают размер сериализованного значения"""
+        sizes = []
+
+        def remember(sender, key, size, **kwargs):
+            sizes.append((key, size))
+
+        entry_stored.connect(remember)
+        self.addCleanup(entry_stored.disconnect, remember)
+        self.cache.set('key', b'x' * 100)
+        self.cache.add('key', 1)
+        self.cache.set('huge', b'x' * 2000)
+        self.assertEqual(len(sizes), 1)
+        self.assertEqual(sizes[0][0], ':1:key')
+        self.assertGreater(sizes[0][1], 100)
+
+    @skipUnless(hasattr(os, 'getuid'), 'нужны права POSIX')
+    def test_unsafe_file_is_refused(self):
+        """Файл, доступный другим, или ссылка не открываются, а новый
+        файл создаётся с правами только для владельца"""
+        self.cache.set('key', 1)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        exposed = os.path.join(os.path.dirname(self.path), 'exposed')
+        with open(exposed, 'wb'):
+            pass
+        os.chmod(exposed, 0o644)
+        with self.assertRaises(ImproperlyConfigured):
+            SharedMemoryCache(exposed, self.params).get('key')
+        link = os.path.join(os.path.dirname(self.path), 'link')
+        os.symlink(self.path, link)
+        with self.assertRaises(OSError):
+            SharedMemoryCache(link, self.params).get('key')
+
+    @skipUnless(hasattr(os, 'fork'), 'нужен os.fork()')
+    def test_entries_are_shared_between_processes(self):
+        """Запись и удаление в дочернем процессе видны родителю"""
+        self.cache.set('parent', 1)
+        self.cache.set('gone', 1)
+        pid = os.fork()
+        if pid == 0:
+            child = SharedMemoryCache(self.path, self.params)
+            code = 0 if child.get('parent') == 1 else 1
+            child.set('child', 2)
+            child.delete('gone')
+            child.incr('parent')
+            os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+        self.assertEqual(self.cache.get('child'), 2)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertEqual(self.cache.get('parent'), 2)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'l2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+           'LOCATION': 'tiered-tests'},
+})
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        caches['l2'].clear()
+        self.tier = self.make_tier('first', check_interval=60)
+        self.tier.clear()
+        self.tier.reset_stats()
+
+    def make_tier(self, name, check_interval):
+        return TieredCache(f'tiered-tests-{name}', {'OPTIONS': {
+            'L2': 'l2', 'CHECK_INTERVAL': check_interval,
+            'MAX_ENTRIES': 2}})
+
+    def test_hot_key_is_served_from_l1(self):
+        """Повторное чтение не доходит до L2"""
+        self.tier.set('key', 'value')
+        self.assertEqual(self.tier.get('key'), 'value')
+        caches['l2'].set('key', 'changed behind the back')
+        self.assertEqual(self.tier.get('key'), 'value')
+        self.assertEqual(self.tier.stats()['l1_hits'], 1)
+
+    def test_invalidation_reaches_other_processes(self):
+        """Запись и удаление через другой L1 видны после проверки штампа"""
+        other = self.make_tier('other', check_interval=0)
+        other.set('key', 'old')
+        self.assertEqual(other.get('key'), 'old')
+        self.tier.set('key', 'new')
+        self.assertEqual(other.get('key'), 'new')
+        self.tier.delete('key')
+        self.assertIsNone(other.get('key'))
+        self.assertEqual(other.stats()['l1_stale'], 2)
+
+    def test_incr_bumps_stamp(self):
+        """incr() меняет штамп, и другой L1 видит новое число"""
+        other = self.make_tier('incr', check_interval=0)
+        self.tier.set('version', 1)
+        self.assertEqual(other.get('version'), 1)
+        self.assertEqual(self.tier.incr('version'), 2)
+        self.assertEqual(other.get('version'), 2)
+
+    def test_interleaved_writers(self):
+        """Два incr() вперемешку со штампами не оставляют в L1 старое
+        число: штамп первого ложится поверх значения второго"""
+        second = self.make_tier('writer-b', check_interval=0)
+
+        class Interleaved(TieredCache):
+            def _publish(self, key, timeout, version):
+                # Второй пишущий успевает целиком между шагами первого.
+                second.incr(key, version=version)
+                return super()._publish(key, timeout, version)
+
+        first = Interleaved('tiered-tests-writer-a', {'OPTIONS': {
+            'L2': 'l2', 'CHECK_INTERVAL': 0}})
+        first.set('version', 1)
+        self.assertEqual(first.get('version'), 2)
+        first.incr('version')
+        self.assertEqual(caches['l2'].get('version'), 4)
+        self.assertEqual(first.get('version'), 4)
+        self.assertEqual(second.get('version'), 4)
+
+    def test_mutable_values_are_copied(self):
+        """Изменяемые значения не делятся между вызывающими"""
+        self.tier.set('list', [1])
+        self.tier.get('list').append(2)
+        self.assertEqual(self.tier.get('list'), [1])
+
+    def test_l1_is_bounded(self):
+        """L1 вытесняет давно не читанные ключи, L2 их сохраняет"""
+        for key in ('a', 'b', 'c'):
+            self.tier.set(key, key)
+        self.tier.reset_stats()
+        self.assertEqual(self.tier.get('a'), 'a')
+        self.assertEqual(self.tier.stats(), {
+            'l1_hits': 0, 'l1_misses': 1, 'l1_stale': 0,
+            'l2_hits': 1, 'l2_misses': 0})
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.cache_backends.instrumented.InstrumentedCache',
+        'OPTIONS': {'CACHE': 'inner', 'FLUSH_INTERVAL': 3600},
+    },
+    'inner': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+              'LOCATION': 'instrumented-tests'},
+}, CACHE_METRICS_TOKEN='secret')
+class InstrumentedCacheTests(TestCase):
+    def setUp(self):
+        caches['inner'].clear()
+        cache_metrics.reset()
+        self.cache = caches['default']
+
+    def collect(self):
+        self.cache.flush_metrics()
+        return cache_metrics.collect(self.cache.metrics_store)
+
+    def test_key_groups(self):
+        """Ключи делятся на страницы, фрагменты, версии и кэши ORM"""
+        groups = {
+            'swr.page.index.None.5.GET.abc.def': 'page:index',
+            'template.cache.index_page.abc': 'fragment:index_page',
+            'anonymous-page:3:abc': 'anonymous_page',
+            'anonymous-page-generation': 'version',
+            'listing-version:group:slug': 'version',
+            'sorl-thumbnail||image||abc': 'orm:thumbnails',
+            'choices:posts.group': 'orm:choices',
+            'something': 'other',
+        }
+        for key, group in groups.items():
+            with self.subTest(key=key):
+                self.assertEqual(cache_metrics.key_group(key), group)
+
+    def test_operations_are_counted_by_group(self):
+        """Попадания, промахи, записи, байты и задержки по группам"""
+        page_key = 'swr.page.index.None.1.GET.abc.def'
+        self.cache.get(page_key)
+        self.cache.set(page_key, 'x' * 100)
+        self.assertEqual(self.cache.get(page_key), 'x' * 100)
+        self.cache.get_many([page_key, 'template.cache.sidebar.abc'])
+        entry_stored.send(sender=None, key=f':1:{page_key}', size=100)
+        entry_evicted.send(sender=None, key=f':1:{page_key}')
+        counters, latency = self.collect()
+        self.assertEqual(counters['page:index', 'hits'], 2)
+        self.assertEqual(counters['page:index', 'misses'], 1)
+        self.assertEqual(counters['page:index', 'sets'], 1)
+        self.assertEqual(counters['page:index', 'bytes'], 100)
+        self.assertEqual(counters['page:index', 'evictions'], 1)
+        self.assertEqual(counters['fragment:sidebar', 'misses'], 1)
+        gets = sum(count for (group, operation, bucket), count
+                   in latency.items()
+                   if group == 'page:index' and operation == 'get'
+                   and bucket != 'sum')
+        self.assertEqual(gets, 3)
+
+    def test_departed_processes_keep_totals(self):
+        """Счётчики завершившихся и выбывших из списка процессов
+        остаются в сумме, и она не уменьшается"""
+        store = self.cache.metrics_store
+        max_processes = cache_metrics.MAX_PROCESSES
+        cache_metrics.MAX_PROCESSES = 2
+        self.addCleanup(setattr, cache_metrics, 'MAX_PROCESSES',
+                        max_processes)
+        for _ in range(3):
+            cache_metrics.reset()
+            self.cache.get('listing-version:index')
+            self.cache.flush_metrics()
+        registry = store.get(cache_metrics.REGISTRY_KEY)
+        self.assertEqual(len(registry['processes']), 2)
+        self.assertEqual(self.collect()[0]['version', 'misses'], 3)
+        cache_metrics.flush(store, retire=True)
+        self.assertEqual(
+            len(store.get(cache_metrics.REGISTRY_KEY)['processes']), 1)
+        self.assertEqual(self.collect()[0]['version', 'misses'], 3)
+        self.cache.get('listing-version:index')
+        self.assertEqual(self.collect()[0]['version', 'misses'], 4)
+
+    def test_metrics_endpoint(self):
+        """Метрики видны персоналу и сборщику с токеном, прочим — 404"""
+        self.cache.get('anonymous-page:1:abc')
+        url = reverse('cache_metrics')
+        self.assertEqual(self.client.get(url).status_code,
+                         HTTPStatus.NOT_FOUND)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        metrics = response.content.decode()
+        self.assertRegex(
+            metrics, r'yatube_cache_misses_total\{group="anonymous_page"\} \d')
+        self.assertRegex(metrics, r'yatube_cache_latency_seconds_bucket'
+                                  r'\{group="anonymous_page",operation="get",'
+                                  r'le="\+Inf"\} \d')
+        staff = get_user_model().objects.create_user(
+            username='metrics_staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+
+    def test_summary_command(self):
+        """Команда cache_metrics печатает сводку по группам"""
+        self.cache.set('listing-version:index', 1)
+        self.cache.get('listing-version:index')
+        self.cache.flush_metrics()
+        out = StringIO()
+        call_command('cache_metrics', stdout=out)
+        self.assertRegex(out.getvalue(), r'version +1 +0 +100%')
+        self.assertIn('Всего чтений: 1', out.getvalue())
@@ -0,0 +1,81 @@
+"""Помощники для тестов: бюджет запросов и отдельный кэш."""
+import copy
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+from django.urls import resolve, reverse
+
+from . import cache_metrics
+from .query_budget import QueryRecorder, budget_violation, get_budget
+
+SHARED_CACHE_BACKEND: str = 'core.cache_backends.shared.SharedMemoryCache'
+
+
+@contextmanager
+def private_shared_cache():
+    """Переводит общие кэши (SharedMemoryCache) во временный файл.
+
+    Тесты и бенчмарки чистят кэш и двигают версии списков; с файлом
+    запущенного сервера они сбросили бы его страницы.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches_setting = copy.deepcopy(settings.CACHES)
+    for alias, params in caches_setting.items():
+        if params['BACKEND'] == SHARED_CACHE_BACKEND:
+            params['LOCATION'] = os.path.join(directory, alias)
+    try:
+        with override_settings(CACHES=caches_setting):
+            yield
+    finally:
+        # Иначе при выходе процесса счётчики уйдут в кэш сервера.
+        cache_metrics.reset()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class PrivateCacheTestRunner(DiscoverRunner):
+    """manage.py test с отдельным общим кэшем (см. private_shared_cache)."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._private_cache = private_shared_cache()
+        self._private_cache.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._private_cache.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
+
+
+def iter_urls(urlconf, url_kwargs):
+    """Адреса всех маршрутов urlconf.
+
+    Значения параметров маршрутов берутся из url_kwargs по имени.
+    """
+    module = import_module(urlconf)
+    for pattern in module.urlpatterns:
+        name = f'{module.app_name}:{pattern.name}'
+        kwargs = {
+            key: url_kwargs[key] for key in pattern.pattern.converters
+        }
+        yield reverse(name, kwargs=kwargs)
+
+
+class QueryBudgetTestMixin:
+    """Проверка, что view укладывается в свой бюджет запросов."""
+
+    def assertWithinBudget(self, client, url):
+        budget = get_budget(resolve(url))
+        # Бюджет считается для холодного кэша — это худший случай.
+        cache.clear()
+        with QueryRecorder() as recorder:
+            client.get(url)
+        violation = budget_violation(budget, recorder)
+        if violation is not None:
+            queries = '\n'.join(query.sql for query in recorder.queries)
+            self.fail(f'{url}: {violation}\n{queries}')
@@ -0,0 +1,154 @@
+"""Приём картинок с ограниченной памятью.
+
+CappedUploadHandler пишет любой загружаемый файл во временный файл на
+диске и перестаёт писать, когда он превысил UPLOAD_MAX_SIZE. Проверка
+inspect_image() читает только заголовок картинки (формат и размеры), не
+раскодируя пиксели, поэтому «бомба» из сжатого PNG отсекается до того,
+как её развернёт Pillow. downscale_image() уменьшает слишком большие
+оригиналы: JPEG раскодируется сразу в уменьшенном виде (draft), прочие
+форматы раскодируются целиком — поэтому и предел точек для них меньше
+(IMAGE_MAX_DECODED_PIXELS) — и ужимаются reduce() перед точным
+ресайзом. image_metadata()
+считает размеры, формат, объём и хэш файла за одно чтение.
+"""
+import hashlib
+import os
+import tempfile
+import warnings
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+ImageMetadata = namedtuple(
+    'ImageMetadata', ['width', 'height', 'size', 'format', 'hash'])
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Форматы, которые draft() раскодирует сразу уменьшенными
+DRAFT_FORMATS = ('JPEG',)
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+
+class CappedUploadHandler(TemporaryFileUploadHandler):
+    """Потоковая запись загрузок на диск с ограничением размера.
+
+    Всё, что сверх UPLOAD_MAX_SIZE, отбрасывается, а у файла ставится
+    oversized = True: ошибку покажет форма (см. inspect_image).
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.oversized = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.UPLOAD_MAX_SIZE:
+            self.oversized = True
+        if not self.oversized:
+            self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        if self.oversized:
+            upload.truncate(0)
+        upload.oversized = self.oversized
+        return upload
+
+
+def inspect_image(upload):
+    """Формат и размеры картинки по заголовку; ValidationError, если
+    файл слишком большой, не картинка или в нём слишком много точек."""
+    if getattr(upload, 'oversized', False):
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={'limit': filesizeformat(settings.UPLOAD_MAX_SIZE)},
+        )
+    upload.seek(0)
+    try:
+        with warnings.catch_warnings():
+            # Pillow только предупреждает о «бомбе» до 2 × MAX_IMAGE_PIXELS.
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            with Image.open(upload) as image:
+                image_format, (width, height) = image.format, image.size
+    except Exception:
+        raise ValidationError(
+            'Загрузите картинку: файл повреждён или это не изображение.',
+            code='invalid_image',
+        )
+    finally:
+        upload.seek(0)
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается.',
+            code='invalid_format',
+            params={'format': image_format},
+        )
+    max_pixels = settings.IMAGE_MAX_PIXELS
+    if image_format not in DRAFT_FORMATS:
+        max_pixels = min(max_pixels, settings.IMAGE_MAX_DECODED_PIXELS)
+    if width * height > max_pixels:
+        raise ValidationError(
+            'Картинка %(width)s×%(height)s слишком большая.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
+    return image_format, width, height
+
+
+def downscale_image(upload, max_side):
+    """Уменьшает картинку до max_side по большей стороне.
+
+    draft() раскодирует JPEG сразу в 1/2–1/8 размера, если результат не
+    меньше max_side, так что полноразмерный растр в памяти не
+    появляется; прочие форматы раскодируются целиком (их ограничивает
+    IMAGE_MAX_DECODED_PIXELS) и ужимаются целочисленным reduce() внутри
+    thumbnail(). Анимированные и небольшие картинки возвращаются как
+    есть.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if (max(image.size) <= max_side
+                or getattr(image, 'is_animated', False)):
+            upload.seek(0)
+            return upload
+        image_format = image.format
+        ratio = max_side / max(image.size)
+        image.draft(None, (round(image.width * ratio),
+                           round(image.height * ratio)))
+        image.thumbnail((max_side, max_side), reducing_gap=2.0)
+        # Уменьшенная копия лежит в памяти, пока невелика, потом на диске.
+        buffer = tempfile.SpooledTemporaryFile(
+            settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        image.save(buffer, image_format)
+    size = buffer.tell()
+    buffer.seek(0)
+    return UploadedFile(buffer, os.path.basename(upload.name),
+                        CONTENT_TYPES[image_format], size)
+
+
+def image_metadata(file):
+    """Размеры и формат по заголовку, объём и SHA-256 содержимого.
+
+    Файл читается кусками и остаётся открытым на начале.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        image_format, (width, height) = image.format, image.size
+    file.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return ImageMetadata(width, height, size, image_format,
+                         digest.hexdigest())
@@ -1,5 +1,12 @@
+import hmac
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from core import cache_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -11,3 +18,26 @@ def permission_denied(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+def _can_see_metrics(request):
+    token = settings.CACHE_METRICS_TOKEN
+    if token and hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return True
+    return request.user.is_staff
+
+
+def cache_metrics_view(request):
+    """Метрики кэша всех процессов в формате Prometheus."""
+    if not _can_see_metrics(request):
+        raise Http404
+    cache = caches['default']
+    if hasattr(cache, 'flush_metrics'):
+        cache.flush_metrics()
+        store = cache.metrics_store
+    else:
+        store = cache
+    return HttpResponse(
+        cache_metrics.prometheus(*cache_metrics.collect(store)),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,25 @@
+from django import forms
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+
+class FlatSelect(forms.Select):
+    """Select, который собирает варианты одной строкой.
+
+    Обычный Select рендерит шаблон на каждый вариант; в list_editable это
+    строки × варианты шаблонов на страницу. Группы вариантов (optgroup)
+    не поддерживаются.
+    """
+
+    def render(self, name, value, attrs=None, renderer=None):
+        final_attrs = self.build_attrs(self.attrs, attrs)
+        final_attrs['name'] = name
+        selected = '' if value is None else str(value)
+        options = format_html_join('', '<option value="{}"{}>{}</option>', (
+            (option_value,
+             ' selected' if str(option_value) == selected else '',
+             label)
+            for option_value, label in self.choices
+        ))
+        return format_html('<select{}>{}</select>', flatatt(final_attrs),
+                           options)
@@ -1,9 +1,48 @@
+from django.conf import settings
 from django.contrib import admin
 
+from core.paginators import EstimatedCountPaginator
+from core.widgets import FlatSelect
+
+from . import search
+from .cache import cached_choices
 from .models import Group, Post, Comment, Follow
 
 
-class PostAdmin(admin.ModelAdmin):
+class ScalableAdmin(admin.ModelAdmin):
+    """Список без полного COUNT(*) и с закэшированными вариантами выбора.
+
+    Поля из cached_choice_fields берут варианты из кэша, а не выбирают
+    все объекты для каждой строки list_editable, и рисуются FlatSelect.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    cached_choice_fields = ()
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        cached = db_field.name in self.cached_choice_fields
+        if cached:
+            kwargs.setdefault('widget', FlatSelect)
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs)
+        if cached:
+            formfield.choices = cached_choices(formfield)
+        return formfield
+
+
+class IndexedSearchMixin:
+    """Поиск в списке через полнотекстовый индекс вместо LIKE '%...%'."""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        ids = search.matching_ids(
+            search_term, self.search_kind, settings.SEARCH_ADMIN_LIMIT)
+        return queryset.filter(pk__in=ids), False
+
+
+class PostAdmin(IndexedSearchMixin, ScalableAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,12 +51,16 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author',)
+    cached_choice_fields = ('group',)
     search_fields = ('text',)
+    search_kind = search.POST
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
 
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(ScalableAdmin):
     list_display = (
         'title',
         'description',
@@ -26,21 +69,26 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(IndexedSearchMixin, ScalableAdmin):
     list_display = (
         'author',
         'text',
         'created',
     )
+    list_select_related = ('author',)
+    autocomplete_fields = ('author', 'post')
     search_fields = ('text',)
+    search_kind = search.COMMENT
     empty_value_display = '-пусто-'
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(ScalableAdmin):
     list_display = (
         'user',
         'author',
     )
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
 
 
 admin.site.register(Post, PostAdmin)
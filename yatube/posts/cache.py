@@ -0,0 +1,105 @@
+"""Версионированный кэш страниц-списков постов.
+
+У каждого списка (главная, группа, профиль) есть номер версии в кэше,
+и он входит в ключи закэшированных страниц. Сигналы моделей повышают
+версию, когда пост или подписка меняют содержимое списка, поэтому
+старые страницы просто перестают находиться, а TTL может быть долгим.
+
+Здесь же кэш вариантов выбора для форм админки.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.caching import swr_cache_page
+
+INDEX_LISTING: str = 'index'
+GROUP_LISTING: str = 'group'
+PROFILE_LISTING: str = 'profile'
+
+
+def _key_part(key):
+    # Слаг и имя пользователя бывают не ASCII и длинными, а ключ кэша
+    # должен подходить любому бэкенду (memcached).
+    if key is None:
+        return None
+    return hashlib.md5(str(key).encode()).hexdigest()
+
+
+def _version_key(listing, key=None):
+    if key is None:
+        return f'listing-version:{listing}'
+    return f'listing-version:{listing}:{_key_part(key)}'
+
+
+def _fresh_version():
+    # Версия, которой гарантированно не было раньше: если ключ версии
+    # вытеснили из кэша, старые страницы не должны снова «найтись».
+    return time.time_ns()
+
+
+def listing_version(listing, key=None):
+    version_key = _version_key(listing, key)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, _fresh_version(), None)
+        version = cache.get(version_key)
+    return version
+
+
+def bump_listing(listing, key=None):
+    version_key = _version_key(listing, key)
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, _fresh_version(), None)
+
+
+def cache_listing(listing, kwarg=None, shared=False):
+    """Кэш страницы, ключ которого включает текущую версию списка.
+
+    Истёкшую страницу пересчитывает один запрос, остальные получают
+    прежнюю версию (см. core.caching.swr_cache_page). С shared=True
+    страница не зависит от Cookie: все пользователи получают одну
+    оболочку, а шапка и прочие {% hole %} рисуются для каждого.
+    """
+    def key_prefix(request, *args, **kwargs):
+        key = kwargs.get(kwarg) if kwarg else None
+        return (f'{listing}.{_key_part(key)}.'
+                f'{listing_version(listing, key)}')
+
+    if shared:
+        return swr_cache_page(settings.LISTING_CACHE_TIMEOUT,
+                              key_prefix=key_prefix, vary=(), holes=True)
+    return swr_cache_page(settings.LISTING_CACHE_TIMEOUT,
+                          key_prefix=key_prefix)
+
+
+def _choices_key(model):
+    return f'choices:{model._meta.label_lower}'
+
+
+def cached_choices(formfield):
+    """Варианты ModelChoiceField из кэша.
+
+    Список вместо queryset ещё и не даёт каждой строке list_editable
+    заново выбирать все объекты. В кэше лежат варианты для полного
+    queryset модели, поэтому для полей с limit_choices_to не годится.
+    """
+    key = _choices_key(formfield.queryset.model)
+    choices = cache.get(key)
+    if choices is None:
+        choices = [
+            (formfield.prepare_value(obj), formfield.label_from_instance(obj))
+            for obj in formfield.queryset
+        ]
+        cache.set(key, choices, settings.CHOICES_CACHE_TIMEOUT)
+    if formfield.empty_label is not None:
+        return [('', formfield.empty_label)] + choices
+    return choices
+
+
+def forget_choices(model):
+    cache.delete(_choices_key(model))
@@ -0,0 +1,132 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются одним UPDATE ... SET field = field ± 1, поэтому
+параллельные запросы не теряют приращений. Расхождения, если они всё же
+накопились, исправляет команда reconcile_counters.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def _bump(queryset, field, delta):
+    if delta < 0:
+        # Устаревший экземпляр не должен уводить счётчик в минус.
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def _bump_user(user_id, field, delta):
+    stats = UserStats.objects.filter(user_id=user_id)
+    # Отрицательные приращения приходят и при каскадном удалении
+    # пользователя, когда его строка уже удалена: заводить её заново
+    # нельзя, расхождения оставляем reconcile_counters.
+    if not _bump(stats, field, delta) and delta > 0 and not stats.exists():
+        # Строки ещё нет (например, пользователь создан bulk_create):
+        # заводим её сразу с честными значениями.
+        recount_user(user_id)
+
+
+def _count(queryset, key):
+    counted = queryset.filter(**{key: OuterRef('pk')}).order_by().values(
+        key).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def recount_user(user_id):
+    if not User.objects.filter(pk=user_id).exists():
+        return
+    UserStats.objects.update_or_create(user_id=user_id, defaults={
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    })
+
+
+def get_stats(user):
+    """Счётчики пользователя; недостающая строка создаётся на лету."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        recount_user(user.pk)
+        return UserStats.objects.get(user_id=user.pk)
+
+
+def post_added(post):
+    _bump_user(post.author_id, 'posts_count', 1)
+    if post.group_id:
+        _bump(Group.objects.filter(pk=post.group_id), 'posts_count', 1)
+
+
+def post_removed(post):
+    _bump_user(post.author_id, 'posts_count', -1)
+    if post.group_id:
+        _bump(Group.objects.filter(pk=post.group_id), 'posts_count', -1)
+
+
+def post_moved(old_group_id, new_group_id):
+    if old_group_id == new_group_id:
+        return
+    if old_group_id:
+        _bump(Group.objects.filter(pk=old_group_id), 'posts_count', -1)
+    if new_group_id:
+        _bump(Group.objects.filter(pk=new_group_id), 'posts_count', 1)
+
+
+def comment_added(comment):
+    if comment.post_id:
+        _bump(Post.objects.filter(pk=comment.post_id), 'comments_count', 1)
+
+
+def comment_removed(comment):
+    if comment.post_id:
+        _bump(Post.objects.filter(pk=comment.post_id), 'comments_count', -1)
+
+
+def follow_added(follow):
+    _bump_user(follow.author_id, 'followers_count', 1)
+    _bump_user(follow.user_id, 'following_count', 1)
+
+
+def follow_removed(follow):
+    _bump_user(follow.author_id, 'followers_count', -1)
+    _bump_user(follow.user_id, 'following_count', -1)
+
+
+def _reconcile(queryset, counters):
+    """Переписывает разошедшиеся счётчики; возвращает число строк."""
+    annotated = queryset.annotate(**{
+        f'actual_{field}': value for field, value in counters.items()
+    })
+    drift = Q()
+    for field in counters:
+        drift |= ~Q(**{field: F(f'actual_{field}')})
+    pks = list(annotated.filter(drift).values_list('pk', flat=True))
+    if pks:
+        queryset.filter(pk__in=pks).update(**counters)
+    return len(pks)
+
+
+def reconcile():
+    """Пересчитывает все счётчики; возвращает число исправленных строк."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True)
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in missing], ignore_conflicts=True)
+    return {
+        'users': _reconcile(UserStats.objects.all(), {
+            'posts_count': _count(Post.objects.all(), 'author'),
+            'followers_count': _count(Follow.objects.all(), 'author'),
+            'following_count': _count(Follow.objects.all(), 'user'),
+        }),
+        'posts': _reconcile(Post.objects.all(), {
+            'comments_count': _count(Comment.objects.all(), 'post'),
+        }),
+        'groups': _reconcile(Group.objects.all(), {
+            'posts_count': _count(Post.objects.all(), 'group'),
+        }),
+    }
@@ -0,0 +1,241 @@
+"""Лента подписок: гибрид fan-out на запись и чтения по запросу.
+
+Посты обычных авторов при публикации раскладываются во «входящие»
+подписчиков (FeedItem). Посты авторов в режиме «pull» во входящие не
+пишутся: они забираются при чтении ленты и сливаются со входящими
+k-way слиянием по (pub_date, id).
+
+Режим автора хранится в UserStats.feed_mode. Автор переходит в «pull»,
+когда подписчиков становится FEED_PULL_THRESHOLD, а возвращается к
+fan-out, только когда их меньше FEED_PUSH_THRESHOLD: подписка и отписка
+на границе не переключают режим туда и обратно. Входящие подписчиков
+при переключении переписывает фоновый воркер (команда feed_worker, см.
+run_pending()), а не запрос подписки. Пока он раскладывает старые посты,
+автор в режиме «filling»: новые посты уже раскладываются, а лента ещё
+читает его при запросе.
+
+Раскладка поста ленты не обрезает: проверка длины каждой ленты стоила бы
+больше самой раскладки. Ленты длиннее FEED_INBOX_SIZE обрезает
+trim_all() — команда trim_feeds, которую запускают по расписанию.
+"""
+import heapq
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Count
+
+from core.paginators import (CURSOR_PREVIOUS, CURSOR_NEXT, CursorPaginator,
+                             InvalidCursor, decode_cursor, encode_cursor,
+                             make_cursor_page)
+from . import jobs
+from .models import FeedItem, FeedJob, Follow, Post, UserStats
+
+FEED_ORDERING = ('-pub_date', '-post_id')
+FEED_BATCH_SIZE: int = 500
+PULLED_MODES = (UserStats.FEED_PULL, UserStats.FEED_FILLING)
+
+
+def _feed_items(user_ids, post):
+    return [
+        FeedItem(user_id=user_id, post_id=post.pk,
+                 author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in user_ids
+    ]
+
+
+def _author_state(author_id):
+    """(число подписчиков, режим) автора; без строки счётчиков — fan-out,
+    как и в pulled_authors()."""
+    return UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', 'feed_mode').first() or (0, UserStats.FEED_PUSH)
+
+
+def _switch_mode(author_id, old_modes, mode):
+    """Переключает режим и ставит задание воркеру, если режим ещё не
+    переключил параллельный запрос."""
+    if UserStats.objects.filter(
+            user_id=author_id, feed_mode__in=old_modes
+    ).update(feed_mode=mode):
+        enqueue(author_id)
+
+
+def pulled_authors(user):
+    """Авторы из подписок читателя, чьи посты забираются при чтении."""
+    return list(Follow.objects.filter(
+        user=user, author__stats__feed_mode__in=PULLED_MODES,
+    ).values_list('author_id', flat=True))
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам всех подписчиков автора."""
+    if _author_state(post.author_id)[1] == UserStats.FEED_PULL:
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(user_id)
+        if len(batch) == FEED_BATCH_SIZE:
+            FeedItem.objects.bulk_create(
+                _feed_items(batch, post), ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedItem.objects.bulk_create(
+            _feed_items(batch, post), ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя последние посты автора."""
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id')[:settings.FEED_INBOX_SIZE]
+    FeedItem.objects.bulk_create([
+        FeedItem(user_id=user_id, post_id=post.pk,
+                 author_id=author_id, pub_date=post.pub_date)
+        for post in posts
+    ], batch_size=FEED_BATCH_SIZE, ignore_conflicts=True)
+    trim(user_id)
+
+
+def follow_added(user_id, author_id):
+    count, mode = _author_state(author_id)
+    if mode == UserStats.FEED_PULL:
+        return
+    if count >= settings.FEED_PULL_THRESHOLD:
+        _switch_mode(author_id, (UserStats.FEED_PUSH, UserStats.FEED_FILLING),
+                     UserStats.FEED_PULL)
+    else:
+        backfill(user_id, author_id)
+
+
+def follow_removed(user_id, author_id):
+    drop_author(user_id, author_id)
+    count, mode = _author_state(author_id)
+    if mode == UserStats.FEED_PULL and count < settings.FEED_PUSH_THRESHOLD:
+        _switch_mode(author_id, (UserStats.FEED_PULL,),
+                     UserStats.FEED_FILLING)
+
+
+def enqueue(author_id):
+    """Ставит автора в очередь воркера ленты (повторно — тоже можно)."""
+    FeedJob.objects.update_or_create(
+        author_id=author_id,
+        defaults={'status': FeedJob.PENDING, 'attempts': 0, 'error': ''},
+    )
+
+
+def sync_author(author_id):
+    """Приводит входящие подписчиков к режиму автора.
+
+    «pull» — посты автора из входящих удаляются, лента их всё равно
+    пропускает. «filling» — последние посты раскладываются всем
+    подписчикам, после чего автор возвращается к fan-out.
+    """
+    mode = _author_state(author_id)[1]
+    if mode == UserStats.FEED_PULL:
+        FeedItem.objects.filter(author_id=author_id).delete()
+    elif mode == UserStats.FEED_FILLING:
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        for follower_id in followers.iterator():
+            backfill(follower_id, author_id)
+        # Автор мог снова набрать подписчиков, пока шла раскладка.
+        UserStats.objects.filter(
+            user_id=author_id, feed_mode=UserStats.FEED_FILLING
+        ).update(feed_mode=UserStats.FEED_PUSH)
+
+
+def run_job(job):
+    return jobs.run(job, lambda: sync_author(job.author_id),
+                    settings.FEED_JOB_ATTEMPTS)
+
+
+def run_pending(limit):
+    """Выполняет до limit заданий; возвращает их итоговые состояния."""
+    return [run_job(job)
+            for job in jobs.claim(FeedJob, limit, settings.FEED_JOB_TIMEOUT)]
+
+
+def drop_author(user_id, author_id):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def trim(user_id):
+    """Оставляет в ленте не больше FEED_INBOX_SIZE свежих записей."""
+    stale = list(FeedItem.objects.filter(user_id=user_id).order_by(
+        *FEED_ORDERING
+    ).values_list('pk', flat=True)[settings.FEED_INBOX_SIZE:])
+    if stale:
+        FeedItem.objects.filter(pk__in=stale).delete()
+
+
+def trim_all():
+    """Обрезает все ленты длиннее FEED_INBOX_SIZE; возвращает их число."""
+    user_ids = list(FeedItem.objects.order_by().values('user_id').annotate(
+        total=Count('pk')
+    ).filter(total__gt=settings.FEED_INBOX_SIZE).values_list(
+        'user_id', flat=True))
+    for user_id in user_ids:
+        trim(user_id)
+    return len(user_ids)
+
+
+def _post_key(post):
+    return post.pub_date, post.pk
+
+
+def _post_cursor(direction, post):
+    pub_date = Post._meta.get_field('pub_date')
+    return encode_cursor(direction, [pub_date.value_to_string(post),
+                                     str(post.pk)])
+
+
+def _sources(user, per_page):
+    pulled = pulled_authors(user)
+    inbox = FeedItem.objects.filter(user=user).exclude(
+        author_id__in=pulled
+    ).select_related('post__author', 'post__group')
+    yield CursorPaginator(inbox, per_page, ordering=FEED_ORDERING), True
+    for author_id in pulled:
+        posts = Post.objects.filter(author_id=author_id).select_related(
+            'author', 'group')
+        yield CursorPaginator(posts, per_page), False
+
+
+def feed_page(user, per_page, cursor=None):
+    """Курсорная страница ленты: входящие + посты «популярных» авторов."""
+    backward = bool(cursor) and decode_cursor(cursor)[0] == CURSOR_PREVIOUS
+    streams = []
+    has_more = False
+    for paginator, from_inbox in _sources(user, per_page):
+        page = paginator.cursor_page(cursor)
+        streams.append(
+            [item.post for item in page] if from_inbox else list(page))
+        more = page.previous_cursor if backward else page.next_cursor
+        has_more = has_more or more is not None
+    merged = list(heapq.merge(*streams, key=_post_key, reverse=True))
+    has_more = has_more or len(merged) > per_page
+    if backward:
+        items = merged[-per_page:]
+        has_next, has_previous = True, has_more
+    else:
+        items = merged[:per_page]
+        has_next, has_previous = has_more, bool(cursor)
+    next_cursor = previous_cursor = None
+    if items and has_next:
+        next_cursor = _post_cursor(CURSOR_NEXT, items[-1])
+    if items and has_previous:
+        previous_cursor = _post_cursor(CURSOR_PREVIOUS, items[0])
+    return make_cursor_page(Paginator(items, per_page), items, cursor or '',
+                            next_cursor, previous_cursor)
+
+
+def get_feed_page(request, per_page):
+    """Страница ленты подписок текущего пользователя по ?cursor=."""
+    cursor = request.GET.get('cursor')
+    try:
+        return feed_page(request.user, per_page, cursor)
+    except InvalidCursor:
+        return feed_page(request.user, per_page)
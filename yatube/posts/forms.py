@@ -1,4 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from core.uploads import downscale_image, inspect_image
 
 from .models import Post, Comment
 
@@ -18,6 +22,28 @@ class PostForm(forms.ModelForm):
             'image': 'Прикрепить изображение к тексту',
         }
 
+    def full_clean(self):
+        # Заголовок картинки проверяется до ImageField: тот открывает
+        # файл целиком, а «бомбу» или обрезанный файл открывать нельзя.
+        upload = self.files.get('image') if self.files else None
+        error = None
+        if upload is not None:
+            try:
+                inspect_image(upload)
+            except ValidationError as exc:
+                error = exc
+                self.files = self.files.copy()
+                del self.files['image']
+        super().full_clean()
+        if error is not None:
+            self.add_error('image', error)
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if image and hasattr(image, 'content_type'):
+            return downscale_image(image, settings.POST_IMAGE_MAX_SIDE)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,40 @@
+"""Метаданные картинок постов: размеры, формат, объём и хэш.
+
+Они записываются в поля Post при сохранении новой картинки (см.
+signals.record_image_metadata), поэтому шаблонам и коду, которому нужны
+размеры, не приходится открывать файл в хранилище.
+"""
+from django.core.exceptions import SuspiciousFileOperation
+
+from core.uploads import ImageMetadata, image_metadata
+
+METADATA_FIELDS = ('image_width', 'image_height', 'image_size',
+                   'image_format', 'image_hash')
+EMPTY = ImageMetadata(None, None, None, '', '')
+
+
+def set_metadata(post, metadata):
+    (post.image_width, post.image_height, post.image_size,
+     post.image_format, post.image_hash) = metadata
+
+
+def read_metadata(image):
+    """Метаданные FieldFile: ещё не сохранённой загрузки или файла из
+    хранилища. Без картинки — пустые, без файла — FileNotFoundError."""
+    if not image:
+        return EMPTY
+    if image._committed:
+        with image.storage.open(image.name) as file:
+            return image_metadata(file)
+    return image_metadata(image.file)
+
+
+def record_metadata(post):
+    """Заполняет поля метаданных поста; пропавший, битый или лежащий вне
+    хранилища файл их очищает. Возвращает записанные метаданные."""
+    try:
+        metadata = read_metadata(post.image)
+    except (OSError, SuspiciousFileOperation):
+        metadata = EMPTY
+    set_metadata(post, metadata)
+    return metadata
@@ -0,0 +1,64 @@
+"""Очереди заданий фоновым воркерам в таблицах (ThumbnailJob, FeedJob).
+
+У модели задания есть поля status, attempts, error и updated_at и
+состояния PENDING, RUNNING, DONE и FAILED, как у ThumbnailJob. Задание
+ставится заново через update_or_create со status=PENDING; так повторы
+одного источника сливаются в одно задание.
+"""
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+MAX_ERROR_LENGTH: int = 1000
+
+
+def _claimable(model, timeout):
+    stale = timezone.now() - timedelta(seconds=timeout)
+    return (Q(status=model.PENDING)
+            | Q(status=model.RUNNING, updated_at__lt=stale))
+
+
+def claim(model, limit, timeout):
+    """Забирает до limit заданий; несколько воркеров не возьмут одно.
+
+    Задание, которое выполняется дольше timeout секунд (упавший воркер),
+    можно забрать снова.
+    """
+    claimable = _claimable(model, timeout)
+    candidates = model.objects.filter(claimable).order_by(
+        'pk').values_list('pk', flat=True)[:limit]
+    claimed = []
+    for pk in list(candidates):
+        taken = model.objects.filter(claimable, pk=pk).update(
+            status=model.RUNNING, updated_at=timezone.now())
+        if taken:
+            claimed.append(pk)
+    return list(model.objects.filter(pk__in=claimed).order_by('pk'))
+
+
+def run(job, action, attempts):
+    """Выполняет action() для забранного задания; возвращает состояние.
+
+    Упавшее задание возвращается в очередь, пока не исчерпает attempts
+    попыток. Итог пишется, только если задание всё ещё RUNNING: если его
+    поставили заново во время работы, оно выполнится ещё раз.
+    """
+    model = type(job)
+    try:
+        action()
+    except Exception as error:
+        job.attempts += 1
+        job.error = repr(error)[:MAX_ERROR_LENGTH]
+        if job.attempts >= attempts:
+            job.status = model.FAILED
+        else:
+            job.status = model.PENDING
+    else:
+        job.status = model.DONE
+        job.error = ''
+    model.objects.filter(
+        pk=job.pk, status=model.RUNNING
+    ).update(status=job.status, attempts=job.attempts, error=job.error,
+             updated_at=timezone.now())
+    return job.status
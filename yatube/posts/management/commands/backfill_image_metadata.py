@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры, формат, объём и хэш картинок старых постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk', type=int, default=500,
+            help='Сколько постов читать и обновлять за раз',
+        )
+
+    def handle(self, *args, **options):
+        pending = Post.objects.exclude(image='').filter(
+            image_hash='').order_by('pk').only('pk', 'image')
+        last_pk = 0
+        updated = missing = 0
+        while True:
+            chunk = list(pending.filter(pk__gt=last_pk)[:options['chunk']])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            # Одна картинка может быть у нескольких постов: читаем её раз.
+            known = {}
+            for post in chunk:
+                if post.image.name in known:
+                    images.set_metadata(post, known[post.image.name])
+                else:
+                    known[post.image.name] = images.record_metadata(post)
+                if post.image_hash:
+                    updated += 1
+                else:
+                    missing += 1
+            Post.objects.bulk_update(
+                [post for post in chunk if post.image_hash],
+                images.METADATA_FIELDS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено постов: {updated}; без файла: {missing}'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь картинки постов без миниатюр и вариантов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk', type=int, default=1000,
+            help='Сколько постов читать за раз',
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').filter(
+            image_variants='').order_by('image').values_list(
+            'image', flat=True).distinct()
+        queued = 0
+        for name in names.iterator(chunk_size=options['chunk']):
+            thumbnails.enqueue(name)
+            queued += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'В очередь поставлено картинок: {queued}; '
+            f'запустите thumbnail_worker'))
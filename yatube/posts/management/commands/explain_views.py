@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from core.explain import explainable, plan_problems, query_plan
+from core.query_budget import QueryRecorder
+from core.testing import iter_urls
+from posts.models import Group, Post
+
+User = get_user_model()
+
+URLCONFS = ('posts.urls', 'users.urls', 'about.urls')
+NO_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+
+
+def sample_url_kwargs():
+    """Значения параметров маршрутов из текущей базы."""
+    group = Group.objects.order_by('pk').first()
+    post = Post.objects.order_by('pk').first()
+    user = User.objects.order_by('pk').first()
+    return {
+        'slug': group.slug if group else 'missing',
+        'username': user.username if user else 'missing',
+        'post_id': post.pk if post else 0,
+        'uidb64': 'MQ',
+        'token': 'set-password',
+    }
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN QUERY PLAN для запросов каждой страницы и '
+            'находит полные просмотры таблиц и сортировки без индекса')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            help='Открывать страницы от имени этого пользователя',
+        )
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершаться с ошибкой, если найдены проблемы',
+        )
+
+    def handle(self, *args, **options):
+        client = Client()
+        if options['username']:
+            try:
+                client.force_login(
+                    User.objects.get(username=options['username']))
+            except User.DoesNotExist:
+                raise CommandError('Нет такого пользователя')
+        url_kwargs = sample_url_kwargs()
+        found = 0
+        for urlconf in URLCONFS:
+            for url in iter_urls(urlconf, url_kwargs):
+                found += self.explain_url(client, url)
+        if found and options['fail']:
+            raise CommandError(f'Проблемных запросов: {found}')
+        if found:
+            self.stdout.write(self.style.WARNING(
+                f'Проблемных запросов: {found}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Проблем не найдено'))
+
+    def explain_url(self, client, url):
+        # Без кэша, чтобы view действительно ходили в базу.
+        with override_settings(CACHES=NO_CACHE):
+            with QueryRecorder() as recorder:
+                client.get(url)
+        found = 0
+        seen = set()
+        for query in recorder.queries:
+            if query.sql in seen or not explainable(query):
+                continue
+            seen.add(query.sql)
+            problems = plan_problems(query_plan(query), query.sql)
+            if not problems:
+                continue
+            found += 1
+            self.stdout.write(f'{url}\n  {query.sql}')
+            for detail, problem in problems:
+                self.stdout.write(f'    {problem}: {detail}')
+        return found
@@ -0,0 +1,7 @@
+from posts.feeds import run_pending
+from posts.workers import JobWorkerCommand
+
+
+class Command(JobWorkerCommand):
+    help = 'Фоновый воркер: раскладывает ленты подписок из очереди FeedJob'
+    run_pending = staticmethod(run_pending)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов и комментариев'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = search.rebuild()
+        backend = 'FTS5' if search.uses_fts5() else 'запасной индекс'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано документов: {total} ({backend})'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики и исправляет расхождения'
+
+    def handle(self, *args, **options):
+        fixed = reconcile()
+        for name, count in fixed.items():
+            self.stdout.write(f'{name}: исправлено {count}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
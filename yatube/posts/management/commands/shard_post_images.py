@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from core.storage import content_hash, is_sharded, sharded_name
+from posts import thumbnails
+from posts.models import Post
+from posts.signals import bump_posts
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов в хранилище по хэшу '
+            '(posts/ab/cd/<хэш>.jpg) и переписывает пути в базе')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk', type=int, default=500,
+            help='Сколько файлов переносить за одно обновление базы',
+        )
+        parser.add_argument(
+            '--delete-originals', action='store_true',
+            help='Удалять старые файлы; без флага они остаются, чтобы '
+                 'закэшированные страницы не потеряли картинки',
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        names = Post.objects.exclude(image='').order_by('image').values_list(
+            'image', flat=True).distinct()
+        moved = deduplicated = missing = 0
+        last_name = ''
+        while True:
+            # Порции по имени: переписанные строки не сбивают выборку.
+            chunk = list(names.filter(image__gt=last_name)[:options['chunk']])
+            if not chunk:
+                break
+            last_name = chunk[-1]
+            renames = {}
+            for name in chunk:
+                if is_sharded(name):
+                    continue
+                if not storage.exists(name):
+                    missing += 1
+                    continue
+                with storage.open(name) as file:
+                    new_name = sharded_name(name, content_hash(file))
+                    if storage.exists(new_name):
+                        deduplicated += 1
+                    else:
+                        storage.save(name, file)
+                renames[name] = new_name
+            moved += len(renames)
+            self.rewrite(renames, storage, options['delete_originals'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, из них дублей: {deduplicated}; '
+            f'не найдено: {missing}'))
+
+    def rewrite(self, renames, storage, delete_originals):
+        """Один UPDATE на порцию переименований."""
+        if not renames:
+            return
+        posts = Post.objects.filter(image__in=list(renames))
+        with transaction.atomic():
+            authors = set(posts.values_list('author_id', flat=True))
+            groups = set(posts.values_list('group_id', flat=True))
+            # UPDATE идёт мимо сигналов: updated_at сдвигаем здесь же, а
+            # кэши страниц со старыми адресами сбрасывает bump_posts().
+            posts.update(image=Case(
+                *[When(image=old, then=Value(new))
+                  for old, new in renames.items()]),
+                updated_at=timezone.now())
+            # Миниатюры sorl привязаны к имени исходника.
+            for new_name in set(renames.values()):
+                thumbnails.enqueue(new_name)
+        # После коммита, чтобы кэш не успел заполниться старыми путями.
+        bump_posts(authors, groups)
+        if delete_originals:
+            for old_name in renames:
+                storage.delete(old_name)
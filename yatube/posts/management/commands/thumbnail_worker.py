@@ -0,0 +1,7 @@
+from posts.thumbnails import run_pending
+from posts.workers import JobWorkerCommand
+
+
+class Command(JobWorkerCommand):
+    help = 'Фоновый воркер: готовит миниатюры из очереди ThumbnailJob'
+    run_pending = staticmethod(run_pending)
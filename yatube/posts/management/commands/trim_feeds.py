@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.feeds import trim_all
+
+
+class Command(BaseCommand):
+    help = 'Обрезает ленты подписок до FEED_INBOX_SIZE последних записей'
+
+    def handle(self, *args, **options):
+        trimmed = trim_all()
+        self.stdout.write(self.style.SUCCESS(f'Обрезано лент: {trimmed}'))
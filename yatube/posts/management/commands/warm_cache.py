@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.warmup import warm
+
+
+class Command(BaseCommand):
+    help = ('Прогревает кэш страниц: первые страницы главной, самые большие '
+            'группы и самые популярные профили')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=settings.WARM_CACHE_PAGES,
+            help='Сколько первых страниц главной открыть',
+        )
+        parser.add_argument(
+            '--groups', type=int, default=settings.WARM_CACHE_GROUPS,
+            help='Сколько групп с наибольшим числом постов открыть',
+        )
+        parser.add_argument(
+            '--profiles', type=int, default=settings.WARM_CACHE_PROFILES,
+            help='Сколько профилей с наибольшим числом подписчиков открыть',
+        )
+        parser.add_argument(
+            '--host', default=settings.WARM_CACHE_HOST,
+            help='Адрес сайта, под которым кэшируются страницы',
+        )
+        parser.add_argument(
+            '--secure', action='store_true',
+            default=settings.WARM_CACHE_SECURE,
+            help='Открывать страницы по https, как за TLS',
+        )
+
+    def handle(self, *args, **options):
+        steps = warm(options['pages'], options['groups'],
+                     options['profiles'], options['host'],
+                     options['secure'])
+        for step in steps:
+            failed = f', с ошибкой: {step.failed}' if step.failed else ''
+            self.stdout.write(
+                f'{step.name}: {step.count}{failed}, {step.seconds:.2f} с')
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрев занял {sum(step.seconds for step in steps):.2f} с'))
@@ -0,0 +1,69 @@
+# Generated by Django 2.2.16 on 2026-10-17 14:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserStats = apps.get_model('posts', 'UserStats')
+    Post = apps.get_model('posts', 'Post')
+    Group = apps.get_model('posts', 'Group')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+
+    def totals(model, key):
+        return dict(model.objects.order_by().values_list(key).annotate(
+            total=Count('pk')))
+
+    posts = totals(Post, 'author_id')
+    followers = totals(Follow, 'author_id')
+    following = totals(Follow, 'user_id')
+    UserStats.objects.bulk_create([
+        UserStats(user_id=pk,
+                  posts_count=posts.get(pk, 0),
+                  followers_count=followers.get(pk, 0),
+                  following_count=following.get(pk, 0))
+        for pk in User.objects.values_list('pk', flat=True)
+    ], batch_size=500)
+    for post_id, total in totals(Comment, 'post_id').items():
+        Post.objects.filter(pk=post_id).update(comments_count=total)
+    for group_id, total in totals(Post, 'group_id').items():
+        Group.objects.filter(pk=group_id).update(posts_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_feeditem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Число подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
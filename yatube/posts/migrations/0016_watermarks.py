@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-17 14:56
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Последнее изменение'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Последнее изменение'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 2.2.16 on 2026-10-17 15:04
+
+from collections import Counter
+import re
+
+from django.db import DatabaseError, migrations, models
+import django.db.models.deletion
+
+# Как posts.search.tokenize на момент миграции.
+WORD = re.compile(r'[^\W_]+')
+MAX_TERM_LENGTH = 100
+BATCH_SIZE = 500
+
+
+def create_fts_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_search USING fts5('
+            'body, tokenize="unicode61 remove_diacritics 0")'
+        )
+    except DatabaseError:
+        # SQLite собран без FTS5 — останется запасной индекс.
+        pass
+
+
+def fill_search_index(apps, schema_editor):
+    """Индексирует посты и комментарии, написанные до миграции."""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    SearchDocument = apps.get_model('posts', 'SearchDocument')
+    SearchPosting = apps.get_model('posts', 'SearchPosting')
+    connection = schema_editor.connection
+    if (connection.vendor == 'sqlite'
+            and 'posts_search' in connection.introspection.table_names()):
+        # Ключ документа: 2 * id для поста, 2 * id + 1 для комментария.
+        schema_editor.execute(
+            'INSERT INTO posts_search (rowid, body) '
+            'SELECT id * 2, text FROM posts_post')
+        schema_editor.execute(
+            'INSERT INTO posts_search (rowid, body) '
+            'SELECT id * 2 + 1, text FROM posts_comment')
+        return
+    sources = ((Post, 0), (Comment, 1))
+    for model, kind in sources:
+        rows = model.objects.order_by().values_list('pk', 'text')
+        for start in range(0, rows.count(), BATCH_SIZE):
+            documents, postings = [], []
+            for pk, text in rows.order_by('pk')[start:start + BATCH_SIZE]:
+                key = pk * 2 + kind
+                terms = Counter(word[:MAX_TERM_LENGTH]
+                                for word in WORD.findall(text.lower()))
+                documents.append(SearchDocument(
+                    id=key, length=sum(terms.values())))
+                postings.extend(
+                    SearchPosting(document_id=key, term=term, count=count)
+                    for term, count in terms.items())
+            SearchDocument.objects.bulk_create(documents)
+            SearchPosting.objects.bulk_create(
+                postings, batch_size=BATCH_SIZE)
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Ключ документа')),
+                ('length', models.PositiveIntegerField(verbose_name='Число слов')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, verbose_name='Слово')),
+                ('count', models.PositiveIntegerField(verbose_name='Число вхождений')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='postings', to='posts.SearchDocument', verbose_name='Документ')),
+            ],
+            options={
+                'verbose_name': 'Вхождение слова',
+                'verbose_name_plural': 'Вхождения слов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchposting',
+            constraint=models.UniqueConstraint(fields=('term', 'document'), name='unique_search_posting'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
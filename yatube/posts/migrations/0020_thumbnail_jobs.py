@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-17 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='Картинка')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Состояние')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Последнее изменение')),
+            ],
+            options={
+                'verbose_name': 'Задание на миниатюры',
+                'verbose_name_plural': 'Задания на миниатюры',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='thumbnailjob',
+            index=models.Index(fields=['status', 'id'], name='thumbnail_job_status_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-17 16:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def mark_pulled_authors(apps, schema_editor):
+    # Раньше режим выводился из счётчика подписчиков.
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=settings.FEED_PULL_THRESHOLD
+    ).update(feed_mode='pull')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0023_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_mode',
+            field=models.CharField(choices=[('push', 'Раскладывается во входящие'), ('pull', 'Читается при запросе ленты'), ('filling', 'Возвращается во входящие')], default='push', max_length=10, verbose_name='Посты в ленте подписчиков'),
+        ),
+        migrations.RunPython(mark_pulled_authors, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='FeedJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Состояние')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Последнее изменение')),
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Задание на ленту',
+                'verbose_name_plural': 'Задания на ленту',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedjob',
+            index=models.Index(fields=['status', 'id'], name='feed_job_status_idx'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 FIRST_SYMB_IN_POST: int = 15
@@ -9,6 +12,15 @@ class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name="Название")
     slug = models.SlugField(unique=True, verbose_name="Адрес страницы")
     description = models.TextField(verbose_name="Описание")
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число постов"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Последнее изменение"
+    )
 
     def __str__(self) -> str:
         return self.title
@@ -41,8 +53,34 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False)
+    image_size = models.BigIntegerField(
+        'Размер файла, байт', null=True, blank=True, editable=False)
+    image_format = models.CharField(
+        'Формат картинки', max_length=10, blank=True, editable=False)
+    image_hash = models.CharField(
+        'SHA-256 картинки', max_length=64, blank=True, editable=False)
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+        help_text='JSON: тип файла -> [[имя, ширина], ...], пишет воркер'
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число комментариев"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Последнее изменение"
+    )
 
     def __str__(self) -> str:
         return self.text[:FIRST_SYMB_IN_POST]
@@ -51,6 +89,20 @@ class Post(models.Model):
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -83,8 +135,15 @@ class Comment(models.Model):
         return self.text
 
     class Meta:
+        ordering = ['created', 'id']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -106,6 +165,240 @@ class Follow(models.Model):
         verbose_name_plural = 'Подписки'
         constraints = [models.UniqueConstraint(
             fields=['user', 'author'], name='unique_follower')]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.user.username
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые обновляются при записи."""
+    FEED_PUSH = 'push'
+    FEED_PULL = 'pull'
+    FEED_FILLING = 'filling'
+    FEED_MODES = (
+        (FEED_PUSH, 'Раскладывается во входящие'),
+        (FEED_PULL, 'Читается при запросе ленты'),
+        (FEED_FILLING, 'Возвращается во входящие'),
+    )
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок'
+    )
+    feed_mode = models.CharField(
+        max_length=10,
+        choices=FEED_MODES,
+        default=FEED_PUSH,
+        verbose_name='Посты в ленте подписчиков'
+    )
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Последнее изменение'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self) -> str:
+        return str(self.user_id)
+
+
+class FeedItem(models.Model):
+    """Запись ленты подписок: пост автора во «входящих» читателя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'], name='unique_feed_item')]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user_id}: {self.post_id}'
+
+
+class SearchDocument(models.Model):
+    """Документ запасного поискового индекса (когда нет FTS5).
+
+    Ключ — doc_id из posts.search: 2 * id для поста, 2 * id + 1 для
+    комментария.
+    """
+    id = models.BigIntegerField(
+        primary_key=True,
+        verbose_name='Ключ документа'
+    )
+    length = models.PositiveIntegerField(verbose_name='Число слов')
+
+    class Meta:
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+
+    def __str__(self) -> str:
+        return str(self.id)
+
+
+class SearchPosting(models.Model):
+    """Вхождение слова в документ запасного поискового индекса.
+
+    posts.search удаляет вхождения сам, перед документом, поэтому
+    DO_NOTHING: так документ удаляется одним запросом.
+    """
+    document = models.ForeignKey(
+        SearchDocument,
+        on_delete=models.DO_NOTHING,
+        related_name='postings',
+        verbose_name='Документ'
+    )
+    term = models.CharField(max_length=100, verbose_name='Слово')
+    count = models.PositiveIntegerField(verbose_name='Число вхождений')
+
+    class Meta:
+        verbose_name = 'Вхождение слова'
+        verbose_name_plural = 'Вхождения слов'
+        constraints = [models.UniqueConstraint(
+            fields=['term', 'document'], name='unique_search_posting')]
+
+    def __str__(self) -> str:
+        return f'{self.term}: {self.document_id}'
+
+
+class ThumbnailJob(models.Model):
+    """Задание фоновому воркеру: подготовить миниатюры картинки."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    source = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Картинка'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Состояние'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Последнее изменение'
+    )
+
+    class Meta:
+        verbose_name = 'Задание на миниатюры'
+        verbose_name_plural = 'Задания на миниатюры'
+        indexes = [
+            models.Index(
+                fields=['status', 'id'],
+                name='thumbnail_job_status_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.source}: {self.status}'
+
+
+class FeedJob(models.Model):
+    """Задание фоновому воркеру: привести входящие подписчиков автора в
+    соответствие с UserStats.feed_mode."""
+    PENDING = ThumbnailJob.PENDING
+    RUNNING = ThumbnailJob.RUNNING
+    DONE = ThumbnailJob.DONE
+    FAILED = ThumbnailJob.FAILED
+
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=ThumbnailJob.STATUSES,
+        default=PENDING,
+        verbose_name='Состояние'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Последнее изменение'
+    )
+
+    class Meta:
+        verbose_name = 'Задание на ленту'
+        verbose_name_plural = 'Задания на ленту'
+        indexes = [
+            models.Index(
+                fields=['status', 'id'],
+                name='feed_job_status_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.author_id}: {self.status}'
@@ -0,0 +1,281 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Документ — текст поста или комментария, его ключ doc_id равен 2 * id
+для поста и 2 * id + 1 для комментария. Если SQLite собран с FTS5,
+индекс хранится в виртуальной таблице posts_search и ранжируется её
+bm25(). Иначе используется запасной индекс в моделях SearchDocument и
+SearchPosting, а BM25 считается на Python по тем же формулам.
+
+Индекс обновляется сигналами при сохранении и удалении; команда
+rebuild_search_index перестраивает его целиком.
+"""
+import math
+import re
+from collections import Counter, defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import connections
+
+from core.paginators import (CURSOR_NEXT, InvalidCursor, decode_cursor,
+                             encode_cursor)
+
+from .models import Comment, Post, SearchDocument, SearchPosting
+
+POST: str = 'post'
+COMMENT: str = 'comment'
+KINDS = (POST, COMMENT)
+FTS_TABLE: str = 'posts_search'
+MAX_TERM_LENGTH: int = 100
+BM25_K1: float = 1.2
+BM25_B: float = 0.75
+REBUILD_BATCH_SIZE: int = 500
+
+Hit = namedtuple('Hit', ['kind', 'object_id', 'score', 'doc_id'])
+Result = namedtuple('Result', ['kind', 'object', 'score'])
+SearchPage = namedtuple('SearchPage', ['results', 'cursor', 'next_cursor'])
+
+_WORD = re.compile(r'[^\W_]+')
+_fts_tables = {}
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре (как токенизатор unicode61)."""
+    return [word[:MAX_TERM_LENGTH] for word in _WORD.findall(text.lower())]
+
+
+def doc_id(kind, object_id):
+    return object_id * 2 + KINDS.index(kind)
+
+
+def split_doc_id(key):
+    return KINDS[key % 2], key // 2
+
+
+def _connection():
+    return connections['default']
+
+
+def uses_fts5():
+    """Есть ли в базе FTS5-таблица (её создаёт миграция, если может)."""
+    if settings.SEARCH_BACKEND != 'auto':
+        return settings.SEARCH_BACKEND == 'fts5'
+    connection = _connection()
+    key = connection.settings_dict['NAME']
+    if key not in _fts_tables:
+        _fts_tables[key] = (
+            FTS_TABLE in connection.introspection.table_names())
+    return _fts_tables[key]
+
+
+def _python_document(key, text):
+    terms = Counter(tokenize(text))
+    document = SearchDocument(id=key, length=sum(terms.values()))
+    postings = [
+        SearchPosting(document_id=key, term=term, count=count)
+        for term, count in terms.items()
+    ]
+    return document, postings
+
+
+def remove_document(kind, object_id):
+    key = doc_id(kind, object_id)
+    if uses_fts5():
+        with _connection().cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [key])
+    else:
+        SearchPosting.objects.filter(document_id=key).delete()
+        SearchDocument.objects.filter(pk=key).delete()
+
+
+def index_document(kind, object_id, text):
+    """Добавляет или заменяет документ в индексе."""
+    remove_document(kind, object_id)
+    key = doc_id(kind, object_id)
+    if uses_fts5():
+        with _connection().cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                [key, text])
+        return
+    document, postings = _python_document(key, text)
+    document.save(force_insert=True)
+    SearchPosting.objects.bulk_create(postings)
+
+
+def index_post(post):
+    index_document(POST, post.pk, post.text)
+
+
+def remove_post(post):
+    remove_document(POST, post.pk)
+
+
+def index_comment(comment):
+    index_document(COMMENT, comment.pk, comment.text)
+
+
+def remove_comment(comment):
+    remove_document(COMMENT, comment.pk)
+
+
+def _all_documents():
+    for pk, text in Post.objects.order_by().values_list(
+            'pk', 'text').iterator():
+        yield doc_id(POST, pk), text
+    for pk, text in Comment.objects.order_by().values_list(
+            'pk', 'text').iterator():
+        yield doc_id(COMMENT, pk), text
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rebuild():
+    """Перестраивает индекс по всем постам и комментариям."""
+    total = 0
+    if uses_fts5():
+        with _connection().cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            for batch in _batches(_all_documents(), REBUILD_BATCH_SIZE):
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, body) '
+                    f'VALUES (%s, %s)', batch)
+                total += len(batch)
+        return total
+    SearchPosting.objects.all().delete()
+    SearchDocument.objects.all().delete()
+    for batch in _batches(_all_documents(), REBUILD_BATCH_SIZE):
+        built = [_python_document(key, text) for key, text in batch]
+        SearchDocument.objects.bulk_create(
+            [document for document, _ in built])
+        SearchPosting.objects.bulk_create(
+            [posting for _, postings in built for posting in postings],
+            batch_size=REBUILD_BATCH_SIZE)
+        total += len(batch)
+    return total
+
+
+def _kinds_condition(kinds):
+    flags = ', '.join(str(KINDS.index(kind)) for kind in kinds)
+    return f'rowid %% 2 IN ({flags})'
+
+
+def _search_fts5(terms, limit, after, kinds):
+    match = ' '.join(f'"{term}"' for term in terms)
+    conditions = [_kinds_condition(kinds)]
+    params = [match]
+    if after is not None:
+        conditions.append('(score < %s OR (score = %s AND rowid > %s))')
+        params.extend([after[0], after[0], after[1]])
+    params.append(limit)
+    sql = (
+        f'SELECT rowid, score FROM ('
+        f'SELECT rowid, -bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s'
+        f') WHERE {" AND ".join(conditions)} '
+        f'ORDER BY score DESC, rowid LIMIT %s'
+    )
+    with _connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(score, key) for key, score in cursor.fetchall()]
+
+
+def _idf(total, frequency):
+    # Как в FTS5: слишком частые слова получают почти нулевой вес.
+    return max(math.log((total - frequency + 0.5) / (frequency + 0.5)),
+               1e-6)
+
+
+def _search_python(terms, limit, after, kinds):
+    wanted = set(terms)
+    matches = defaultdict(dict)
+    lengths = {}
+    postings = SearchPosting.objects.filter(term__in=wanted).values_list(
+        'document_id', 'term', 'count', 'document__length')
+    for key, term, count, length in postings:
+        matches[key][term] = count
+        lengths[key] = length
+    frequency = Counter(term for found in matches.values() for term in found)
+    total = SearchDocument.objects.count()
+    average = sum(lengths.values()) / len(lengths) if lengths else 1
+    idf = {term: _idf(total, frequency[term]) for term in wanted}
+    ranked = []
+    for key, found in matches.items():
+        if len(found) < len(wanted) or split_doc_id(key)[0] not in kinds:
+            continue
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[key] / average)
+        score = sum(
+            idf[term] * count * (BM25_K1 + 1) / (count + norm)
+            for term, count in found.items()
+        )
+        if after is None or (-score, key) > (-after[0], after[1]):
+            ranked.append((score, key))
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+    return ranked[:limit]
+
+
+def search(query, limit, after=None, kinds=KINDS):
+    """Лучшие совпадения со всеми словами запроса, по убыванию score.
+
+    after — пара (score, doc_id) последнего результата прошлой страницы.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    backend = _search_fts5 if uses_fts5() else _search_python
+    return [
+        Hit(*split_doc_id(key), score, key)
+        for score, key in backend(terms, limit, after, kinds)
+    ]
+
+
+def matching_ids(query, kind, limit):
+    """id объектов одного типа, найденных по запросу."""
+    return [hit.object_id for hit in search(query, limit, kinds=(kind,))]
+
+
+def _load(hits):
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [hit.object_id for hit in hits if hit.kind == POST])
+    comments = Comment.objects.select_related('author', 'post').in_bulk(
+        [hit.object_id for hit in hits if hit.kind == COMMENT])
+    objects = {POST: posts, COMMENT: comments}
+    return [
+        Result(hit.kind, objects[hit.kind][hit.object_id], hit.score)
+        for hit in hits
+        if hit.object_id in objects[hit.kind]
+    ]
+
+
+def _parse_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        direction, values = decode_cursor(cursor)
+        score, key = values
+        if direction != CURSOR_NEXT:
+            raise InvalidCursor('Поиск листается только вперёд')
+        return float(score), int(key)
+    except (InvalidCursor, TypeError, ValueError):
+        return None
+
+
+def search_page(query, per_page, cursor=None):
+    """Страница результатов; битый курсор ведёт на первую страницу."""
+    after = _parse_cursor(cursor)
+    hits = search(query, per_page + 1, after)
+    next_cursor = None
+    if len(hits) > per_page:
+        hits = hits[:per_page]
+        next_cursor = encode_cursor(
+            CURSOR_NEXT, [hits[-1].score, hits[-1].doc_id])
+    return SearchPage(_load(hits), cursor if after else '', next_cursor)
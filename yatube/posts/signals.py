@@ -0,0 +1,168 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core import anonymous_cache
+
+from . import counters, feeds, images, search, thumbnails, watermarks
+from .cache import (GROUP_LISTING, INDEX_LISTING, PROFILE_LISTING,
+                    bump_listing, forget_choices)
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def _bump_profiles(*user_ids):
+    anonymous_cache.invalidate()
+    watermarks.touch_users(*user_ids)
+    usernames = User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True)
+    for username in usernames:
+        bump_listing(PROFILE_LISTING, username)
+
+
+def bump_posts(author_ids, group_ids):
+    """Сбрасывает списки, страницы гостей и отметки авторов и групп.
+
+    Для массовых UPDATE постов, которые проходят мимо сигналов; отметки
+    самих постов (updated_at) вызывающий сдвигает в том же UPDATE.
+    """
+    watermarks.touch_groups(*group_ids)
+    bump_listing(INDEX_LISTING)
+    slugs = Group.objects.filter(
+        pk__in=[pk for pk in group_ids if pk]
+    ).values_list('slug', flat=True)
+    for slug in slugs:
+        bump_listing(GROUP_LISTING, slug)
+    _bump_profiles(*author_ids)
+
+
+def _bump_post_listings(post, *group_ids):
+    bump_posts([post.author_id], group_ids)
+
+
+def _bump_group_posts(group_id):
+    # Название и ссылка группы есть на страницах её постов и в профилях
+    # их авторов.
+    watermarks.touch_group_posts(group_id)
+    _bump_profiles(*Post.objects.filter(group_id=group_id).values_list(
+        'author_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_values(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    old = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', 'image').first()
+    instance._old_group_id, instance._old_image = old or (None, '')
+    if instance.image.name != instance._old_image:
+        # Варианты старой картинки новой не подходят, воркер сделает свои.
+        instance.image_variants = ''
+
+
+@receiver(pre_save, sender=Post)
+def record_image_metadata(sender, instance, raw=False, **kwargs):
+    # Вызывается после remember_old_values: у нового поста _old_image нет.
+    if not raw and instance.image.name != getattr(
+            instance, '_old_image', None):
+        images.record_metadata(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_post(instance)
+    if instance.image and instance.image.name != getattr(
+            instance, '_old_image', None):
+        thumbnails.enqueue(instance.image.name)
+    if created:
+        counters.post_added(instance)
+        feeds.push_post(instance)
+        _bump_post_listings(instance, instance.group_id)
+    elif hasattr(instance, '_old_group_id'):
+        counters.post_moved(instance._old_group_id, instance.group_id)
+        _bump_post_listings(
+            instance, instance._old_group_id, instance.group_id)
+        del instance._old_group_id, instance._old_image
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    search.remove_post(instance)
+    counters.post_removed(instance)
+    _bump_post_listings(instance, instance.group_id)
+
+
+@receiver(pre_save, sender=Group)
+def remember_old_slug(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        instance._old_slug, instance._old_title = Group.objects.filter(
+            pk=instance.pk).values_list('slug', 'title').first() or (
+                None, None)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        anonymous_cache.invalidate()
+        bump_listing(INDEX_LISTING)
+        bump_listing(GROUP_LISTING, instance.slug)
+        # Страница по прежнему адресу группы тоже устарела.
+        old_slug = instance.__dict__.pop('_old_slug', None)
+        if old_slug and old_slug != instance.slug:
+            bump_listing(GROUP_LISTING, old_slug)
+        old_title = instance.__dict__.pop('_old_title', None)
+        if old_slug and (old_slug, old_title) != (
+                instance.slug, instance.title):
+            _bump_group_posts(instance.pk)
+        forget_choices(Group)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # После удаления посты уже отвязаны от группы (SET_NULL без сигналов).
+    _bump_group_posts(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_comment(instance)
+    if created:
+        counters.comment_added(instance)
+        watermarks.touch_post(instance.post_id)
+        anonymous_cache.invalidate()
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    search.remove_comment(instance)
+    counters.comment_removed(instance)
+    watermarks.touch_post(instance.post_id)
+    anonymous_cache.invalidate()
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.follow_added(instance)
+        feeds.follow_added(instance.user_id, instance.author_id)
+        _bump_profiles(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.follow_removed(instance)
+    feeds.follow_removed(instance.user_id, instance.author_id)
+    _bump_profiles(instance.user_id, instance.author_id)
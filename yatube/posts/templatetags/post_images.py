@@ -0,0 +1,17 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    """Находит миниатюры всех постов страницы одним походом в кэш.
+
+    Ставится перед циклом по page_obj: проставляет post.thumb_url,
+    который читает includes/post_image.html. Исходные картинки не
+    открываются — миниатюры создаёт воркер.
+    """
+    thumbnails.prefetch(posts)
+    return ''
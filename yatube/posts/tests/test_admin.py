@@ -0,0 +1,116 @@
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.paginators import EstimatedCountPaginator
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+CHANGELISTS = (
+    'admin:posts_post_changelist',
+    'admin:posts_comment_changelist',
+    'admin:posts_follow_changelist',
+    'admin:posts_group_changelist',
+)
+
+
+class AdminScalabilityTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin_user', 'admin@example.com', 'password')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {index}',
+                slug=f'admin-group-{index}',
+                description='Описание',
+            )
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        authors = [
+            User.objects.create_user(username=f'admin_author_{index}')
+            for index in range(User.objects.count(),
+                               User.objects.count() + count)
+        ]
+        for index, author in enumerate(authors):
+            post = Post.objects.create(
+                author=author,
+                group=self.groups[index % len(self.groups)],
+                text=f'Пост {index}',
+            )
+            Comment.objects.create(post=post, author=author, text='Текст')
+            Follow.objects.create(user=author, author=self.admin)
+
+    def changelist_queries(self):
+        counts = {}
+        for name in CHANGELISTS:
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse(name))
+            counts[name] = len(queries)
+        return counts
+
+    def test_changelist_queries_do_not_grow(self):
+        """Число запросов списков не зависит от числа строк"""
+        self.add_rows(2)
+        few = self.changelist_queries()
+        self.add_rows(30)
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_author_uses_autocomplete(self):
+        """Автор поста выбирается автодополнением, а не списком"""
+        response = self.client.get(reverse('admin:posts_post_add'))
+        widget = response.context['adminform'].form.fields['author'].widget
+        self.assertIsInstance(widget.widget, AutocompleteSelect)
+
+    def test_group_choices_are_cached(self):
+        """Новая группа сразу появляется в закэшированных вариантах"""
+        self.client.get(reverse('admin:posts_post_add'))
+        group = Group.objects.create(
+            title='Новая', slug='admin-new', description='Описание')
+        response = self.client.get(reverse('admin:posts_post_add'))
+        choices = response.context['adminform'].form.fields['group'].choices
+        self.assertIn((group.pk, group.title), list(choices))
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='paginator_author')
+        Post.objects.bulk_create([
+            Post(author=author, text=f'Пост {index}') for index in range(6)
+        ])
+
+    def paginator(self, queryset):
+        paginator = EstimatedCountPaginator(queryset, 2)
+        paginator.count_limit = 3
+        return paginator
+
+    def test_small_count_is_exact(self):
+        """До count_limit строк число точное"""
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, 6)
+
+    def test_filtered_count_is_capped(self):
+        """Отфильтрованная выборка считается не дальше count_limit"""
+        queryset = Post.objects.filter(text__startswith='Пост')
+        self.assertEqual(self.paginator(queryset).count, 4)
+
+    def test_unfiltered_count_uses_statistics(self):
+        """Без фильтров число берётся из статистики СУБД"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(self.paginator(Post.objects.all()).count, 6)
@@ -0,0 +1,114 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='etag_author')
+        cls.reader = User.objects.create_user(username='etag_reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='etag-group',
+            description='Описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост',
+            group=cls.group,
+        )
+        cls.urls = {
+            'post': reverse('posts:post_detail',
+                            kwargs={'post_id': cls.post.pk}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': cls.author.username}),
+            'group': reverse('posts:group_list',
+                             kwargs={'slug': cls.group.slug}),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def revalidate(self, url, client=None):
+        client = client or self.guest_client
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_return_not_modified(self):
+        """Повторный запрос без изменений получает 304 без шаблона и,
+        для анонимного посетителя, без запросов к БД"""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                etag = self.guest_client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertFalse(response.templates)
+
+    def test_last_modified_validator(self):
+        """Last-Modified тоже позволяет ответить 304"""
+        url = self.urls['post']
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_changes_invalidate_validators(self):
+        """Комментарий, новый пост и подписка меняют ETag страниц"""
+        changes = {
+            'post': lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'),
+            'group': lambda: Post.objects.create(
+                author=self.reader, text='Новый', group=self.group),
+            'profile': lambda: Follow.objects.create(
+                user=self.reader, author=self.author),
+        }
+        for name, change in changes.items():
+            with self.subTest(page=name):
+                url = self.urls[name]
+                etag = self.guest_client.get(url)['ETag']
+                change()
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_viewer(self):
+        """У гостя и пользователя разные ETag одной страницы"""
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        url = self.urls['profile']
+        self.assertNotEqual(self.guest_client.get(url)['ETag'],
+                            reader_client.get(url)['ETag'])
+
+    def test_group_rename_invalidates_post_and_profile(self):
+        """Новое название группы меняет ETag поста и профиля автора"""
+        for name in ('post', 'profile'):
+            with self.subTest(page=name):
+                url = self.urls[name]
+                etag = self.guest_client.get(url)['ETag']
+                group = Group.objects.get(pk=self.group.pk)
+                group.title = f'Группа для {name}'
+                group.save()
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, f'Группа для {name}')
+
+    def test_group_delete_invalidates_post(self):
+        """Удаление группы меняет ETag страницы её поста"""
+        url = self.urls['post']
+        etag = self.guest_client.get(url)['ETag']
+        Group.objects.filter(pk=self.group.pk).delete()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -0,0 +1,137 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='count_author')
+        cls.reader = User.objects.create_user(username='count_reader')
+        cls.group = Group.objects.create(
+            title='Группа счётчиков',
+            slug='counters',
+            description='Описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-counters',
+            description='Описание',
+        )
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счётчики"""
+        self.author_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост', 'group': self.group.pk},
+        )
+        post = Post.objects.get(text='Пост')
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Пост', 'group': self.other_group.pk},
+        )
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.refresh_from_db()
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_counter(self):
+        """Комментарий увеличивает счётчик поста"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Comment.objects.get(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обеих сторон"""
+        url_kwargs = {'username': self.author.username}
+        self.reader_client.get(reverse('posts:profile_follow',
+                                       kwargs=url_kwargs))
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.reader_client.get(reverse('posts:profile_unfollow',
+                                       kwargs=url_kwargs))
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_profile_reads_stored_counter(self):
+        """Профиль показывает сохранённый счётчик без COUNT(*)"""
+        Post.objects.create(author=self.author, text='Пост')
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        response = self.reader_client.get(reverse(
+            'posts:profile', kwargs={'username': self.author.username}))
+        self.assertContains(response, 'Всего постов: 42')
+
+    def test_reconcile_counters_command(self):
+        """reconcile_counters исправляет накопившиеся расхождения"""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group)
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.filter(user=self.author).update(
+            posts_count=7, followers_count=0)
+        Post.objects.filter(pk=post.pk).update(comments_count=3)
+        UserStats.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('users: исправлено 2', out.getvalue())
+        self.assertIn('posts: исправлено 1', out.getvalue())
+        author_stats = self.stats(self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+
+class UserDeletionTests(TransactionTestCase):
+    def test_delete_user_with_posts_comments_and_follows(self):
+        """Удаление пользователя не заводит ему строку счётчиков заново"""
+        author = User.objects.create_user(username='gone_author')
+        reader = User.objects.create_user(username='gone_reader')
+        post = Post.objects.create(author=author, text='Пост')
+        Comment.objects.create(post=post, author=author, text='Свой')
+        Comment.objects.create(post=post, author=reader, text='Чужой')
+        reader_post = Post.objects.create(author=reader, text='Ответ')
+        Comment.objects.create(post=reader_post, author=author, text='Ещё')
+        Follow.objects.create(user=reader, author=author)
+        Follow.objects.create(user=author, author=reader)
+        author.delete()
+        self.assertFalse(User.objects.filter(pk=author.pk).exists())
+        self.assertFalse(UserStats.objects.filter(user_id=author.pk).exists())
+        reader_stats = UserStats.objects.get(user=reader)
+        self.assertEqual(reader_stats.followers_count, 0)
+        self.assertEqual(reader_stats.following_count, 0)
+        self.assertEqual(reader_stats.posts_count, 1)
+        reader_post.refresh_from_db()
+        self.assertEqual(reader_post.comments_count, 0)
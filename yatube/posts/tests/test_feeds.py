@@ -0,0 +1,170 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import feeds
+from ..models import FeedItem, FeedJob, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class FeedInboxTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.reader = User.objects.create_user(username='feed_reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_texts(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_follow_backfills_inbox(self):
+        """Подписка подтягивает в ленту уже написанные посты автора"""
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.assertEqual(self.feed_texts(), [self.old_post.text])
+
+    def test_new_post_pushed_to_followers(self):
+        """Новый пост сразу попадает во входящие подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.author)
+        self.client.post(reverse('posts:post_create'), {'text': 'Свежий'})
+        self.assertEqual(self.feed_texts(), ['Свежий', self.old_post.text])
+
+    def test_unfollow_clears_inbox(self):
+        """Отписка убирает посты автора из ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_texts(), [])
+
+    @override_settings(FEED_INBOX_SIZE=2)
+    def test_inbox_is_trimmed(self):
+        """Лента хранит не больше FEED_INBOX_SIZE записей"""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Пост {i}') for i in range(3)
+        ])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.reader).count(), 2)
+
+    @override_settings(FEED_INBOX_SIZE=2)
+    def test_trim_feeds_command(self):
+        """trim_feeds обрезает ленты, выросшие от новых постов"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.author)
+        for i in range(4):
+            self.client.post(
+                reverse('posts:post_create'), {'text': f'Новый {i}'})
+        out = StringIO()
+        call_command('trim_feeds', stdout=out)
+        self.assertIn('Обрезано лент: 1', out.getvalue())
+        self.assertEqual(self.feed_texts(), ['Новый 3', 'Новый 2'])
+
+
+@override_settings(FEED_PULL_THRESHOLD=2, FEED_PUSH_THRESHOLD=2)
+class HybridFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.star = User.objects.create_user(username='star')
+        cls.regular = User.objects.create_user(username='regular')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+
+    def setUp(self):
+        Follow.objects.create(user=self.reader, author=self.star)
+        Follow.objects.create(user=self.fan, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.regular)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_popular_author_is_not_pushed(self):
+        """Посты автора выше порога не раскладываются во входящие"""
+        post = Post.objects.create(author=self.star, text='Звёздный')
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_feed_merges_sources_by_date(self):
+        """Лента сливает входящие и чтение по запросу в порядке дат"""
+        for i in range(12):
+            author = self.star if i % 2 else self.regular
+            Post.objects.create(author=author, text=f'Пост {i}')
+        url = reverse('posts:follow_index')
+        first = self.reader_client.get(url).context['page_obj']
+        second = self.reader_client.get(
+            url, {'cursor': first.next_cursor}).context['page_obj']
+        texts = [post.text for post in first] + [
+            post.text for post in second]
+        self.assertEqual(texts, [f'Пост {i}' for i in reversed(range(12))])
+        back = self.reader_client.get(
+            url, {'cursor': second.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def mode(self, author):
+        return UserStats.objects.get(user=author).feed_mode
+
+    def test_author_below_threshold_is_backfilled(self):
+        """Автор, опустившийся ниже порога, снова раскладывается — в
+        воркере, а до тех пор читается при запросе"""
+        post = Post.objects.create(author=self.star, text='Звёздный')
+        Follow.objects.filter(user=self.fan, author=self.star).delete()
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        self.assertEqual(self.feed(), [post])
+        feeds.run_pending(10)
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.mode(self.star), UserStats.FEED_PUSH)
+        self.assertEqual(self.feed(), [post])
+
+    def test_popular_author_inbox_is_cleared_by_worker(self):
+        """Входящие автора, ставшего популярным, чистит воркер"""
+        Follow.objects.filter(user=self.reader, author=self.star).delete()
+        post = Post.objects.create(author=self.regular, text='Обычный')
+        Follow.objects.create(user=self.fan, author=self.regular)
+        self.assertEqual(self.mode(self.regular), UserStats.FEED_PULL)
+        self.assertTrue(FeedItem.objects.filter(post=post).exists())
+        self.assertEqual(self.feed(), [post])
+        feeds.run_pending(10)
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        self.assertEqual(self.feed(), [post])
+
+    def test_feed_worker_command(self):
+        """Команда feed_worker разбирает очередь и печатает итог"""
+        Follow.objects.filter(user=self.fan, author=self.star).delete()
+        out = StringIO()
+        call_command('feed_worker', once=True, stdout=out)
+        self.assertIn('done: 1', out.getvalue())
+        self.assertFalse(FeedJob.objects.filter(
+            status=FeedJob.PENDING).exists())
+
+    @override_settings(FEED_PUSH_THRESHOLD=1)
+    def test_threshold_has_hysteresis(self):
+        """Подписка и отписка на пороге не переключают режим"""
+        feeds.run_pending(10)
+        for _ in range(3):
+            Follow.objects.filter(user=self.fan, author=self.star).delete()
+            Follow.objects.create(user=self.fan, author=self.star)
+        self.assertEqual(self.mode(self.star), UserStats.FEED_PULL)
+        self.assertFalse(FeedJob.objects.filter(
+            status=FeedJob.PENDING).exists())
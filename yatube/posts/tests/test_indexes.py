@@ -0,0 +1,44 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExplainViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='explain_author')
+        cls.reader = User.objects.create_user(username='explain_reader')
+        group = Group.objects.create(
+            title='Группа',
+            slug='explain',
+            description='Описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for index in range(15):
+            post = Post.objects.create(
+                author=cls.author,
+                group=group,
+                text=f'Пост {index}',
+            )
+        Comment.objects.create(post=post, author=cls.reader, text='Текст')
+
+    def test_guest_pages_use_indexes(self):
+        """Страницы гостя обходятся без полных просмотров и сортировок"""
+        out = StringIO()
+        call_command('explain_views', fail=True, stdout=out)
+        self.assertIn('Проблем не найдено', out.getvalue())
+
+    def test_user_pages_use_indexes(self):
+        """Страницы пользователя обходятся без полных просмотров и
+        сортировок"""
+        out = StringIO()
+        call_command('explain_views', username=self.reader.username,
+                     fail=True, stdout=out)
+        self.assertIn('Проблем не найдено', out.getvalue())
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+
+from core.testing import QueryBudgetTestMixin, iter_urls
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+AUTHORS: int = 20
+GROUPS: int = 5
+POSTS_PER_AUTHOR: int = 50
+COMMENTS: int = 200
+
+URLCONFS = ('posts.urls', 'users.urls', 'about.urls')
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        groups = [
+            Group.objects.create(
+                title=f'Группа {index}',
+                slug=f'group-{index}',
+                description='Описание',
+            )
+            for index in range(GROUPS)
+        ]
+        authors = [
+            User.objects.create_user(username=f'author{index}')
+            for index in range(AUTHORS)
+        ]
+        Post.objects.bulk_create([
+            Post(
+                author=author,
+                group=groups[index % GROUPS] if index % 3 else None,
+                text=f'Пост {index} автора {author.username}',
+            )
+            for author in authors
+            for index in range(POSTS_PER_AUTHOR)
+        ])
+        cls.reader = User.objects.create_user(username='reader')
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.post = Post.objects.filter(author=authors[0]).first()
+        Comment.objects.bulk_create([
+            Comment(
+                post=cls.post,
+                author=authors[index % AUTHORS],
+                text=f'Комментарий {index}',
+            )
+            for index in range(COMMENTS)
+        ])
+        cls.url_kwargs = {
+            'slug': groups[0].slug,
+            'username': authors[0].username,
+            'post_id': cls.post.pk,
+            'uidb64': 'MQ',
+            'token': 'set-password',
+        }
+
+    def test_guest_urls_within_budget(self):
+        """Страницы для гостя укладываются в бюджет запросов"""
+        for urlconf in URLCONFS:
+            for url in iter_urls(urlconf, self.url_kwargs):
+                with self.subTest(url=url):
+                    self.assertWithinBudget(Client(), url)
+
+    def test_authorized_urls_within_budget(self):
+        """Страницы для пользователя укладываются в бюджет запросов"""
+        for urlconf in URLCONFS:
+            for url in iter_urls(urlconf, self.url_kwargs):
+                with self.subTest(url=url):
+                    client = Client()
+                    client.force_login(self.reader)
+                    self.assertWithinBudget(client, url)
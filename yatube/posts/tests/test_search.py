@@ -0,0 +1,110 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post, SearchDocument
+
+User = get_user_model()
+
+
+class SearchBackendTests:
+    """Общие проверки для обоих поисковых индексов."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='search_author')
+        self.dense = Post.objects.create(
+            author=self.author, text='Кот кот кот спит на диване')
+        self.sparse = Post.objects.create(
+            author=self.author,
+            text='Кот, собака, мышь, слон и жираф гуляют по парку',
+        )
+        self.other = Post.objects.create(
+            author=self.author, text='Про собаку')
+        self.comment = Comment.objects.create(
+            post=self.other, author=self.author, text='Мой кот лучше')
+
+    def found(self, query, **kwargs):
+        return [(hit.kind, hit.object_id)
+                for hit in search.search(query, 10, **kwargs)]
+
+    def test_ranked_by_relevance(self):
+        """Чаще встречающееся слово поднимает документ выше"""
+        found = self.found('КОТ')
+        self.assertEqual(found[0], (search.POST, self.dense.pk))
+        self.assertCountEqual(found, [
+            (search.POST, self.dense.pk),
+            (search.POST, self.sparse.pk),
+            (search.COMMENT, self.comment.pk),
+        ])
+
+    def test_all_words_required(self):
+        """Находятся только документы со всеми словами запроса"""
+        self.assertEqual(self.found('кот собака'),
+                         [(search.POST, self.sparse.pk)])
+
+    def test_kinds_filter(self):
+        """Можно искать только комментарии"""
+        self.assertEqual(self.found('кот', kinds=(search.COMMENT,)),
+                         [(search.COMMENT, self.comment.pk)])
+
+    def test_index_follows_changes(self):
+        """Правка и удаление сразу видны в поиске"""
+        self.dense.text = 'Теперь про попугая'
+        self.dense.save()
+        self.comment.delete()
+        self.assertEqual(self.found('кот'), [(search.POST, self.sparse.pk)])
+        self.assertEqual(self.found('попугая'),
+                         [(search.POST, self.dense.pk)])
+
+    def test_keyset_pages(self):
+        """Страницы по курсору идут без повторов и пропусков"""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Кот номер {index}')
+            for index in range(7)
+        ])
+        call_command('rebuild_search_index', stdout=StringIO())
+        seen = []
+        page = search.search_page('кот', 3)
+        while True:
+            seen.extend(result.object.pk for result in page.results
+                        if result.kind == search.POST)
+            if page.next_cursor is None:
+                break
+            page = search.search_page('кот', 3, page.next_cursor)
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), 9)
+
+    def test_search_view(self):
+        """Страница поиска показывает найденное"""
+        response = Client().get(reverse('posts:search'), {'q': 'попугай'})
+        self.assertEqual(list(response.context['page'].results), [])
+        response = Client().get(reverse('posts:search'), {'q': 'диване'})
+        self.assertEqual([result.object for result
+                          in response.context['page'].results], [self.dense])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке берёт результаты из индекса"""
+        admin = User.objects.create_superuser(
+            'search_admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собака'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.sparse])
+
+
+class FTS5SearchTests(SearchBackendTests, TestCase):
+    def test_fts5_is_used(self):
+        """При наличии FTS5 запасной индекс не заполняется"""
+        self.assertTrue(search.uses_fts5())
+        self.assertFalse(SearchDocument.objects.exists())
+
+
+@override_settings(SEARCH_BACKEND='python')
+class PythonSearchTests(SearchBackendTests, TestCase):
+    pass
@@ -0,0 +1,219 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post, ThumbnailJob
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='thumb_author')
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                'thumb.gif', SMALL_GIF, content_type='image/gif'),
+        )
+        self.url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def add_image_post(self, name):
+        return Post.objects.create(
+            author=self.user,
+            text='Ещё пост',
+            image=SimpleUploadedFile(
+                name, SMALL_GIF, content_type='image/gif'),
+        )
+
+    def work(self):
+        call_command('thumbnail_worker', once=True, stdout=StringIO())
+
+    def test_upload_enqueues_job(self):
+        """Загрузка ставит задание, страница отдаёт исходную картинку"""
+        job = ThumbnailJob.objects.get(source=self.post.image.name)
+        self.assertEqual(job.status, ThumbnailJob.PENDING)
+        self.assertIsNone(thumbnails.lookup(self.post.image.name))
+        response = Client().get(self.url)
+        self.assertContains(response, self.post.image.url)
+
+    def test_worker_makes_thumbnail(self):
+        """Воркер создаёт миниатюру, и страница её показывает"""
+        self.work()
+        job = ThumbnailJob.objects.get(source=self.post.image.name)
+        self.assertEqual(job.status, ThumbnailJob.DONE)
+        thumbnail = thumbnails.lookup(self.post.image.name)
+        self.assertIsNotNone(thumbnail)
+        cache.clear()
+        response = Client().get(self.url)
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_text_edit_does_not_enqueue(self):
+        """Правка текста без новой картинки задание не ставит"""
+        self.work()
+        self.post.text = 'Новый текст'
+        self.post.save()
+        job = ThumbnailJob.objects.get(source=self.post.image.name)
+        self.assertEqual(job.status, ThumbnailJob.DONE)
+
+    def test_missing_source_fails(self):
+        """Пропавший исходник после всех попыток помечается как failed"""
+        thumbnails.enqueue('posts/missing.gif')
+        for _ in range(settings.THUMBNAIL_JOB_ATTEMPTS):
+            self.work()
+        job = ThumbnailJob.objects.get(source='posts/missing.gif')
+        self.assertEqual(job.status, ThumbnailJob.FAILED)
+        self.assertEqual(job.attempts, settings.THUMBNAIL_JOB_ATTEMPTS)
+        self.assertIn('FileNotFoundError', job.error)
+
+    def test_backfill_enqueues_missing(self):
+        """Backfill ставит в очередь картинки без миниатюр"""
+        self.work()
+        Post.objects.filter(pk=self.post.pk).update(
+            image='posts/old.gif', image_variants='')
+        call_command('backfill_thumbnails', stdout=StringIO())
+        self.assertEqual(
+            ThumbnailJob.objects.get(source='posts/old.gif').status,
+            ThumbnailJob.PENDING)
+        self.assertEqual(
+            ThumbnailJob.objects.get(source=self.post.image.name).status,
+            ThumbnailJob.DONE)
+
+    def test_prefetch_is_one_lookup(self):
+        """Миниатюры страницы находятся одним запросом, потом — из кэша"""
+        posts = [self.post] + [
+            self.add_image_post(f'more{index}.gif') for index in range(4)]
+        posts.append(Post.objects.create(author=self.user, text='Без'))
+        self.work()
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.prefetch(posts)
+        self.assertEqual(len(queries), 1)
+        for post in posts[:-1]:
+            self.assertEqual(
+                post.thumb_url, thumbnails.lookup(post.image.name).url)
+        self.assertIsNone(posts[-1].thumb_url)
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.prefetch(posts)
+        self.assertEqual(len(queries), 0)
+
+    def test_listing_shows_prefetched_thumbnails(self):
+        """Списки постов показывают миниатюры"""
+        self.work()
+        cache.clear()
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(
+            response, thumbnails.lookup(self.post.image.name).url)
+
+    def manifest(self):
+        self.post.refresh_from_db()
+        return json.loads(self.post.image_variants)
+
+    def test_worker_makes_variants(self):
+        """Воркер готовит WebP (если Pillow его умеет) и исходный формат
+        нескольких ширин"""
+        self.work()
+        manifest = self.manifest()
+        expected = [thumbnails.MIME_TYPES[fmt]
+                    for fmt in thumbnails.supported_variant_formats()]
+        self.assertEqual(list(manifest), expected + ['image/gif'])
+        for variants in manifest.values():
+            self.assertEqual([width for _, width in variants],
+                             list(thumbnails.VARIANT_WIDTHS))
+            for name, width in variants:
+                with Image.open(default_storage.open(name)) as image:
+                    self.assertEqual(image.width, width)
+
+    def test_pages_render_picture(self):
+        """Карточка и страница поста отдают <picture> со srcset"""
+        self.work()
+        manifest = self.manifest()
+        cache.clear()
+        for url in (self.url, reverse('posts:index')):
+            with self.subTest(url=url):
+                response = Client().get(url)
+                self.assertContains(response, '<picture>')
+                for mime, variants in manifest.items():
+                    self.assertContains(response, f'type="{mime}"')
+                    self.assertContains(
+                        response,
+                        f'{default_storage.url(variants[0][0])} 320w')
+
+    def test_variants_without_webp(self):
+        """Без кодека WebP остаются варианты в исходном формате"""
+        with mock.patch.object(thumbnails.features, 'check',
+                               return_value=False):
+            self.work()
+        self.assertEqual(list(self.manifest()), ['image/gif'])
+
+    def test_failed_variant_keeps_job_done(self):
+        """Неудавшийся вариант не роняет задание, остальные сохраняются"""
+        get_thumbnail = thumbnails.backend.get_thumbnail
+
+        def flaky(name, geometry, **options):
+            if geometry.startswith('640x'):
+                raise OSError('нет кодека')
+            return get_thumbnail(name, geometry, **options)
+
+        with mock.patch.object(thumbnails.backend, 'get_thumbnail', flaky):
+            with self.assertLogs('posts.thumbnails', 'ERROR'):
+                self.work()
+        job = ThumbnailJob.objects.get(source=self.post.image.name)
+        self.assertEqual(job.status, ThumbnailJob.DONE)
+        self.assertIsNotNone(thumbnails.lookup(self.post.image.name))
+        for variants in self.manifest().values():
+            self.assertEqual([width for _, width in variants], [320, 960])
+
+    def test_no_variants_falls_back_to_thumbnail(self):
+        """Без вариантов страница показывает обычную миниатюру"""
+        with mock.patch.object(thumbnails, 'make_variants',
+                               return_value={}):
+            self.work()
+        cache.clear()
+        response = Client().get(self.url)
+        self.assertNotContains(response, '<picture>')
+        self.assertContains(
+            response, thumbnails.lookup(self.post.image.name).url)
+
+    def test_new_image_drops_variants(self):
+        """Новая картинка сбрасывает варианты старой"""
+        self.work()
+        self.post.image = SimpleUploadedFile(
+            'other.gif', SMALL_GIF, content_type='image/gif')
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_variants, '')
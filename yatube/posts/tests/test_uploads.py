@@ -0,0 +1,246 @@
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.storage import is_sharded
+from ..models import Post, ThumbnailJob
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_bytes(size, image_format='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'white').save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def png_header(width, height):
+    """PNG, в заголовке которого записаны огромные размеры."""
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr)
+            + chunk(b'IDAT', zlib.compress(b'')) + chunk(b'IEND', b''))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='upload_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, content, name='photo.jpg'):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content),
+        })
+
+    def assertRejected(self, response, code):
+        self.assertEqual(response.status_code, 200)
+        errors = response.context['form'].errors.as_data()['image']
+        self.assertEqual([error.code for error in errors], [code])
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(UPLOAD_MAX_SIZE=1024)
+    def test_oversized_upload_rejected(self):
+        """Файл больше UPLOAD_MAX_SIZE отклоняется"""
+        self.assertRejected(self.upload(image_bytes((800, 600))),
+                            'file_too_large')
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с большим числом точек отклоняется"""
+        self.assertRejected(self.upload(image_bytes((20, 20))),
+                            'too_many_pixels')
+
+    @override_settings(IMAGE_MAX_DECODED_PIXELS=100)
+    def test_decoded_pixels_limit_skips_jpeg(self):
+        """Для PNG предел точек ниже: JPEG раскодируется уменьшенным"""
+        self.assertRejected(self.upload(image_bytes((20, 20), 'PNG'),
+                                        'big.png'),
+                            'too_many_pixels')
+        response = self.upload(image_bytes((20, 20)))
+        self.assertEqual(response.status_code, 302)
+
+    def test_decompression_bomb_rejected(self):
+        """Заголовок на 10^10 точек отклоняется без раскодирования"""
+        self.assertRejected(
+            self.upload(png_header(100000, 100000), 'bomb.png'),
+            'invalid_image')
+
+    def test_not_an_image_rejected(self):
+        """Не картинка отклоняется"""
+        self.assertRejected(self.upload(b'not an image', 'text.jpg'),
+                            'invalid_image')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_large_image_downscaled(self):
+        """Большой оригинал уменьшается перед сохранением"""
+        response = self.upload(image_bytes((400, 300)))
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get()
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (100, 75))
+            self.assertEqual(image.format, 'JPEG')
+
+    def test_small_image_kept(self):
+        """Небольшая картинка сохраняется как есть"""
+        content = image_bytes((40, 30), 'PNG')
+        self.upload(content, 'small.png')
+        post = Post.objects.get()
+        self.assertEqual(post.image.read(), content)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='metadata_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.content = image_bytes((40, 30), 'PNG')
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('meta.png', self.content),
+        )
+
+    def assertMetadata(self, post):
+        self.assertEqual(
+            (post.image_width, post.image_height, post.image_size,
+             post.image_format, post.image_hash),
+            (40, 30, len(self.content), 'PNG',
+             hashlib.sha256(self.content).hexdigest()))
+
+    def test_metadata_recorded_on_save(self):
+        """При сохранении картинки записываются её метаданные"""
+        self.post.refresh_from_db()
+        self.assertMetadata(self.post)
+
+    def test_missing_file_tolerated(self):
+        """Пост с несуществующим файлом сохраняется без метаданных"""
+        post = Post.objects.create(
+            author=self.user, text='Без файла', image='posts/missing.png')
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_hash, '')
+
+    def test_backfill(self):
+        """Команда заполняет метаданные старых постов"""
+        Post.objects.update(image_width=None, image_height=None,
+                            image_size=None, image_format='', image_hash='')
+        Post.objects.create(
+            author=self.user, text='Без файла', image='posts/missing.png')
+        out = StringIO()
+        call_command('backfill_image_metadata', chunk=1, stdout=out)
+        self.post.refresh_from_db()
+        self.assertMetadata(self.post)
+        self.assertIn('Обновлено постов: 1; без файла: 1', out.getvalue())
+
+    def test_page_has_image_size(self):
+        """У картинки на странице есть width и height"""
+        response = Client().get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertContains(response, 'width="40" height="30"')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ShardPostImagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='shard_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def flat_post(self, name, content):
+        """Пост со старым, «плоским» путём posts/<имя>."""
+        path = os.path.join(TEMP_MEDIA_ROOT, 'posts', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+        return Post.objects.create(
+            author=self.user, text='Старый пост', image=f'posts/{name}')
+
+    def test_upload_is_sharded(self):
+        """Новые загрузки сразу ложатся в posts/ab/cd/"""
+        post = Post.objects.create(
+            author=self.user, text='Пост',
+            image=SimpleUploadedFile('new.png', image_bytes((4, 4), 'PNG')))
+        self.assertTrue(is_sharded(post.image.name))
+        self.assertTrue(post.image.name.startswith('posts/'))
+
+    def test_command_rewrites_paths(self):
+        """Команда переносит файлы, склеивает дубли и правит пути"""
+        content = image_bytes((5, 5), 'PNG')
+        first = self.flat_post('first.png', content)
+        copy = self.flat_post('copy.png', content)
+        other = self.flat_post('other.png', image_bytes((6, 6), 'PNG'))
+        Post.objects.create(
+            author=self.user, text='Пропал', image='posts/gone.png')
+        out = StringIO()
+        call_command('shard_post_images', '--delete-originals', stdout=out)
+        for post in (first, copy, other):
+            post.refresh_from_db()
+            self.assertTrue(is_sharded(post.image.name))
+            self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertEqual(first.image.name, copy.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertFalse(os.path.exists(
+            os.path.join(TEMP_MEDIA_ROOT, 'posts', 'first.png')))
+        self.assertIn('Перенесено файлов: 3, из них дублей: 1; '
+                      'не найдено: 1', out.getvalue())
+        self.assertTrue(ThumbnailJob.objects.filter(
+            source=first.image.name).exists())
+
+    def test_command_invalidates_cached_pages(self):
+        """Гости и условные GET получают страницы с новыми путями"""
+        cache.clear()
+        post = self.flat_post('cached.png', image_bytes((7, 7), 'PNG'))
+        urls = (reverse('posts:index'),
+                reverse('posts:profile', args=[self.user.username]),
+                reverse('posts:post_detail', args=[post.pk]))
+        etags = {url: Client().get(url)['ETag'] for url in urls[1:]}
+        call_command('shard_post_images', '--delete-originals',
+                     stdout=StringIO())
+        post.refresh_from_db()
+        for url in urls:
+            with self.subTest(url=url):
+                response = Client().get(
+                    url, HTTP_IF_NONE_MATCH=etags.get(url, ''))
+                self.assertContains(response, post.image.url)
+                self.assertNotContains(response, 'posts/cached.png')
@@ -1,4 +1,6 @@
+import re
 from datetime import datetime
+from io import StringIO
 import tempfile
 import shutil
 
@@ -12,7 +14,12 @@ from ..models import Group, Post, Comment, Follow
 from django import forms
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.core.cache import cache
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core import anonymous_cache
 
 
 User = get_user_model()
@@ -166,18 +173,47 @@ class PostPagesTests(TestCase):
 
     def test_index_cache(self):
         """Тест работы кэширования"""
-        Post.objects.create(
-            text='new-post-with-cache',
-            author=self.user,
-            group=self.group,
-        )
+        cache.clear()
+        self.guest_client.get('/')
+        Post.objects.filter(pk=self.post.pk).update(text='updated-silently')
         response = self.guest_client.get('/')
         page = response.content.decode()
-        self.assertNotIn('new-post-with-cache', page)
+        self.assertNotIn('updated-silently', page)
         cache.clear()
         response = self.guest_client.get('/')
         page = response.content.decode()
-        self.assertIn('new-post-with-cache', page)
+        self.assertIn('updated-silently', page)
+
+    def test_index_cache_invalidated_by_new_post(self):
+        """Новый пост сразу сбрасывает кэш главной, группы и профиля"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        Post.objects.create(
+            text='new-post-with-cache',
+            author=self.user,
+            group=self.group,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'new-post-with-cache')
+
+    def test_group_slug_change_invalidates_old_page(self):
+        """Страница группы по старому слагу не отдаётся из кэша"""
+        group = Group.objects.create(
+            title='Переименуемая', slug='old-slug', description='')
+        old_url = reverse('posts:group_list', kwargs={'slug': 'old-slug'})
+        self.assertEqual(self.author.get(old_url).status_code,
+                         HTTPStatus.OK)
+        group.slug = 'new-slug'
+        group.save()
+        self.assertEqual(self.author.get(old_url).status_code,
+                         HTTPStatus.NOT_FOUND)
 
 
 class PaginatorViewsTests(TestCase):
@@ -224,6 +260,64 @@ class PaginatorViewsTests(TestCase):
         self.assertEqual(len(response.context["page_obj"]), 3, "Не три!")
 
 
+class CursorPaginatorViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="cursor_user")
+        cls.group = Group.objects.create(
+            title="Cursor group",
+            slug="cursor_group_slug",
+            description="Cursor group description",
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.user, group=cls.group,
+                 text='Курсорный текст' + str(i))
+            for i in range(13)
+        ])
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages_cover_all_posts(self):
+        """Cursor | group_list: страницы по курсору идут без повторов"""
+        url = reverse("posts:group_list", kwargs={"slug": self.group.slug})
+        first = self.guest_client.get(url).context["page_obj"]
+        self.assertEqual(len(first), 10)
+        self.assertIsNone(first.previous_cursor)
+        second = self.guest_client.get(
+            url, {"cursor": first.next_cursor}
+        ).context["page_obj"]
+        self.assertEqual(len(second), 3)
+        self.assertIsNone(second.next_cursor)
+        seen = [post.pk for post in first] + [post.pk for post in second]
+        self.assertEqual(len(set(seen)), 13)
+        back = self.guest_client.get(
+            url, {"cursor": second.previous_cursor}
+        ).context["page_obj"]
+        self.assertEqual(
+            [post.pk for post in back], [post.pk for post in first]
+        )
+
+    def test_cursor_page_skips_count(self):
+        """Cursor | group_list: курсорная страница не считает COUNT(*)"""
+        url = reverse("posts:group_list", kwargs={"slug": self.group.slug})
+        first = self.guest_client.get(url).context["page_obj"]
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url, {"cursor": first.next_cursor})
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Cursor | profile: битый курсор открывает первую страницу"""
+        url = reverse("posts:profile", kwargs={"username": self.user})
+        response = self.guest_client.get(url, {"cursor": "broken!"})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.context["page_obj"]), 10)
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class CommentViewTests(TestCase):
     @classmethod
@@ -293,6 +387,92 @@ class CommentViewTests(TestCase):
         self.assertIn(self.comment, response.context['comments'])
 
 
+class PostDetailQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.quiet_post = Post.objects.create(text='Тихий', author=cls.author)
+        cls.viral_post = Post.objects.create(text='Вирусный',
+                                             author=cls.author)
+        Comment.objects.create(post=cls.quiet_post, author=cls.user,
+                               text='Единственный')
+        User.objects.bulk_create([
+            User(username=f'commenter{i}') for i in range(20)
+        ])
+        commenters = list(User.objects.filter(
+            username__startswith='commenter'))
+        Comment.objects.bulk_create([
+            Comment(post=cls.viral_post, author=commenters[i % 20],
+                    text=f'Комментарий {i}')
+            for i in range(1000)
+        ])
+        cls.client_user = Client()
+        cls.client_user.force_login(cls.user)
+
+    def count_queries(self, post):
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_user.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_queries_do_not_depend_on_comments(self):
+        """post_detail делает одинаковое число запросов при 1 и 1000
+        комментариях"""
+        self.assertEqual(self.count_queries(self.quiet_post),
+                         self.count_queries(self.viral_post))
+
+    def test_comments_are_ordered(self):
+        """Комментарии идут в порядке публикации"""
+        url = reverse('posts:post_detail',
+                      kwargs={'post_id': self.viral_post.pk})
+        comments = self.client_user.get(url).context['comments']
+        keys = [(comment.created, comment.pk) for comment in comments]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_first_render_is_limited(self):
+        """На странице поста только первая порция комментариев"""
+        url = reverse('posts:post_detail',
+                      kwargs={'post_id': self.viral_post.pk})
+        comments = self.client_user.get(url).context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        self.assertIsNotNone(comments.next_cursor)
+
+    def test_comments_fragment_continues(self):
+        """Фрагмент отдаёт следующие комментарии без повторов"""
+        url = reverse('posts:post_detail',
+                      kwargs={'post_id': self.viral_post.pk})
+        first = self.client_user.get(url).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments',
+                    kwargs={'post_id': self.viral_post.pk}),
+            {'cursor': first.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        second = response.context['comments']
+        self.assertEqual(len(second), settings.COMMENTS_PER_PAGE)
+        keys = [(comment.created, comment.pk)
+                for comment in list(first) + list(second)]
+        self.assertEqual(keys, sorted(set(keys)))
+
+    def test_comments_fragment_bad_cursor(self):
+        """Битый курсор во фрагменте даёт 404"""
+        response = self.client.get(
+            reverse('posts:post_comments',
+                    kwargs={'post_id': self.viral_post.pk}),
+            {'cursor': 'мусор'},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_comments_fragment_missing_post(self):
+        """Фрагмент комментариев несуществующего поста даёт 404"""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 10 ** 6}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
 class FollowViewTests(TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -359,3 +539,146 @@ class FollowViewTests(TestCase):
                 'posts:profile_follow',
                 kwargs={'username': self.user_follower.username}))
         self.assertEqual(Follow.objects.all().count(), 0)
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='anonymous_cache')
+        cls.post = Post.objects.create(text='Пост в кэше', author=cls.user)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': cls.user}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_repeat_visit_skips_database(self):
+        """Повторная страница для гостя отдаётся без запросов к БД"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(second.status_code, HTTPStatus.OK)
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second['Content-Type'],
+                                 first['Content-Type'])
+
+    def test_session_cookie_bypasses_cache(self):
+        """Пользователь с сессией получает свою страницу, а не гостевую"""
+        self.guest_client.get('/')
+        response = self.authorized_client.get('/')
+        self.assertContains(response, self.user.username)
+        self.assertIsNotNone(response.context)
+
+    def test_post_change_invalidates_pages(self):
+        """Исправленный пост сразу виден гостю на всех страницах"""
+        for url in self.urls:
+            self.guest_client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url),
+                                    'Исправленный пост')
+
+    def test_lost_generation_does_not_revive_old_pages(self):
+        """Вытесненный номер поколения не возвращает старые страницы"""
+        self.guest_client.get('/')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        caches[settings.ANONYMOUS_CACHE_ALIAS].delete(
+            anonymous_cache.GENERATION_KEY)
+        self.assertContains(self.guest_client.get('/'), 'Исправленный пост')
+
+
+class SharedPageShellTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.first = User.objects.create_user(username='shell_first')
+        cls.second = User.objects.create_user(username='shell_second')
+        Post.objects.create(text='Пост в оболочке', author=cls.first)
+
+    def setUp(self):
+        cache.clear()
+        self.clients = {}
+        for user in (self.first, self.second):
+            self.clients[user] = Client()
+            self.clients[user].force_login(user)
+
+    def test_users_share_index_shell(self):
+        """Главная строится один раз на всех, шапка — своя у каждого"""
+        first = self.clients[self.first].get('/')
+        self.assertTemplateUsed(first, 'posts/index.html')
+        second = self.clients[self.second].get('/')
+        self.assertTemplateNotUsed(second, 'posts/index.html')
+        self.assertTemplateUsed(second, 'includes/header.html')
+        self.assertTemplateUsed(second, 'posts/includes/switcher.html')
+        self.assertContains(second, 'Пользователь: shell_second')
+        self.assertNotContains(second, 'shell_first</li>')
+        self.assertContains(second, 'Пост в оболочке')
+        self.assertContains(second, 'Избранные авторы')
+        self.assertNotContains(second, '<!--hole:')
+        self.assertIn('Cookie', second['Vary'])
+
+    def test_guest_gets_guest_header_from_shared_shell(self):
+        """Гость получает из той же оболочки шапку со входом"""
+        self.clients[self.first].get('/')
+        response = Client().get('/')
+        self.assertContains(response, 'Войти')
+        self.assertNotContains(response, 'Пользователь:')
+        self.assertNotContains(response, 'Избранные авторы')
+
+
+class WarmCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='warm_author')
+        cls.group = Group.objects.create(
+            title='Тёплая группа', slug='warm-group', description='')
+        Post.objects.bulk_create([
+            Post(text=f'Пост {number}', author=cls.user, group=cls.group)
+            for number in range(25)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warmed_pages_are_served_from_cache(self):
+        """После warm_cache первые страницы отдаются без запросов к БД"""
+        out = StringIO()
+        call_command('warm_cache', pages=3, host='testserver', stdout=out)
+        self.assertIn('главная: 3', out.getvalue())
+        self.assertIn('Прогрев занял', out.getvalue())
+        next_page = re.search(r'href="\?cursor=([^"]+)"',
+                              Client().get('/').content.decode()).group(1)
+        urls = (
+            '/',
+            f'/?cursor={next_page}',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with self.assertNumQueries(0):
+                    response = Client().get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_secure_warmup_matches_https_requests(self):
+        """С --secure прогретые страницы отдаются из кэша по https"""
+        call_command('warm_cache', pages=1, groups=0, profiles=0,
+                     host='testserver', secure=True, stdout=StringIO())
+        with self.assertNumQueries(0):
+            response = Client().get('/', secure=True)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
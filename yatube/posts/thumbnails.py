@@ -0,0 +1,245 @@
+"""Миниатюры картинок постов, подготовленные заранее.
+
+Сохранение поста с новой картинкой ставит задание в таблицу
+ThumbnailJob (в той же транзакции), а команда thumbnail_worker
+выполняет задания: создаёт миниатюры через sorl-thumbnail и записывает
+их в его хранилище ключей. При отрисовке lookup() только ищет готовую
+миниатюру в этом хранилище и никогда не открывает исходную картинку,
+а prefetch() находит миниатюры целой страницы постов одним get_many.
+
+Кроме миниатюры воркер готовит адаптивные варианты: несколько ширин в
+WebP (если Pillow собран с его поддержкой) и в исходном формате. Их
+список (манифест) хранится в Post.image_variants и превращается в
+<picture>/srcset без обращений к хранилищу. Вариант, который не удалось
+создать, в манифест не попадает; без вариантов страница показывает
+обычную миниатюру.
+"""
+import json
+import logging
+
+from django.conf import settings
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from . import jobs
+from .models import Post, ThumbnailJob
+
+POST_THUMBNAIL = ('960x339', {'crop': 'center', 'upscale': True})
+SPECS = (POST_THUMBNAIL,)
+VARIANT_WIDTHS = (320, 640, 960)
+# Пропорции те же, что у миниатюры: 960x339.
+VARIANT_RATIO = 339 / 960
+# Предпочтительные форматы вариантов; берутся те, что умеет писать Pillow.
+VARIANT_FORMATS = ('WEBP',)
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+logger = logging.getLogger(__name__)
+
+
+class LookupBackend(ThumbnailBackend):
+    """Бэкенд sorl, который умеет искать миниатюру без её создания."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Миниатюра, которую создал бы get_thumbnail() (та же логика
+        имени и опций по умолчанию)."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def lookup(self, file_, geometry_string, **options):
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options))
+
+
+backend = LookupBackend()
+
+
+def lookup(name, spec=POST_THUMBNAIL):
+    """Готовая миниатюра (ImageFile) или None, если её ещё нет."""
+    if not name:
+        return None
+    geometry, options = spec
+    return backend.lookup(name, geometry, **options)
+
+
+def _load_raw(keys):
+    """Сырые значения хранилища sorl: кэш одним get_many, промахи —
+    одним запросом к таблице, как это делает cached_db KVStore."""
+    kv_cache = default.kvstore.cache
+    values = kv_cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStore.objects.filter(key__in=missing).values_list(
+            'key', 'value'))
+        # Отсутствие тоже кэшируется, чтобы не ходить в базу снова.
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kv_cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {key: value for key, value in values.items()
+            if value != EMPTY_VALUE}
+
+
+def lookup_many(names, spec=POST_THUMBNAIL):
+    """Готовые миниатюры нескольких картинок: {имя: ImageFile}."""
+    geometry, options = spec
+    keys = {
+        add_prefix(backend.thumbnail_file(name, geometry, **options).key):
+        name
+        for name in set(names) if name
+    }
+    if not keys:
+        return {}
+    return {
+        keys[key]: deserialize_image_file(value)
+        for key, value in _load_raw(list(keys)).items()
+    }
+
+
+def prefetch(posts, spec=POST_THUMBNAIL):
+    """Проставляет каждому посту:
+
+    - thumb_url — адрес миниатюры или None, если её ещё нет;
+    - image_sources — источники для <picture>;
+    - img_url, img_width, img_height — что выводить в <img>: миниатюру
+      или, пока её готовит воркер, оригинал с размерами из метаданных.
+
+    Вся страница обходится за один поход в кэш вместо поиска на
+    каждую картинку.
+    """
+    posts = list(posts)
+    found = lookup_many([post.image.name for post in posts], spec)
+    for post in posts:
+        thumbnail = found.get(post.image.name)
+        post.thumb_url = thumbnail.url if thumbnail else None
+        if thumbnail:
+            # Размер миниатюры хранится в KV sorl рядом с её именем.
+            post.img_url = thumbnail.url
+            post.img_width, post.img_height = thumbnail.size
+        else:
+            post.img_url = post.image.url if post.image else None
+            post.img_width, post.img_height = (post.image_width,
+                                               post.image_height)
+        post.image_sources = image_sources(post)
+    return posts
+
+
+def enqueue(name):
+    """Ставит картинку в очередь воркера (повторно — тоже можно)."""
+    ThumbnailJob.objects.update_or_create(
+        source=name,
+        defaults={'status': ThumbnailJob.PENDING, 'attempts': 0,
+                  'error': ''},
+    )
+
+
+def supported_variant_formats():
+    """Форматы из VARIANT_FORMATS, для которых у Pillow есть кодек."""
+    return tuple(fmt for fmt in VARIANT_FORMATS
+                 if features.check(fmt.lower()))
+
+
+def variant_formats(name):
+    """Форматы вариантов: сначала WebP, затем исходный формат картинки."""
+    preferred = supported_variant_formats()
+    original = backend._get_format(ImageFile(name))
+    return preferred + tuple(
+        fmt for fmt in (original,) if fmt not in preferred)
+
+
+def make_variants(name):
+    """Создаёт варианты картинки и возвращает манифест.
+
+    Манифест — {mime-тип: [[имя файла, ширина], ...]}, типы в порядке
+    предпочтения для <picture>, ширины по возрастанию. Неудавшийся
+    вариант пропускается: миниатюра уже готова, и задание из-за него
+    не должно падать.
+    """
+    manifest = {}
+    for fmt in variant_formats(name):
+        if fmt not in MIME_TYPES:
+            continue
+        variants = []
+        for width in VARIANT_WIDTHS:
+            try:
+                variant = backend.get_thumbnail(
+                    name, f'{width}x{round(width * VARIANT_RATIO)}',
+                    crop='center', upscale=True, format=fmt)
+            except Exception:
+                logger.exception('Вариант %s %s шириной %d не создан',
+                                 name, fmt, width)
+                continue
+            variants.append([variant.name, width])
+        if variants:
+            manifest[MIME_TYPES[fmt]] = variants
+    return manifest
+
+
+def save_variants(name, manifest):
+    """Записывает манифест всем постам с этой картинкой.
+
+    Через save(), чтобы сигналы сбросили кэш списков и ETag поста.
+    """
+    value = json.dumps(manifest)
+    for post in Post.objects.filter(image=name).exclude(
+            image_variants=value):
+        post.image_variants = value
+        post.save(update_fields=['image_variants', 'updated_at'])
+
+
+def image_sources(post):
+    """[(mime-тип, srcset)] из манифеста поста; [] — вариантов нет."""
+    try:
+        manifest = json.loads(post.image_variants or '{}')
+    except ValueError:
+        # Повреждённый манифест: показываем картинку без вариантов.
+        return []
+    return [
+        (mime, ', '.join(f'{default.storage.url(variant)} {width}w'
+                         for variant, width in variants))
+        for mime, variants in manifest.items()
+    ]
+
+
+def generate(name):
+    """Создаёт миниатюры и варианты картинки; без исходника —
+    FileNotFoundError."""
+    if not default.storage.exists(name):
+        raise FileNotFoundError(name)
+    for geometry, options in SPECS:
+        backend.get_thumbnail(name, geometry, **options)
+    save_variants(name, make_variants(name))
+
+
+def claim(limit):
+    """Забирает до limit заданий; несколько воркеров не возьмут одно."""
+    return jobs.claim(ThumbnailJob, limit, settings.THUMBNAIL_JOB_TIMEOUT)
+
+
+def run_job(job):
+    return jobs.run(job, lambda: generate(job.source),
+                    settings.THUMBNAIL_JOB_ATTEMPTS)
+
+
+def run_pending(limit):
+    """Выполняет до limit заданий; возвращает их итоговые состояния."""
+    return [run_job(job) for job in claim(limit)]
@@ -11,9 +11,12 @@ urlpatterns = [
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('create/', views.post_create, name='post_create'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
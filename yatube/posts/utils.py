@@ -0,0 +1,22 @@
+from django.conf import settings
+
+from core.paginators import CursorPaginator
+
+from .models import Comment
+
+
+def paginate(request, post_list, per_page, ordering=None):
+    """Страница постов по ?cursor=, старые ссылки ?page= тоже работают."""
+    paginator = CursorPaginator(post_list, per_page, ordering=ordering)
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
+
+
+def comments_paginator(post_id):
+    """Комментарии поста порциями по COMMENTS_PER_PAGE, от старых к новым."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    return CursorPaginator(comments, settings.COMMENTS_PER_PAGE,
+                           ordering=('created', 'id'))
@@ -1,36 +1,54 @@
 from django.shortcuts import get_object_or_404, render, redirect
-from django.core.paginator import Paginator
 
+from core.anonymous_cache import anonymous_cache
+from core.paginators import InvalidCursor
+from core.query_budget import query_budget
+
+from . import thumbnails
+from .cache import (GROUP_LISTING, INDEX_LISTING, PROFILE_LISTING,
+                    cache_listing, listing_version)
+from .feeds import get_feed_page
 from .forms import PostForm, CommentForm
 from .models import Group, Post, User, Follow
+from .search import search_page
+from .utils import comments_paginator, paginate
+from .watermarks import (group_etag, group_last_modified, post_etag,
+                         post_last_modified, profile_etag,
+                         profile_last_modified)
 
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db import transaction
+from django.http import Http404
+from django.conf import settings
+from django.views.decorators.http import condition
 
 RECENT_POSTS: int = 10
 TITLE_SYMBOL: int = 30
-TIMOUT_CACHE: int = 20
 
 
-@cache_page(TIMOUT_CACHE)
+@query_budget(4)
+@anonymous_cache
+@cache_listing(INDEX_LISTING, shared=True)
 def index(request):
     template_index = 'posts/index.html'
-    post_list = Post.objects.select_related('author')
-    paginator = Paginator(post_list, RECENT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = paginate(request, post_list, RECENT_POSTS)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'listing_version': listing_version(INDEX_LISTING),
+        'listing_timeout': settings.LISTING_CACHE_TIMEOUT,
     }
     return render(request, template_index, context)
 
 
+@query_budget(6)
+@anonymous_cache
+@condition(etag_func=group_etag, last_modified_func=group_last_modified)
+@cache_listing(GROUP_LISTING, 'slug', shared=True)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('author')
-    paginator = Paginator(post_list, RECENT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = paginate(request, post_list, RECENT_POSTS)
     template_group = 'posts/group_list.html'
     context = {
         'group': group,
@@ -39,13 +57,17 @@ def group_posts(request, slug):
     return render(request, template_group, context)
 
 
+@query_budget(8)
+@anonymous_cache
+@condition(etag_func=profile_etag,
+           last_modified_func=profile_last_modified)
+@cache_listing(PROFILE_LISTING, 'username')
 def profile(request, username):
     template_profile = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('author')
-    paginator = Paginator(post_list, RECENT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    post_list = author.posts.select_related('author', 'group')
+    page_obj = paginate(request, post_list, RECENT_POSTS)
     if request.user.is_authenticated:
         follow = Follow.objects.filter(
             user=request.user.id,
@@ -63,24 +85,48 @@ def profile(request, username):
     return render(request, template_profile, context)
 
 
+@query_budget(6)
+@anonymous_cache
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
 def post_detail(request, post_id):
     template_post_detail = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    author = get_object_or_404(User, username=post.author)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=post_id,
+    )
+    thumbnails.prefetch([post])
     title = post.text[:TITLE_SYMBOL]
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
     context = {
         'post': post,
+        'post_id': post.pk,
         'title': title,
         'form': form,
-        'comments': comments,
-        'author': author
+        'comments': comments_paginator(post.pk).cursor_page(),
+        'author': post.author
     }
     return render(request, template_post_detail, context)
 
 
+@query_budget(4)
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста (HTML-фрагмент)."""
+    try:
+        comments = comments_paginator(post_id).cursor_page(
+            request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404('Некорректный курсор')
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@query_budget(24)
 @login_required
+@transaction.atomic
 def post_create(request):
     template_post_create = 'posts/post_create.html'
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -89,11 +135,12 @@ def post_create(request):
         post.author = request.user
         post.save()
         return redirect('posts:profile', post.author)
-    form = PostForm()
     return render(request, template_post_create, {'form': form})
 
 
+@query_budget(20)
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     template_post_create = 'posts/post_create.html'
     post = get_object_or_404(Post, pk=post_id)
@@ -115,7 +162,9 @@ def post_edit(request, post_id):
     return render(request, template_post_create, context)
 
 
+@query_budget(11)
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     template_post_detail = 'posts:post_detail'
     post = get_object_or_404(Post, pk=post_id)
@@ -128,12 +177,10 @@ def add_comment(request, post_id):
     return redirect(template_post_detail, post_id=post_id)
 
 
+@query_budget(5)
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, RECENT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_feed_page(request, RECENT_POSTS)
     context = {
         'page_obj': page_obj
 
@@ -141,7 +188,9 @@ def follow_index(request):
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(18)
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
@@ -152,10 +201,23 @@ def profile_follow(request, username):
     return redirect('posts:profile', username=author.username)
 
 
+@query_budget(16)
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     unfollow = Follow.objects.filter(
         user=request.user, author=author)
     unfollow.delete()
     return redirect('posts:profile', username)
+
+
+@query_budget(6)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = search_page(query, RECENT_POSTS, request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'page': page,
+    }
+    return render(request, 'posts/search.html', context)
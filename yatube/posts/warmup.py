@@ -0,0 +1,129 @@
+"""Прогрев после деплоя или перезапуска.
+
+Первые запросы после старта попадают на пустой кэш страниц, ещё не
+разобранные шаблоны и URL и холодные миниатюры — всё одновременно.
+warm() заранее проходит самые посещаемые страницы через обычный
+обработчик Django со всеми middleware: первые страницы главной, самые
+большие группы и профили с наибольшим числом подписчиков.
+
+Кэш страниц общий для процессов, а разобранные шаблоны и URL — свои у
+каждого. Поэтому команда warm_cache заполняет кэш для всех, а прогрев
+при старте воркера (WARM_CACHE_ON_START в yatube/wsgi.py) ещё и готовит
+сам процесс.
+"""
+import logging
+import os
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.template import engines
+from django.test import RequestFactory
+from django.urls import reverse
+
+from core.paginators import CursorPaginator
+
+from .models import Group, Post, User
+from .views import RECENT_POSTS
+
+logger = logging.getLogger(__name__)
+
+# count — число страниц, а для первого шага — загруженных шаблонов
+WarmupStep = namedtuple('WarmupStep', ['name', 'count', 'failed', 'seconds'])
+
+
+def _listing_urls(url, post_list, pages):
+    """URL первых pages страниц списка, по курсорам, как в paginate()."""
+    paginator = CursorPaginator(post_list, RECENT_POSTS)
+    urls, cursor = [url], None
+    for _ in range(pages - 1):
+        cursor = paginator.get_cursor_page(cursor).next_cursor
+        if not cursor:
+            break
+        urls.append(f'{url}?cursor={cursor}')
+    return urls
+
+
+def _template_names():
+    for directory in settings.TEMPLATES[0]['DIRS']:
+        for root, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                if file_name.endswith('.html'):
+                    yield os.path.relpath(
+                        os.path.join(root, file_name), directory)
+
+
+def prime_process():
+    """Разбирает URL и загружает шаблоны проекта в этом процессе;
+    возвращает число шаблонов."""
+    # Первый reverse() разбирает все URL проекта.
+    reverse('posts:index')
+    engine = engines['django']
+    names = list(_template_names())
+    for name in names:
+        engine.get_template(name)
+    return len(names)
+
+
+def warm_urls(pages, groups, profiles):
+    """Страницы для прогрева: (шаг, список URL)."""
+    index = _listing_urls(
+        reverse('posts:index'), Post.objects.all(), pages)
+    group_urls = [
+        url for group in Group.objects.order_by('-posts_count')[:groups]
+        for url in _listing_urls(
+            reverse('posts:group_list', kwargs={'slug': group.slug}),
+            group.posts.all(), 1)
+    ]
+    profile_urls = [
+        reverse('posts:profile', kwargs={'username': username})
+        for username in User.objects.order_by(
+            '-stats__followers_count').values_list(
+                'username', flat=True)[:profiles]
+    ]
+    return [('главная', index), ('группы', group_urls),
+            ('профили', profile_urls)]
+
+
+def _fetch(handler, factory, url, secure):
+    statuses = []
+    response = handler(factory.get(url, secure=secure).environ,
+                       lambda status, headers: statuses.append(status))
+    response.close()
+    return statuses[0].startswith('200')
+
+
+def warm(pages=None, groups=None, profiles=None, host=None, secure=None):
+    """Прогревает процесс и кэш; возвращает список WarmupStep."""
+    pages = settings.WARM_CACHE_PAGES if pages is None else pages
+    groups = settings.WARM_CACHE_GROUPS if groups is None else groups
+    profiles = settings.WARM_CACHE_PROFILES if profiles is None else profiles
+    secure = settings.WARM_CACHE_SECURE if secure is None else secure
+    # Ключи кэша страниц содержат адрес сайта вместе со схемой: прогревать
+    # надо под ним и по https, если сайт отдаётся по TLS.
+    factory = RequestFactory(HTTP_HOST=host or settings.WARM_CACHE_HOST)
+    handler = WSGIHandler()
+    started = time.perf_counter()
+    templates = prime_process()
+    steps = [WarmupStep('шаблоны и URL', templates, 0,
+                        time.perf_counter() - started)]
+    for name, urls in warm_urls(pages, groups, profiles):
+        started = time.perf_counter()
+        failed = sum(not _fetch(handler, factory, url, secure) for url in urls)
+        steps.append(WarmupStep(
+            name, len(urls), failed, time.perf_counter() - started))
+    return steps
+
+
+def warm_on_start():
+    """Прогрев при старте воркера; ошибки не мешают ему запуститься."""
+    try:
+        steps = warm()
+    except Exception:
+        logger.exception('Прогрев не удался')
+        return
+    logger.info('Прогрев за %.2f с (%s)',
+                sum(step.seconds for step in steps),
+                ', '.join(f'{step.name}: {step.seconds:.2f} с'
+                          for step in steps))
@@ -0,0 +1,106 @@
+"""Отметки последнего изменения и валидаторы для условных GET-запросов.
+
+Post.updated_at сдвигается при правке поста и его комментариев,
+Group.updated_at — при изменении постов группы, UserStats.updated_at —
+при изменении постов и подписок пользователя. Переименование или
+удаление группы сдвигает отметки её постов и их авторов: название
+группы видно на странице поста и в профиле. Из отметок строятся ETag и
+Last-Modified: повторный запрос без изменений получает 304 до загрузки
+поста, комментариев и отрисовки шаблона.
+"""
+import hashlib
+
+from django.http import Http404
+from django.utils import timezone
+
+from .models import Group, Post, UserStats
+
+
+def touch_post(post_id):
+    Post.objects.filter(pk=post_id).update(updated_at=timezone.now())
+
+
+def touch_groups(*group_ids):
+    group_ids = [pk for pk in group_ids if pk]
+    if group_ids:
+        Group.objects.filter(pk__in=group_ids).update(
+            updated_at=timezone.now())
+
+
+def touch_users(*user_ids):
+    UserStats.objects.filter(user_id__in=user_ids).update(
+        updated_at=timezone.now())
+
+
+def touch_group_posts(group_id):
+    Post.objects.filter(group_id=group_id).update(updated_at=timezone.now())
+
+
+def _viewer(request):
+    return request.user.pk or 0
+
+
+def _watermarks(request, lookup):
+    # condition() спрашивает ETag и Last-Modified по отдельности,
+    # а в базу за отметками ходим один раз на запрос.
+    cached = getattr(request, '_watermarks', None)
+    if cached is None:
+        cached = request._watermarks = lookup()
+    return cached
+
+
+def _etag(kind, request, marks):
+    if not marks:
+        return None
+    raw = '|'.join([kind, str(_viewer(request))] + [
+        mark.isoformat() for mark in marks if mark])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _last_modified(marks):
+    marks = [mark for mark in marks if mark]
+    return max(marks) if marks else None
+
+
+def _post_marks(request, post_id):
+    marks = _watermarks(request, lambda: Post.objects.filter(
+        pk=post_id).values_list('updated_at', 'author__stats__updated_at'
+                                ).first())
+    if marks is None:
+        # Отметки читаются до view: поста нет — 404 без лишнего запроса.
+        raise Http404('Пост не найден')
+    return marks
+
+
+def post_etag(request, post_id):
+    return _etag('post', request, _post_marks(request, post_id))
+
+
+def post_last_modified(request, post_id):
+    return _last_modified(_post_marks(request, post_id))
+
+
+def _profile_marks(request, username):
+    return _watermarks(request, lambda: UserStats.objects.filter(
+        user__username=username).values_list('updated_at').first())
+
+
+def profile_etag(request, username):
+    return _etag('profile', request, _profile_marks(request, username))
+
+
+def profile_last_modified(request, username):
+    return _last_modified(_profile_marks(request, username) or ())
+
+
+def _group_marks(request, slug):
+    return _watermarks(request, lambda: Group.objects.filter(
+        slug=slug).values_list('updated_at').first())
+
+
+def group_etag(request, slug):
+    return _etag('group', request, _group_marks(request, slug))
+
+
+def group_last_modified(request, slug):
+    return _last_modified(_group_marks(request, slug) or ())
@@ -0,0 +1,46 @@
+"""Основа команд фоновых воркеров для очередей из posts.jobs.
+
+Команда воркера — подкласс JobWorkerCommand с текстом help и функцией
+run_pending(limit) своей очереди, которая выполняет до limit заданий и
+возвращает их итоговые состояния.
+"""
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+
+class JobWorkerCommand(BaseCommand):
+    run_pending = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch', type=int, default=20,
+            help='Сколько заданий забирать за раз',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и выйти',
+        )
+
+    def handle(self, *args, **options):
+        total = Counter()
+        try:
+            while True:
+                statuses = self.run_pending(options['batch'])
+                total.update(statuses)
+                if statuses:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        summary = ', '.join(
+            f'{status}: {count}' for status, count in sorted(total.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Задания обработаны ({summary or "очередь пуста"})'))
@@ -50,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.anonymous_cache.AnonymousPageCacheMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -143,8 +145,127 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Кэш в два уровня: горячие записи держит LRU в памяти процесса, а за
+# ним общий для всех воркеров сервера файл, отображённый в память
+# (core.cache_backends). Чужая запись или удаление доходит до LRU не позже
+# чем через CHECK_INTERVAL секунд. Файл в Linux лучше положить в /dev/shm,
+# в свой каталог, недоступный другим пользователям: путь задаёт переменная
+# окружения YATUBE_CACHE_LOCATION. Тесты и бенчмарки переводят кэш во
+# временный файл сами (core.testing.private_shared_cache).
+# Обращения через 'default' считаются в метриках (/metrics/cache/,
+# команда cache_metrics), счётчики воркеров сводятся в 'shared'.
+SHARED_CACHE_LOCATION = os.environ.get(
+    'YATUBE_CACHE_LOCATION',
+    os.path.join(BASE_DIR, 'cache', 'yatube.cache'),
+)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache_backends.instrumented.InstrumentedCache',
+        'OPTIONS': {
+            'CACHE': 'tiered',
+            'METRICS_CACHE': 'shared',
+            'FLUSH_INTERVAL': 5,
+        },
+    },
+    'tiered': {
+        'BACKEND': 'core.cache_backends.tiered.TieredCache',
+        'LOCATION': 'tiered',
+        'OPTIONS': {
+            'L2': 'shared',
+            'MAX_ENTRIES': 500,
+            'CHECK_INTERVAL': 1.0,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache_backends.shared.SharedMemoryCache',
+        'LOCATION': SHARED_CACHE_LOCATION,
+        'OPTIONS': {
+            'SIZE': 64 * 1024 * 1024,
+            'BUCKET_SIZE': 128 * 1024,
+        },
+    },
 }
+
+TEST_RUNNER = 'core.testing.PrivateCacheTestRunner'
+
+# Сколько последних постов хранится в ленте подписок каждого читателя;
+# новые посты ленту не обрезают, это делает команда trim_feeds по
+# расписанию
+FEED_INBOX_SIZE = 1000
+
+# Авторы с таким числом подписчиков не раскладываются во входящие,
+# их посты забираются при чтении ленты; обратно во входящие автор
+# возвращается, когда подписчиков меньше FEED_PUSH_THRESHOLD
+FEED_PULL_THRESHOLD = 1000
+FEED_PUSH_THRESHOLD = 800
+# Задания воркеру ленты (feed_worker): попытки и через сколько секунд
+# зависшее задание можно забрать снова
+FEED_JOB_ATTEMPTS = 3
+FEED_JOB_TIMEOUT = 60 * 10
+
+# Время жизни закэшированных списков постов; актуальность обеспечивают
+# версии списков, которые повышаются при изменении постов
+LISTING_CACHE_TIMEOUT = 60 * 60
+
+# Бюджет SQL-запросов на view: при превышении в разработке пишется
+# предупреждение ('warn') или бросается исключение ('raise')
+QUERY_BUDGET_MODE = 'warn' if DEBUG else 'off'
+# (запросов, секунд) для view без собственного бюджета
+QUERY_BUDGET_DEFAULT = (5, None)
+# Бюджеты по имени URL, если на view нет декоратора @query_budget
+QUERY_BUDGETS = {}
+# Пространства имён URL, для которых бюджет не проверяется
+QUERY_BUDGET_IGNORE_NAMESPACES = ('admin',)
+
+# Сколько комментариев показывается на странице поста и подгружается
+# за раз по кнопке «Показать ещё»
+COMMENTS_PER_PAGE = 20
+
+# Поисковый индекс: 'fts5', 'python' или 'auto' — FTS5, если миграция
+# смогла создать таблицу posts_search
+SEARCH_BACKEND = 'auto'
+# Сколько лучших совпадений поиска показывается в админке
+SEARCH_ADMIN_LIMIT = 1000
+
+# Время жизни закэшированных вариантов выбора (группы) в админке
+CHOICES_CACHE_TIMEOUT = 60 * 5
+
+# Задания на миниатюры: сколько попыток даётся картинке и через сколько
+# секунд зависшее задание (упавший воркер) можно забрать снова
+THUMBNAIL_JOB_ATTEMPTS = 3
+THUMBNAIL_JOB_TIMEOUT = 60 * 10
+
+# Загрузки всегда пишутся во временный файл, а не в память; всё, что
+# больше UPLOAD_MAX_SIZE байт, отбрасывается
+FILE_UPLOAD_HANDLERS = ['core.uploads.CappedUploadHandler']
+UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+# Картинки с большим числом точек отклоняются по заголовку, не раскодируя
+IMAGE_MAX_PIXELS = 50_000_000
+# Оригиналы больше этого по большей стороне уменьшаются при загрузке;
+# снимок 4000x3000 JPEG-декодер тогда сразу отдаёт вдвое меньшим
+POST_IMAGE_MAX_SIDE = 2000
+# PNG, GIF и WebP уменьшенными не раскодируются: растр в памяти занимает
+# до 4 байт на точку, поэтому для них предел точек ниже
+IMAGE_MAX_DECODED_PIXELS = 4 * POST_IMAGE_MAX_SIDE ** 2
+
+# Страницы для анонимных посетителей (core.anonymous_cache): сколько
+# секунд хранится страница и с какими cookies запрос идёт мимо кэша
+# (cookie сессии проверяется всегда)
+ANONYMOUS_CACHE_ALIAS = 'default'
+ANONYMOUS_CACHE_TIMEOUT = 60 * 5
+ANONYMOUS_CACHE_BYPASS_COOKIES = ('messages',)
+
+# Прогрев (команда warm_cache и старт воркера в yatube/wsgi.py): сколько
+# первых страниц главной, самых больших групп и самых популярных профилей
+# открыть, под каким адресом сайта и по https ли (ключи кэша страниц
+# содержат схему: за TLS прогрев по http не совпадёт с запросами)
+WARM_CACHE_ON_START = False
+WARM_CACHE_PAGES = 3
+WARM_CACHE_GROUPS = 10
+WARM_CACHE_PROFILES = 10
+WARM_CACHE_HOST = ALLOWED_HOSTS[0]
+WARM_CACHE_SECURE = False
+
+# Токен для сборщика метрик: /metrics/cache/ с заголовком
+# «Authorization: Bearer <токен>»; без токена — только для персонала
+CACHE_METRICS_TOKEN = ''
@@ -3,12 +3,15 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import cache_metrics_view
+
 urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics/cache/', cache_metrics_view, name='cache_metrics'),
 
 ]
 if settings.DEBUG: